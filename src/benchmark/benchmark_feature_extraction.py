@@ -0,0 +1,70 @@
+""" Compare serial and parallel feature extraction on an NWB file. Run as:
+
+    python src/benchmark/benchmark_feature_extraction.py --nwb_path cell.nwb --workers 1 2 4 8
+
+Times are best-of-repeats, in seconds. Each parallel run includes starting the
+process pool and opening the file in each worker.
+"""
+import sys
+import os
+import time
+import argparse
+import logging
+import multiprocessing
+
+# as in the tests, source is found via path munging
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main", "python"
+))
+
+from ipfx.stimulus import StimulusOntology
+from ipfx.dataset.create import create_ephys_data_set
+from ipfx.data_set_features import extract_data_set_features
+
+from parallel_features import extract_features_parallel
+
+
+def best_time(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nwb_path", type=str, required=True)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+
+    ontology = StimulusOntology.default()
+    data_set = create_ephys_data_set(nwb_file=args.nwb_path, ontology=ontology)
+    sweep_info = data_set.sweep_info or data_set.sweep_table.to_dict(orient="records")
+    num_sweeps = len(data_set.filtered_sweep_table(clamp_mode=data_set.CURRENT_CLAMP))
+
+    print(f"{args.nwb_path}: {num_sweeps} current clamp sweeps")
+
+    serial = best_time(lambda: extract_data_set_features(data_set), args.repeats)
+    print(f"serial:{serial:>12.2f} s")
+
+    for num_workers in args.workers:
+        parallel = best_time(
+            lambda: extract_features_parallel(
+                data_set, args.nwb_path, ontology, sweep_info, num_workers
+            ),
+            args.repeats
+        )
+        print(
+            f"{num_workers:>2} workers:{parallel:>8.2f} s "
+            f"(speedup {serial / parallel:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,121 @@
+""" Compare extracting sweep plot data one sweep at a time with the batched,
+vectorized SweepPlotter.popup_plotters. Run as:
+
+    python src/benchmark/benchmark_sweep_plot_data.py --nwb_path cell.nwb
+
+or, without an NWB file, on synthetic sweeps:
+
+    python src/benchmark/benchmark_sweep_plot_data.py --num_sweeps 200 --num_samples 200000
+
+Times are best-of-repeats, in seconds, and exclude thumbnail rendering. Sweeps
+are read once up front, so that only plot data extraction is timed.
+"""
+import sys
+import os
+import time
+import argparse
+import logging
+
+import numpy as np
+
+# as in the tests, source is found via path munging
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main", "python"
+))
+
+from ipfx.sweep import Sweep
+from ipfx.stimulus import StimulusOntology
+from ipfx.dataset.create import create_ephys_data_set
+
+from sweep_plotter import SweepPlotter, SweepPlotConfig
+
+
+class PreloadedDataSet:
+    """ Serves sweeps from memory, so that reading them is not timed
+    """
+
+    def __init__(self, sweeps):
+        self.sweeps = sweeps
+
+    def sweep(self, sweep_number):
+        return self.sweeps[sweep_number]
+
+
+def synthetic_sweeps(num_sweeps, num_samples, sampling_rate):
+    t = np.arange(num_samples) / sampling_rate
+    i = np.zeros(num_samples)
+    i[num_samples // 20: num_samples // 10] = 1.0
+    i[num_samples // 3: 2 * num_samples // 3] = -2.0
+
+    return {
+        sweep_number: Sweep(
+            t, np.sin(t * sweep_number) - 70.0, i, "CurrentClamp", sampling_rate
+        )
+        for sweep_number in range(num_sweeps)
+    }
+
+
+def nwb_sweeps(nwb_path):
+    data_set = create_ephys_data_set(
+        nwb_file=nwb_path, ontology=StimulusOntology.default()
+    )
+    sweep_table = data_set.filtered_sweep_table(clamp_mode=data_set.CURRENT_CLAMP)
+    return {
+        sweep_number: data_set.sweep(sweep_number)
+        for sweep_number in sweep_table["sweep_number"]
+    }
+
+
+def best_time(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nwb_path", type=str, default=None)
+    parser.add_argument("--num_sweeps", type=int, default=100)
+    parser.add_argument("--num_samples", type=int, default=100000)
+    parser.add_argument("--sampling_rate", type=float, default=50000.0)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+
+    if args.nwb_path is not None:
+        sweeps = nwb_sweeps(args.nwb_path)
+        print(f"{args.nwb_path}: {len(sweeps)} current clamp sweeps")
+    else:
+        sweeps = synthetic_sweeps(
+            args.num_sweeps, args.num_samples, args.sampling_rate
+        )
+        print(f"{len(sweeps)} synthetic sweeps of {args.num_samples} samples")
+
+    data_set = PreloadedDataSet(sweeps)
+    sweep_numbers = sorted(sweeps)
+    positions = range(len(sweep_numbers))
+    config = SweepPlotConfig(0.0, 0.1, 100, 5000, 5000, 9000, 1)
+
+    def per_sweep():
+        plotter = SweepPlotter(data_set, config)
+        for position in positions:
+            sweep = data_set.sweep(sweep_numbers[position])
+            plotter.test_pulse_plotter_at(sweep_numbers, position, sweep)
+            plotter.experiment_plotter(sweep_numbers[position], sweep)
+
+    def batched():
+        SweepPlotter(data_set, config).popup_plotters(sweep_numbers, positions)
+
+    loop_time = best_time(per_sweep, args.repeats)
+    batch_time = best_time(batched, args.repeats)
+
+    print(f"per sweep:{loop_time:>10.4f} s")
+    print(f"batched:{batch_time:>12.4f} s (speedup {loop_time / batch_time:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
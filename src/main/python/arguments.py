@@ -0,0 +1,69 @@
+""" Command line options shared by the gui (main) and the headless batch
+processor (batch), so that plots generated by one can be reused by the other.
+"""
+import argparse
+
+from sweep_plotter import SweepPlotConfig, THUMBNAIL_FORMATS, THUMBNAIL_RENDERERS
+from thumbnail_cache import DEFAULT_CACHE_DIR
+
+
+def add_sweep_plot_arguments(parser: argparse.ArgumentParser):
+    """ Options determining how sweeps are plotted. See sweep_plot_config.
+    """
+
+    parser.add_argument("--backup_experiment_start_index", type=int, default=5000,
+        help="when plotting experiment pulses, where to set the start index if it is erroneously stored as <= 0"
+    )
+    parser.add_argument("--experiment_baseline_start_index", type=int, default=5000,
+        help="when plotting experiment pulses, where to start the baseline assessment epoch"
+    )
+    parser.add_argument("--experiment_baseline_end_index", type=int, default=9000,
+        help="when plotting experiment pulses, where to end the baseline assessment epoch"
+    )
+    parser.add_argument("--test_pulse_plot_start", type=float, default=0.04,
+        help="where in time (s) to start the test pulse plot"
+    )
+    parser.add_argument("--test_pulse_plot_end", type=float, default=0.1,
+        help="in seconds, the end time of the test pulse plot's domain"
+    )
+    parser.add_argument("--test_pulse_baseline_samples", type=int, default=100,
+        help="when plotting test pulses, how many samples to use for baseline assessment"
+    )
+    parser.add_argument("--thumbnail_step", type=float, default=20, 
+        help="step size for generating decimated thumbnail images for individual sweeps. Only used if thumbnail_buckets is 0."
+    )
+    parser.add_argument("--thumbnail_buckets", type=int, default=500,
+        help="thumbnail traces are reduced to their min and max over this many buckets of samples (roughly, the number of horizontal pixels). If 0, every thumbnail_step'th sample is used instead."
+    )
+    parser.add_argument("--thumbnail_format", type=str, default="svg", choices=THUMBNAIL_FORMATS,
+        help="how to store sweep thumbnails. svg thumbnails are vector images; pixmap thumbnails are rasterized at the size of their table cell."
+    )
+    parser.add_argument("--thumbnail_renderer", type=str, default="qpainter", choices=THUMBNAIL_RENDERERS,
+        help="how to draw sweep thumbnails. qpainter is much faster; matplotlib draws axis labels."
+    )
+    parser.add_argument("--thumbnail_workers", type=int, default=1,
+        help="number of processes used to render sweep thumbnails. If 1, thumbnails are rendered in the main process."
+    )
+
+
+def add_thumbnail_cache_arguments(parser: argparse.ArgumentParser):
+    """ Options determining where (and whether) sweep plots are cached
+    """
+
+    parser.add_argument("--thumbnail_cache_dir", type=str, default=DEFAULT_CACHE_DIR,
+        help="sweep plots are cached here, so that reopening an nwb file does not require regenerating them"
+    )
+    parser.add_argument("--thumbnail_cache_mb", type=int, default=1024,
+        help="approximate maximum size (MB) of the sweep plot cache. Least recently used plots are removed beyond this. If 0, plots are not cached."
+    )
+
+
+def sweep_plot_config(args: argparse.Namespace) -> SweepPlotConfig:
+    """ Build a plot configuration from parsed add_sweep_plot_arguments 
+    options.
+    """
+
+    return SweepPlotConfig(**{
+        field: getattr(args, field) for field in SweepPlotConfig._fields
+    })
+
@@ -0,0 +1,337 @@
+""" Headless batch processing of many NWB files. For each cell, qc features are
+extracted, auto qc is run, cell features are extracted and sweep plots are
+generated, and the results are written out so that later review in the gui
+can start from them. Nothing here imports Qt widgets, so batches can be run
+without a display (e.g. overnight, on a cluster).
+
+Each cell's qc results and sweep plots are also written to a review bundle
+(see review_bundle), which the gui reads when run with --review_bundle_dir
+pointing at the batch's output directory. For the gui to use the bundled
+plots, it must be run with the same plot options. If a thumbnail cache is
+configured, plots are written there too.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing as mp
+from concurrent.futures import as_completed
+from typing import NamedTuple, Optional, Dict, List, Sequence, Any
+
+import ipfx
+import ipfx.json_utilities as ju
+from ipfx.stimulus import StimulusOntology
+from ipfx.qc_feature_evaluator import DEFAULT_QC_CRITERIA_FILE
+
+from pre_fx_data import run_pre_fx_pipeline, fx_sweep_info
+from fx_data import extract_session_features
+from sweep_plotter import SweepPlotConfig, SweepPlotter
+from thumbnail_cache import ThumbnailCache
+from review_bundle import review_bundle_path, write_review_bundle
+from workers import SpawnProcessPool
+from arguments import (
+    add_sweep_plot_arguments, add_thumbnail_cache_arguments, sweep_plot_config
+)
+
+
+NWB_EXTENSION = ".nwb"
+MANIFEST_COMMENT = "#"
+
+QC_RESULTS_FILE = "qc_results.json"
+FEATURES_FILE = "features.json"
+SUMMARY_FILE = "batch_summary.json"
+
+
+class BatchSettings(NamedTuple):
+    """ Everything (other than the input file) determining how a cell is
+    processed. Must be picklable, since it is sent to each worker.
+    """
+    stimulus_ontology_data: List
+    qc_criteria: Dict
+    extract_features: bool = True
+    plot_config: Optional[SweepPlotConfig] = None
+    thumbnail_cache_dir: Optional[str] = None
+    thumbnail_cache_bytes: int = 0
+
+
+def find_nwb_files(inputs: Sequence[str]) -> List[str]:
+    """ Expand the inputs to a batch into a list of NWB files.
+
+    Parameters
+    ----------
+    inputs : each is one of:
+        - an NWB file
+        - a directory, which is searched (recursively) for NWB files
+        - a manifest: a text file listing one NWB file per line. Relative
+            paths are resolved against the manifest's directory. Blank lines
+            and lines starting with # are ignored.
+
+    Returns
+    -------
+    The NWB files, in order of appearance (and sorted within directories),
+    without duplicates
+
+    """
+
+    paths: List[str] = []
+
+    for input_path in inputs:
+        if os.path.isdir(input_path):
+            for directory, subdirectories, files in os.walk(input_path):
+                subdirectories.sort()
+                paths.extend(
+                    os.path.join(directory, name) for name in sorted(files)
+                    if name.lower().endswith(NWB_EXTENSION)
+                )
+
+        elif input_path.lower().endswith(NWB_EXTENSION):
+            paths.append(input_path)
+
+        else:
+            manifest_dir = os.path.dirname(os.path.abspath(input_path))
+            with open(input_path, "r") as manifest:
+                for line in manifest:
+                    line = line.strip()
+                    if line and not line.startswith(MANIFEST_COMMENT):
+                        paths.append(os.path.join(manifest_dir, line))
+
+    unique = {os.path.abspath(path): None for path in paths}
+    return list(unique)
+
+
+def cell_output_dir(output_dir: str, nwb_path: str) -> str:
+    """ Results for the cell recorded in nwb_path are written here
+    """
+    name = os.path.splitext(os.path.basename(nwb_path))[0]
+    return os.path.join(output_dir, name)
+
+
+def process_cell(
+    nwb_path: str,
+    output_dir: str,
+    settings: BatchSettings
+) -> Dict[str, Any]:
+    """ Run the full review pipeline on a single cell, writing its results
+    under output_dir (see cell_output_dir).
+
+    Parameters
+    ----------
+    nwb_path : the cell's data
+    output_dir : the batch's output directory
+    settings : determine how the cell is processed
+
+    Returns
+    -------
+    A summary of the cell's results, for the batch summary
+
+    """
+
+    start_time = time.monotonic()
+    cell_dir = cell_output_dir(output_dir, nwb_path)
+    os.makedirs(cell_dir, exist_ok=True)
+
+    ontology = StimulusOntology(settings.stimulus_ontology_data)
+    results = run_pre_fx_pipeline(nwb_path, ontology, settings.qc_criteria)
+
+    ju.write(os.path.join(cell_dir, QC_RESULTS_FILE), {
+        "input_nwb_file": nwb_path,
+        "qc_criteria": settings.qc_criteria,
+        "cell_features": results.cell_features,
+        "cell_tags": results.cell_tags,
+        "cell_state": results.cell_state,
+        "sweep_features": results.sweep_features,
+        "sweep_states": results.sweep_states,
+        "ipfx_version": ipfx.__version__
+    })
+
+    summary = {
+        "input_nwb_file": nwb_path,
+        "output_dir": cell_dir,
+        "cell_qc_failed": results.cell_state.get("failed_qc"),
+        "num_sweeps": len(results.sweep_states),
+        "num_sweeps_passed": sum(
+            bool(state["passed"]) for state in results.sweep_states
+        )
+    }
+
+    if settings.extract_features:
+        # as in the gui, features are extracted from the sweeps which passed
+        # (auto) qc
+        feature_data = extract_session_features(
+            results.session, 
+            fx_sweep_info(results.sweep_features, results.sweep_states)
+        )
+        ju.write(os.path.join(cell_dir, FEATURES_FILE), feature_data)
+        summary["feature_extraction_failed"] = \
+            feature_data["cell_state"]["failed_fx"]
+
+    # the sweep table plots every sweep with qc features, in order
+    sweep_numbers = sorted(
+        sweep["sweep_number"] for sweep in results.sweep_features
+    )
+    plots = None
+
+    if settings.plot_config is not None:
+        cache, cache_key = None, None
+        if settings.thumbnail_cache_dir and settings.thumbnail_cache_bytes > 0:
+            cache = ThumbnailCache(
+                settings.thumbnail_cache_dir, settings.thumbnail_cache_bytes
+            )
+            cache_key = cache.key(nwb_path, settings.plot_config, sweep_numbers)
+
+        plotter = SweepPlotter(
+            results.data_set, settings.plot_config, cache, cache_key
+        )
+        plots = {
+            sweep_numbers[position]: sweep_plots
+            for position, sweep_plots in plotter.plot_sweeps(sweep_numbers).items()
+        }
+        summary["num_sweeps_plotted"] = len(plots)
+
+    write_review_bundle(
+        review_bundle_path(output_dir, nwb_path),
+        nwb_path,
+        ontology,
+        settings.qc_criteria,
+        results.qc_features,
+        (
+            results.cell_state, results.cell_features,
+            results.sweep_states, results.sweep_features
+        ),
+        settings.plot_config,
+        sweep_numbers,
+        plots
+    )
+
+    summary["elapsed_seconds"] = time.monotonic() - start_time
+    return summary
+
+
+def run_batch(
+    nwb_paths: Sequence[str],
+    output_dir: str,
+    settings: BatchSettings,
+    num_workers: int = os.cpu_count() or 1
+) -> List[Dict[str, Any]]:
+    """ Process many cells, each in its own job on a pool of processes. A
+    failure while processing one cell does not affect the others.
+
+    Parameters
+    ----------
+    nwb_paths : the cells to process
+    output_dir : results are written under here. See process_cell.
+    settings : determine how each cell is processed
+    num_workers : size of the process pool. If 1, cells are processed in
+        this process.
+
+    Returns
+    -------
+    A summary of each cell's results (see process_cell), in the order of
+    nwb_paths. Cells which could not be processed are summarized by their
+    error.
+
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    summaries: Dict[str, Dict[str, Any]] = {}
+
+    def on_failure(nwb_path: str, err: Exception):
+        logging.error(f"failed to process {nwb_path}: {err}")
+        summaries[nwb_path] = {"input_nwb_file": nwb_path, "error": repr(err)}
+
+    if num_workers <= 1:
+        for nwb_path in nwb_paths:
+            try:
+                summaries[nwb_path] = process_cell(nwb_path, output_dir, settings)
+            except Exception as err:
+                on_failure(nwb_path, err)
+
+    else:
+        with SpawnProcessPool(num_workers) as executor:
+            futures = {
+                executor.submit(process_cell, nwb_path, output_dir, settings):
+                    nwb_path
+                for nwb_path in nwb_paths
+            }
+            for completed, future in enumerate(as_completed(futures), 1):
+                nwb_path = futures[future]
+                try:
+                    summaries[nwb_path] = future.result()
+                    logging.info(
+                        f"processed {nwb_path} ({completed}/{len(futures)})"
+                    )
+                except Exception as err:
+                    on_failure(nwb_path, err)
+
+    results = [summaries[nwb_path] for nwb_path in nwb_paths]
+    with open(os.path.join(output_dir, SUMMARY_FILE), "w") as summary_file:
+        json.dump(results, summary_file, indent=4, default=str)
+
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+
+    parser = argparse.ArgumentParser(
+        description="Run qc, feature extraction and sweep plotting over many "
+            "NWB files, without starting the gui."
+    )
+    parser.add_argument("inputs", type=str, nargs="+",
+        help="NWB files, directories containing NWB files, or manifests (text files listing one NWB file per line)"
+    )
+    parser.add_argument("--output_dir", type=str, required=True,
+        help="results for each cell are written to a subdirectory of this, named for its NWB file"
+    )
+    parser.add_argument("--stimulus_ontology_path", type=str,
+        default=StimulusOntology.DEFAULT_STIMULUS_ONTOLOGY_FILE,
+        help="load a stimulus ontology from here"
+    )
+    parser.add_argument("--qc_criteria_path", type=str, default=DEFAULT_QC_CRITERIA_FILE,
+        help="load qc criteria from here"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+        help="number of cells to process concurrently, each in its own process"
+    )
+    parser.add_argument("--skip_features", action="store_true",
+        help="do not extract cell features"
+    )
+    parser.add_argument("--skip_thumbnails", action="store_true",
+        help="do not generate sweep plots (neither in the thumbnail cache nor in review bundles)"
+    )
+    add_sweep_plot_arguments(parser)
+    add_thumbnail_cache_arguments(parser)
+
+    args = parser.parse_args(argv)
+
+    with open(args.stimulus_ontology_path, "r") as ontology_file:
+        stimulus_ontology_data = json.load(ontology_file)
+    with open(args.qc_criteria_path, "r") as criteria_file:
+        qc_criteria = json.load(criteria_file)
+
+    # cells are already processed concurrently, so each renders its
+    # thumbnails serially. This does not affect the cached plots.
+    plot_config = sweep_plot_config(args)._replace(thumbnail_workers=1)
+    make_plots = not args.skip_thumbnails
+
+    settings = BatchSettings(
+        stimulus_ontology_data=stimulus_ontology_data,
+        qc_criteria=qc_criteria,
+        extract_features=not args.skip_features,
+        plot_config=plot_config if make_plots else None,
+        thumbnail_cache_dir=args.thumbnail_cache_dir,
+        thumbnail_cache_bytes=args.thumbnail_cache_mb * 1024 ** 2
+    )
+
+    nwb_paths = find_nwb_files(args.inputs)
+    logging.info(f"processing {len(nwb_paths)} cells")
+
+    summaries = run_batch(nwb_paths, args.output_dir, settings, args.workers)
+    return int(any("error" in summary for summary in summaries))
+
+
+if __name__ == "__main__":
+    mp.freeze_support()
+    logging.getLogger().setLevel(logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,247 @@
+""" A single opened NWB file, shared by everything that reads from it.
+"""
+import logging
+import threading
+from typing import Optional, List, Dict, Callable, Any, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from ipfx.ephys_data_set import EphysDataSet
+from ipfx.sweep import Sweep, SweepSet
+from ipfx.dataset.ephys_data_interface import EphysDataInterface
+from ipfx.stimulus import StimulusOntology
+from ipfx.dataset.create import create_ephys_data_set
+
+from sweep_loader import SweepLoader, supports_bulk_reads
+
+
+class DeferredData:
+
+    def __init__(self, open_data: Callable[[], EphysDataInterface]):
+        """ Stands in for an EphysDataInterface, but only opens the
+        underlying data once something is read from it.
+
+        Parameters
+        ----------
+        open_data : called (once, from whichever thread first reads) to open
+            the underlying data
+
+        """
+
+        self._open_data = open_data
+        self._data: Optional[EphysDataInterface] = None
+        self._lock = threading.Lock()
+
+    @property
+    def opened(self) -> bool:
+        return self._data is not None
+
+    def open(self) -> EphysDataInterface:
+        """ The underlying data, which are opened if they have not been 
+        already.
+        """
+
+        with self._lock:
+            if self._data is None:
+                self._data = self._open_data()
+        return self._data
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.open(), name)
+
+
+class BulkEphysDataSet(EphysDataSet):
+
+    def __init__(self, *args, **kwargs):
+        """ An EphysDataSet which, where possible, reads sweeps from its NWB 
+        file many at a time (see sweep_loader.SweepLoader). Sweep data are 
+        the same as those read by an EphysDataSet, but the voltages and 
+        currents of sweeps read together are views into a shared buffer. 
+        Arguments are as for EphysDataSet.
+        """
+
+        super().__init__(*args, **kwargs)
+        self._loader: Optional[SweepLoader] = None
+        self._loader_lock = threading.Lock()
+
+    def loader(self) -> Optional[SweepLoader]:
+        """ Reads sweeps in bulk from this data set's file, or None if the 
+        underlying data do not support this (e.g. they do not come from an 
+        NWB file).
+        """
+
+        with self._loader_lock:
+            if self._loader is None:
+                data = self._data
+                if isinstance(data, DeferredData):
+                    data = data.open()
+                if supports_bulk_reads(data):
+                    self._loader = SweepLoader(data)
+        return self._loader
+
+    def sweeps(self, sweep_numbers: Sequence[int]) -> List[Sweep]:
+        """ Read several sweeps at once. Equivalent to (but faster than) 
+        calling sweep for each.
+        """
+
+        loader = self.loader()
+        if loader is None:
+            return [super(BulkEphysDataSet, self).sweep(num) for num in sweep_numbers]
+
+        sweep_data = loader.sweep_data(sweep_numbers)
+        return [
+            self._make_sweep(num, sweep_data[num], self._data.get_sweep_metadata(num))
+            for num in sweep_numbers
+        ]
+
+    def sweep(self, sweep_number: int) -> Sweep:
+        return self.sweeps([sweep_number])[0]
+
+    def sweep_set(
+        self, 
+        sweep_numbers: Union[Sequence[int], int, None] = None
+    ) -> SweepSet:
+        """ As EphysDataSet.sweep_set, but reads all of the sweeps at once.
+        """
+
+        if sweep_numbers is None:
+            sweep_numbers = self._data.sweep_numbers
+        elif not hasattr(sweep_numbers, "__len__"):
+            sweep_numbers = [sweep_numbers]
+
+        return SweepSet(self.sweeps(sweep_numbers))
+
+    def _make_sweep(self, sweep_number: int, sweep_data: Dict, sweep_metadata: Dict) -> Sweep:
+        """ Build a sweep from its data, as EphysDataSet.sweep does.
+        """
+
+        time = np.arange(
+            len(sweep_data["stimulus"])
+        ) / sweep_data["sampling_rate"]
+
+        voltage, current = type(self)._voltage_current(
+            sweep_data["stimulus"],
+            sweep_data["response"],
+            sweep_metadata["clamp_mode"],
+            enforce_equal_length=True,
+        )
+
+        try:
+            return Sweep(
+                t=time,
+                v=voltage,
+                i=current,
+                sampling_rate=sweep_data["sampling_rate"],
+                sweep_number=sweep_number,
+                clamp_mode=sweep_metadata["clamp_mode"],
+                epochs=sweep_data.get("epochs", None),
+            )
+        except Exception:
+            logging.warning("Error reading sweep %d" % sweep_number)
+            raise
+
+
+def read_sweeps(data_set: EphysDataSet, sweep_numbers: Sequence[int]) -> List[Sweep]:
+    """ Read several sweeps from a data set, all at once if it supports this 
+    (see BulkEphysDataSet).
+    """
+
+    if isinstance(data_set, BulkEphysDataSet):
+        return data_set.sweeps(sweep_numbers)
+    return [data_set.sweep(sweep_number) for sweep_number in sweep_numbers]
+
+
+class DataSetView(BulkEphysDataSet):
+
+    def __init__(self, base: EphysDataSet, sweep_info: Optional[List[Dict]] = None):
+        """ A data set restricted to (and annotated by) some sweep info, which
+        reads from another data set's already opened file and reuses its
+        sweep metadata, rather than opening and parsing the file again.
+
+        Parameters
+        ----------
+        base : an unfiltered data set. Its file and sweep table are shared.
+        sweep_info : as for EphysDataSet. Sweeps not described here are
+            excluded (unless this is empty, in which case all sweeps are
+            included).
+
+        """
+
+        super().__init__(data=base._data, sweep_info=sweep_info)
+        self._base = base
+
+    def loader(self) -> Optional[SweepLoader]:
+        """ The base data set's loader, if it has one (so that its sweep table 
+        is only searched once).
+        """
+
+        if isinstance(self._base, BulkEphysDataSet):
+            return self._base.loader()
+        return super().loader()
+
+    @property
+    def sweep_table(self) -> pd.DataFrame:
+        """ As EphysDataSet.sweep_table, but derived from the base data set's
+        table.
+        """
+
+        if not hasattr(self, "_sweep_table"):
+            base_table = self._base.sweep_table
+            if not self._sweep_info:
+                self._sweep_table = base_table
+            else:
+                sweeps = []
+                for sweep in base_table.to_dict(orient="records"):
+                    info = self._sweep_info.get(sweep[self.SWEEP_NUMBER])
+                    if info is not None:
+                        sweep.update(info)
+                        sweeps.append(sweep)
+                self._sweep_table = pd.DataFrame(sweeps)
+
+        return self._sweep_table
+
+
+class DataSetSession:
+
+    def __init__(
+        self, 
+        nwb_path: str, 
+        ontology: StimulusOntology, 
+        deferred: bool = False
+    ):
+        """ Opens an NWB file once, so that each stage of the pipeline (qc,
+        plotting, feature extraction) can read from it without reopening it.
+
+        Parameters
+        ----------
+        nwb_path : the file to open
+        ontology : used to categorize sweeps
+        deferred : if True, the file is not opened until it is first read 
+            from (which may be never, if everything needed has been 
+            precomputed)
+
+        """
+
+        self.nwb_path = nwb_path
+        self.ontology = ontology
+
+        if deferred:
+            self.data_set = BulkEphysDataSet(DeferredData(self._open_data))
+        else:
+            self.data_set = BulkEphysDataSet(self._open_data())
+
+    def _open_data(self) -> EphysDataInterface:
+        return create_ephys_data_set(
+            sweep_info=None,
+            nwb_file=self.nwb_path,
+            ontology=self.ontology
+        )._data
+
+    def view(self, sweep_info: Optional[List[Dict]] = None) -> EphysDataSet:
+        """ A data set restricted to some sweeps, sharing this session's open
+        file. See DataSetView.
+        """
+        return DataSetView(self.data_set, sweep_info)
@@ -1,30 +1,97 @@
+from collections import OrderedDict
+
 from PyQt5.QtWidgets import (
     QWidget,
     QStyledItemDelegate, QItemDelegate,
     QStyleOptionViewItem, QApplication, QStyle, QStyleOptionComboBox,
-    QComboBox
+    QComboBox, QAbstractItemView
 )
 from PyQt5.QtSvg import QSvgWidget, QSvgRenderer
 from PyQt5.QtGui import QStandardItemModel, QPainter
 from PyQt5.QtCore import (
     QModelIndex, QByteArray,
-    QRectF, QPoint
+    QRectF, QPoint, QEvent, pyqtSignal
 )
 from PyQt5 import QtCore
 
+from sweep_plotter import FixedPlots, RasterThumbnail
+
 
 class SvgDelegate(QStyledItemDelegate):
 
+    plots_requested = pyqtSignal(int, name="plots_requested")
+
+    PLACEHOLDER_TEXT = "loading..."
+
+    def __init__(self, *args, cache_size: int = 256, **kwargs):
+        """ Draws SVG thumbnails. Parsed renderers are cached (per FixedPlots 
+        object) so that repainting does not require re-parsing the SVG. Cells
+        whose plots have not yet been generated are drawn as placeholders, and
+        their rows reported via plots_requested.
+
+        Parameters
+        ----------
+        cache_size : 
+            retain at most this many renderers. The least recently used are 
+            evicted first.
+
+        """
+
+        super().__init__(*args, **kwargs)
+        self.cache_size = cache_size
+        self._renderers: OrderedDict = OrderedDict()
+
+    def get_renderer(self, plots: FixedPlots) -> QSvgRenderer:
+        """ Obtain a renderer for a FixedPlots object's thumbnail, parsing 
+        the SVG only if there is no cached renderer for these plots.
+        """
+
+        key = id(plots)
+        cached = self._renderers.get(key)
+
+        # the plots are stored alongside their renderer, so their id cannot
+        # be reused while the entry exists
+        if cached is not None and cached[0] is plots:
+            self._renderers.move_to_end(key)
+            return cached[1]
+
+        renderer = QSvgRenderer()
+        renderer.load(plots.thumbnail)
+
+        self._renderers[key] = (plots, renderer)
+        while len(self._renderers) > self.cache_size:
+            self._renderers.popitem(last=False)
+
+        return renderer
+
+    def clear_cache(self, *args, **kwargs):
+        """ Discard all cached renderers. Arguments are ignored, so that this 
+        can be connected to data-carrying signals.
+        """
+        self._renderers.clear()
+
     def paint(
             self,
             painter: QPainter,
             option: QStyleOptionViewItem,
             index: QModelIndex
     ):
-        value = index.data().thumbnail
-
-        renderer = QSvgRenderer()
-        renderer.load(value)
+        plots = index.data()
+        if plots is None:  # not yet generated
+            painter.drawText(
+                option.rect, QtCore.Qt.AlignCenter, self.PLACEHOLDER_TEXT
+            )
+            self.plots_requested.emit(index.row())
+            return
+
+        if isinstance(plots.thumbnail, RasterThumbnail):
+            painter.drawImage(
+                option.rect.topLeft(), 
+                plots.thumbnail.image(option.rect.width(), option.rect.height())
+            )
+            return
+
+        renderer = self.get_renderer(plots)
 
         bounds = QRectF(
             float(option.rect.x()),
@@ -37,9 +104,28 @@ class SvgDelegate(QStyledItemDelegate):
 
 
 class ComboBoxDelegate(QItemDelegate):
-    def __init__(self, owner, choices):
+
+    def __init__(self, owner, choices, single_click: bool = True):
+        """ Edits cells by choosing from a fixed list. Cells are painted to 
+        look like comboboxes, but an editor (a real combobox) is only created 
+        when a cell is interacted with, so that the number of widgets does 
+        not grow with the number of rows.
+
+        Parameters
+        ----------
+        owner : 
+            the view whose cells are edited
+        choices : 
+            the values which may be chosen
+        single_click :
+            if True, a single click on a cell opens its editor, with the list 
+            of choices shown. Otherwise, the view's edit triggers apply.
+
+        """
+
         super().__init__(owner)
         self.items = choices
+        self.single_click = single_click
 
     def createEditor(self, parent, option, index):
 
@@ -58,6 +144,28 @@ class ComboBoxDelegate(QItemDelegate):
         style.drawComplexControl(QStyle.CC_ComboBox, opt, painter)
         QItemDelegate.paint(self, painter, option, index)
 
+    def editorEvent(self, event, model, option, index) -> bool:
+        """ In single click mode, open an editor (and its list of choices) when 
+        the left mouse button is released over an editable cell.
+        """
+
+        view = self.parent()
+
+        if self.single_click \
+                and isinstance(view, QAbstractItemView) \
+                and event.type() == QEvent.MouseButtonRelease \
+                and event.button() == QtCore.Qt.LeftButton \
+                and index.flags() & QtCore.Qt.ItemIsEditable:
+
+            view.edit(index)
+
+            editor = view.indexWidget(index)
+            if isinstance(editor, QComboBox):
+                editor.showPopup()
+            return True
+
+        return super().editorEvent(event, model, option, index)
+
     def onActivated(self):
         """ Triggered when the user makes a selection. When that occurs, focus 
         is removed from the editing combobox, which in turn causes 
@@ -2,11 +2,12 @@ import sys
 from traceback import format_tb
 
 from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import QDialog, QGridLayout, QTextEdit, QPushButton, QLabel
 
 
 def exception_message(title: str, summary: str, exception: Exception):
-    traceback = r"<br \><br \>".join(format_tb(sys.exc_info()[-1]))
+    traceback = r"<br \><br \>".join(
+        format_tb(exception.__traceback__ or sys.exc_info()[-1])
+    )
     message = str(exception)
 
     details = f"<p><b>{message}</b></p><p>{traceback}</p>"
@@ -14,6 +15,12 @@ def exception_message(title: str, summary: str, exception: Exception):
 
             
 def error_message(title: str, summary: str, details: str):
+    # widgets are imported here, rather than with this module, so that 
+    # modules which report errors through it can be used without a gui
+    from PyQt5.QtWidgets import (
+        QDialog, QGridLayout, QTextEdit, QPushButton, QLabel
+    )
+
     dialog = QDialog()
     layout = QGridLayout()
 
@@ -1,9 +1,42 @@
-from PyQt5.QtCore import QObject, pyqtSignal
+import os
+import time
+from typing import Optional, Dict, List
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
 from ipfx.sweep_props import drop_failed_sweeps
 from ipfx.dataset.create import create_ephys_data_set
-from ipfx.error import FeatureError
 from ipfx.data_set_features import extract_data_set_features
+from ipfx.ephys_data_set import EphysDataSet
+from ipfx.stimulus import StimulusOntology
 from error_handling import exception_message
+from workers import Task, ProgressCallback, no_progress, run_in_process
+from data_set_session import DataSetSession
+from parallel_features import extract_features_parallel
+from pipeline_cache import StageCache
+from spike_cache import new_spike_cache, extract_cached_features
+
+
+# extract features on a worker thread, from the data set already opened for 
+# qc. Spike detection then shares the GIL with the GUI, but its results are
+# kept between extractions, so that a change to the qc state of one sweep 
+# does not require detecting spikes in all of the others.
+THREAD_EXTRACTION_MODE = "thread"
+
+# extract features in a separate process, which must reopen the nwb file
+PROCESS_EXTRACTION_MODE = "process"
+
+# extract features over a pool of processes, each of which must reopen the 
+# nwb file. Cell-level analyses and batches of sweeps are run concurrently.
+PARALLEL_EXTRACTION_MODE = "parallel"
+
+EXTRACTION_MODES = (
+    THREAD_EXTRACTION_MODE, PROCESS_EXTRACTION_MODE, PARALLEL_EXTRACTION_MODE
+)
+
+# when automatically refreshing, wait this long (ms) after the most recent 
+# change before extracting features, so that bursts of edits are coalesced
+DEFAULT_AUTO_REFRESH_DELAY = 1500
+
 
 class FxData(QObject):
 
@@ -12,15 +45,65 @@ class FxData(QObject):
 
     status_message = pyqtSignal(str, name="status_message")
 
-    def __init__(self):
+    task_started = pyqtSignal(name="task_started")
+    task_finished = pyqtSignal(name="task_finished")
+
+    def __init__(
+        self, 
+        extraction_mode: str = THREAD_EXTRACTION_MODE,
+        num_workers: int = os.cpu_count() or 1,
+        auto_refresh_delay: int = DEFAULT_AUTO_REFRESH_DELAY
+    ):
+        """ Stores the results of feature extraction, and runs it when 
+        requested.
+
+        Parameters
+        ----------
+        extraction_mode : one of EXTRACTION_MODES. Determines where features 
+            are extracted.
+        num_workers : number of processes used in the parallel extraction 
+            mode
+        auto_refresh_delay : if auto refresh is enabled, features are 
+            extracted once they have been out of date for this long (ms) 
+            without further changes
+
+        """
+
         super().__init__()
         self._state_out_of_date: bool = False
+        self.extraction_mode = extraction_mode
+        self.num_workers = num_workers
+        self.input_nwb_file: Optional[str] = None
+        self.sweep_info: List[Dict] = []
+        self._sweep_info_lookup: Dict[int, Dict] = {}
+        self.session: Optional[DataSetSession] = None
+
+        # spikes detected in each sweep (thread extraction mode only)
+        self.spike_cache: StageCache = new_spike_cache()
+
+        self._task: Optional[Task] = None
+        self._task_start_time: float = 0.0
+
+        # incremented whenever the inputs to feature extraction change, so
+        # that results computed from old inputs can be recognized
+        self._inputs_version: int = 0
+        self._task_inputs_version: int = 0
+
+        self.auto_refresh: bool = False
+        self._refresh_pending: bool = False
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(auto_refresh_delay)
+        self._refresh_timer.timeout.connect(self.on_refresh_timeout)
 
     def out_of_date(self):
         self.state_outdated.emit()
         self._state_out_of_date = True
 
-    
+        if self.auto_refresh:
+            self._refresh_timer.start()  # restarts if already running
+
+
     def new_state(self):
         self.new_state_set.emit(self.feature_data)
         self._state_out_of_date = False
@@ -31,43 +114,335 @@ class FxData(QObject):
                           ontology,
                           sweep_info,
                           cell_info,
+                          session=None
                           ):
 
         self.out_of_date()
+        self._inputs_version += 1
         self.input_nwb_file = nwb_path
         self.ontology = ontology
         self.sweep_info = sweep_info
+        self._sweep_info_lookup = {
+            sweep["sweep_number"]: sweep for sweep in self.sweep_info
+        }
         self.cell_info = cell_info
+        self.session = session
+
+    def set_auto_refresh(self, enabled: bool):
+        """ Determine whether features are automatically extracted (after a
+        delay) whenever they become out of date.
+        """
+
+        self.auto_refresh = enabled
+        if not enabled:
+            self._refresh_timer.stop()
+            self._refresh_pending = False
+        elif self._state_out_of_date:
+            self._refresh_timer.start()
+
+    def on_refresh_timeout(self):
+        """ Extract features automatically. Only the newest extraction is
+        kept in flight: if one is already running, it is cancelled and this
+        one started once it has stopped.
+        """
+
+        if not self.auto_refresh or self.input_nwb_file is None:
+            return
+
+        if self._task is not None:
+            self._refresh_pending = True
+            self.cancel_task()
+        else:
+            self.run_feature_extraction()
 
     def connect(self, pre_fx_data):
         pre_fx_data.data_changed.connect(self.set_fx_parameters)
+        pre_fx_data.sweep_state_updated.connect(self.on_sweep_state_updated)
+
+    def on_sweep_state_updated(self, sweep_number: int, passed: bool):
+        """ A single sweep's qc state has changed. Record the new state in 
+        sweep_info (which is this object's own copy; signal arguments are 
+        copied when emitted) and mark the features out of date.
+        """
+
+        sweep = self._sweep_info_lookup.get(sweep_number)
+        if sweep is not None:
+            sweep["passed"] = passed
+
+        self._inputs_version += 1
+        self.out_of_date()
 
     def run_feature_extraction(self):
+        """ Start extracting features (on a worker thread, or in a separate 
+        process, according to extraction_mode). Any extraction already in 
+        progress is cancelled. Progress is reported via status_message. New 
+        state is set once results arrive.
+        """
+
+        self.cancel_task()
+        self._refresh_timer.stop()
+        self._refresh_pending = False
         self.status_message.emit("Computing features, please wait.")
-        drop_failed_sweeps(self.sweep_info)
-        data_set = create_ephys_data_set(sweep_info=self.sweep_info,
-                                   nwb_file=self.input_nwb_file,
-                                   ontology=self.ontology)
-        try:
-            cell_features, sweep_features, cell_record, sweep_records,\
-                cell_state, feature_states = extract_data_set_features(data_set)
 
-            self.feature_data = {'cell_features': cell_features,
-                                 'sweep_features': sweep_features,
-                                 'cell_record': cell_record,
-                                 'sweep_records': sweep_records,
-                                 'cell_state': cell_state,
-                                 'feature_states': feature_states
-                                }
+        # extraction drops failed sweeps from its sweep_info, but they must 
+        # be kept here in case they are later passed
+        sweep_info = [dict(sweep) for sweep in self.sweep_info]
+
+        if self.extraction_mode == PARALLEL_EXTRACTION_MODE:
+            task = Task(
+                extract_parallel_features,
+                self.input_nwb_file,
+                self.ontology,
+                sweep_info,
+                self.session,
+                self.num_workers
+            )
+        elif self.extraction_mode == THREAD_EXTRACTION_MODE \
+                and self.session is not None:
+            task = Task(
+                extract_session_features,
+                self.session,
+                sweep_info,
+                spike_cache=self.spike_cache
+            )
+        else:
+            task = Task(
+                run_feature_extraction_process,
+                self.input_nwb_file,
+                self.ontology,
+                sweep_info
+            )
+        task.signals.progress.connect(self.on_task_progress)
+        task.signals.succeeded.connect(self.on_task_succeeded)
+        task.signals.failed.connect(self.on_task_failed)
+        task.signals.cancelled.connect(self.on_task_cancelled)
+        task.signals.finished.connect(self.on_task_finished)
+
+        self._task = task
+        self._task_start_time = time.monotonic()
+        self._task_inputs_version = self._inputs_version
+
+        task.start()
+        self.task_started.emit()
+
+    def cancel_task(self):
+        """ Request that the running feature extraction (if any) stop. Its
+        results will be discarded.
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+
+    def _is_current_task(self) -> bool:
+        """ Whether the sender of the signal currently being handled is the
+        most recently started task.
+        """
+        return self._task is not None and self.sender() is self._task.signals
+
+    def on_task_progress(self, message: str, completed: int, total: int):
+        if self._is_current_task():
+            elapsed = int(time.monotonic() - self._task_start_time)
+            self.status_message.emit(f"{message} ({elapsed} s)")
+
+    def on_task_succeeded(self, feature_data: Dict):
+        if not self._is_current_task():
+            return
+
+        # a newer extraction is already scheduled, so these are discarded
+        if self.auto_refresh and self._task_inputs_version != self._inputs_version:
+            return
+
+        self.feature_data = feature_data
+        self.new_state()
+        self.status_message.emit("Done computing features!")
+
+        # the inputs changed while features were being computed
+        if self._task_inputs_version != self._inputs_version:
+            self.out_of_date()
+
+    def on_task_failed(self, err: Exception):
+        if not self._is_current_task():
+            return
+
+        self.status_message.emit("Feature extraction failed")
+        exception_message("Feature extraction error",
+                          f"failed feature extraction",
+                          err
+                          )
+
+    def on_task_cancelled(self):
+        if self._is_current_task():
+            self.status_message.emit("Feature extraction cancelled")
+
+    def on_task_finished(self):
+        if self._is_current_task():
+            self._task = None
+            self.task_finished.emit()
+
+            if self._refresh_pending:
+                self.run_feature_extraction()
+
+
+def run_feature_extraction_process(
+    nwb_path: str,
+    ontology: StimulusOntology,
+    sweep_info: List[Dict],
+    progress: ProgressCallback = no_progress
+) -> Dict:
+    """ Extract features in a separate process, so that spike detection
+    neither blocks nor competes for the GIL with the GUI. See
+    extract_file_features for parameters.
+    """
+
+    return run_in_process(
+        extract_file_features,
+        nwb_path,
+        ontology,
+        sweep_info,
+        message="Computing features",
+        progress=progress
+    )
+
+
+def extract_parallel_features(
+    nwb_path: str,
+    ontology: StimulusOntology,
+    sweep_info: List[Dict],
+    session: Optional[DataSetSession],
+    num_workers: int,
+    progress: ProgressCallback = no_progress
+) -> Dict:
+    """ Extract cell and sweep features from the sweeps which passed qc, 
+    using a pool of processes. See parallel_features.extract_features_parallel.
+
+    Parameters
+    ----------
+    nwb_path :
+        each worker loads the data set from here
+    ontology :
+        used to categorize sweeps
+    sweep_info :
+        describes each sweep, including whether it passed qc. Will be
+        modified.
+    session :
+        if provided, used to plan the work without reopening the file
+    num_workers :
+        size of the process pool
+    progress :
+        called with (message, completed, total) while extraction runs
+
+    Returns
+    -------
+    A dictionary of feature extraction results
+
+    """
+
+    drop_failed_sweeps(sweep_info)
+    if session is not None:
+        data_set = session.view(sweep_info)
+    else:
+        data_set = create_ephys_data_set(sweep_info=sweep_info,
+                                         nwb_file=nwb_path,
+                                         ontology=ontology)
+
+    return feature_data_dict(*extract_features_parallel(
+        data_set, nwb_path, ontology, sweep_info, num_workers, progress
+    ))
+
+
+def extract_session_features(
+    session: DataSetSession,
+    sweep_info: List[Dict],
+    spike_cache: Optional[StageCache] = None,
+    progress: ProgressCallback = no_progress
+) -> Dict:
+    """ Extract cell and sweep features from the sweeps which passed qc,
+    reading from an already opened data set.
+
+    Parameters
+    ----------
+    session :
+        holds the opened data set
+    sweep_info :
+        describes each sweep, including whether it passed qc. Will be
+        modified.
+    spike_cache :
+        if provided, spikes detected in previous extractions are reused (and
+        those detected in this one stored). See spike_cache.
+    progress :
+        called with (message, completed, total) while extraction runs (if a 
+        spike_cache is provided; otherwise only once extraction begins)
+
+    Returns
+    -------
+    A dictionary of feature extraction results
+
+    """
+
+    progress("Computing features")
+    drop_failed_sweeps(sweep_info)
+    return extract_features(session.view(sweep_info), spike_cache, progress)
+
+
+def extract_file_features(
+    nwb_path: str,
+    ontology: StimulusOntology,
+    sweep_info: List[Dict]
+) -> Dict:
+    """ Extract cell and sweep features from the sweeps which passed qc
+
+    Parameters
+    ----------
+    nwb_path :
+        load the data set from here
+    ontology :
+        used to categorize sweeps
+    sweep_info :
+        describes each sweep, including whether it passed qc. Will be
+        modified.
+
+    Returns
+    -------
+    A dictionary of feature extraction results
+
+    """
+
+    drop_failed_sweeps(sweep_info)
+    data_set = create_ephys_data_set(sweep_info=sweep_info,
+                                     nwb_file=nwb_path,
+                                     ontology=ontology)
+    return extract_features(data_set)
+
 
-            self.new_state()
-            self.status_message.emit("Done computing features!")
+def extract_features(
+    data_set: EphysDataSet, 
+    spike_cache: Optional[StageCache] = None,
+    progress: ProgressCallback = no_progress
+) -> Dict:
+    """ Extract cell and sweep features from a data set, which ought to 
+    include only sweeps which passed qc. If a spike cache is provided, spike 
+    detection and cell-level analyses are memoized there, and progress is 
+    reported (so that extraction can be cancelled) as they run.
+    """
 
-        except (FeatureError, IndexError) as ferr:
-            exception_message("Feature extraction error",
-                              f"failed feature extraction",
-                              ferr
-                              )
+    if spike_cache is None:
+        return feature_data_dict(*extract_data_set_features(data_set))
+    return feature_data_dict(
+        *extract_cached_features(data_set, spike_cache, progress)
+    )
 
 
+def feature_data_dict(
+    cell_features, sweep_features, cell_record, sweep_records, 
+    cell_state, feature_states
+) -> Dict:
+    """ Package the outputs of extract_data_set_features
+    """
 
+    return {'cell_features': cell_features,
+            'sweep_features': sweep_features,
+            'cell_record': cell_record,
+            'sweep_records': sweep_records,
+            'cell_state': cell_state,
+            'feature_states': feature_states
+            }
@@ -0,0 +1,197 @@
+""" Draws simple, unlabeled line plots (such as sweep thumbnails) directly with
+QPainter. This is much cheaper than building a matplotlib figure and works on
+any thread (or in a worker process), since it only paints onto QImages and
+QSvgGenerators.
+"""
+from typing import NamedTuple, Sequence, Optional, Tuple, Iterator
+
+import numpy as np
+
+from PyQt5.QtCore import QBuffer, QIODevice, QRectF, QSize, Qt
+from PyQt5.QtGui import QColor, QImage, QPainter, QPaintDevice, QPen, QPolygonF
+
+
+# these match matplotlib's default subplot parameters, so that thumbnails
+# drawn here are laid out like those drawn by matplotlib
+AXES_LEFT = 0.125
+AXES_RIGHT = 0.9
+AXES_BOTTOM = 0.11
+AXES_TOP = 0.88
+
+# fraction of the data range padded onto each side of an autoscaled axis
+AXES_MARGIN = 0.05
+
+BACKGROUND_COLOR = "#ffffff"
+FRAME_COLOR = "#000000"
+
+
+class Line(NamedTuple):
+    x: np.ndarray
+    y: np.ndarray
+    color: str
+
+
+Limits = Tuple[float, float]
+
+
+def axes_rect(width: float, height: float) -> QRectF:
+    """ The region (px) of a width x height image occupied by the axes.
+    """
+
+    return QRectF(
+        AXES_LEFT * width,
+        (1.0 - AXES_TOP) * height,
+        (AXES_RIGHT - AXES_LEFT) * width,
+        (AXES_TOP - AXES_BOTTOM) * height
+    )
+
+
+def autoscale(arrays: Sequence[np.ndarray], margin: float = AXES_MARGIN) -> Limits:
+    """ Find padded limits which contain all finite values in some arrays.
+    """
+
+    low = min((np.nanmin(arr) for arr in arrays if arr.size), default=np.nan)
+    high = max((np.nanmax(arr) for arr in arrays if arr.size), default=np.nan)
+
+    if not np.isfinite(low) or not np.isfinite(high):
+        return 0.0, 1.0
+    if low == high:
+        return low - 0.5, high + 0.5
+
+    pad = (high - low) * margin
+    return low - pad, high + pad
+
+
+def finite_polylines(x: np.ndarray, y: np.ndarray) -> Iterator[QPolygonF]:
+    """ Break a line at its non-finite points, yielding each remaining run of
+    points as a polygon. Points are copied directly into the polygons' 
+    storage, rather than being constructed one at a time.
+    """
+
+    finite = np.isfinite(x) & np.isfinite(y)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], finite, [0]))))
+
+    for start, end in zip(edges[0::2], edges[1::2]):
+        num_points = int(end - start)
+        polygon = QPolygonF(num_points)
+        pointer = polygon.data()
+        pointer.setsize(num_points * 2 * np.dtype(np.float64).itemsize)
+
+        points = np.frombuffer(pointer, dtype=np.float64).reshape(-1, 2)
+        points[:, 0] = x[start: end]
+        points[:, 1] = y[start: end]
+
+        yield polygon
+
+
+def paint_lines(
+    painter: QPainter,
+    lines: Sequence[Line],
+    width: float,
+    height: float,
+    x_lim: Optional[Limits] = None,
+    y_lim: Optional[Limits] = None
+):
+    """ Draw a framed, unlabeled line plot.
+
+    Parameters
+    ----------
+    painter : used for drawing. Should be active on a width x height device
+    lines : drawn in order, so later lines appear on top
+    width, height : size (px) of the drawing area
+    x_lim, y_lim : data limits of the axes. Autoscaled if not provided.
+
+    """
+
+    x_lim = x_lim or autoscale([line.x for line in lines])
+    y_lim = y_lim or autoscale([line.y for line in lines])
+
+    rect = axes_rect(width, height)
+
+    painter.fillRect(QRectF(0, 0, width, height), QColor(BACKGROUND_COLOR))
+
+    painter.save()
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setClipRect(rect)
+
+    x_scale = rect.width() / (x_lim[1] - x_lim[0])
+    y_scale = rect.height() / (y_lim[1] - y_lim[0])
+
+    for line in lines:
+        if line.x.size == 0:
+            continue
+
+        x_px = rect.left() + (np.asarray(line.x, dtype=float) - x_lim[0]) * x_scale
+        y_px = rect.bottom() - (np.asarray(line.y, dtype=float) - y_lim[0]) * y_scale
+
+        pen = QPen(QColor(line.color), 1.0)
+        pen.setCosmetic(True)
+        painter.setPen(pen)
+        for polyline in finite_polylines(x_px, y_px):
+            painter.drawPolyline(polyline)
+
+    painter.restore()
+
+    frame_pen = QPen(QColor(FRAME_COLOR), 1.0)
+    frame_pen.setCosmetic(True)
+    painter.setPen(frame_pen)
+    painter.setBrush(Qt.NoBrush)
+    painter.drawRect(rect)
+
+
+def _paint_device(
+    device: QPaintDevice,
+    lines: Sequence[Line],
+    width: float,
+    height: float,
+    x_lim: Optional[Limits],
+    y_lim: Optional[Limits]
+):
+    painter = QPainter(device)
+    try:
+        paint_lines(painter, lines, width, height, x_lim, y_lim)
+    finally:
+        painter.end()
+
+
+def render_lines_image(
+    lines: Sequence[Line],
+    width: int,
+    height: int,
+    x_lim: Optional[Limits] = None,
+    y_lim: Optional[Limits] = None
+) -> QImage:
+    """ Draw a line plot onto a new width x height (px) image. See paint_lines
+    for parameters.
+    """
+
+    image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+    _paint_device(image, lines, width, height, x_lim, y_lim)
+    return image
+
+
+def render_lines_svg(
+    lines: Sequence[Line],
+    width: int,
+    height: int,
+    x_lim: Optional[Limits] = None,
+    y_lim: Optional[Limits] = None
+) -> bytes:
+    """ Draw a line plot as SVG with a width x height viewbox. See paint_lines
+    for parameters.
+    """
+
+    # QtSvg links against QtWidgets (though no widgets are created here), so
+    # it is only loaded when needed
+    from PyQt5.QtSvg import QSvgGenerator
+
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+
+    generator = QSvgGenerator()
+    generator.setOutputDevice(buffer)
+    generator.setSize(QSize(width, height))
+    generator.setViewBox(QRectF(0, 0, width, height))
+
+    _paint_device(generator, lines, width, height, x_lim, y_lim)
+    return bytes(buffer.data())
@@ -1,6 +1,7 @@
 import sys
 import argparse
 import os
+import multiprocessing
 from typing import Optional
 
 from PyQt5.QtWidgets import (
@@ -8,7 +9,9 @@ from PyQt5.QtWidgets import (
     QGraphicsView,
     QHeaderView,
     QVBoxLayout,
-    QLabel
+    QLabel,
+    QProgressBar,
+    QPushButton
 )
 from pyqtgraph import setConfigOption
 
@@ -17,8 +20,10 @@ from fbs_runtime.application_context.PyQt5 import ApplicationContext
 from sweep_table_view import SweepTableView
 from sweep_table_model import SweepTableModel
 from sweep_plotter import SweepPlotConfig
+from thumbnail_cache import ThumbnailCache
+from arguments import add_sweep_plot_arguments, add_thumbnail_cache_arguments
 from pre_fx_data import PreFxData
-from fx_data import FxData
+from fx_data import FxData, EXTRACTION_MODES
 from pre_fx_controller import PreFxController
 from cell_feature_page import CellFeaturePage
 
@@ -35,7 +40,13 @@ class SweepPage(QWidget):
         "experiment epoch"
     )
 
-    def __init__(self, sweep_plot_config: SweepPlotConfig):
+    def __init__(
+        self, 
+        sweep_plot_config: SweepPlotConfig, 
+        thumbnail_cache: Optional[ThumbnailCache] = None,
+        spill_traces: bool = True,
+        trace_store_dir: Optional[str] = None
+    ):
         """ Holds and displays a table view (and associated model) containing 
         information about individual sweeps. 
         """
@@ -43,7 +54,10 @@ class SweepPage(QWidget):
         super().__init__()
 
         self.sweep_view = SweepTableView(self.colnames)
-        self.sweep_model = SweepTableModel(self.colnames, sweep_plot_config)
+        self.sweep_model = SweepTableModel(
+            self.colnames, sweep_plot_config, thumbnail_cache, 
+            spill_traces, trace_store_dir
+        )
 
         self.sweep_view.setModel(self.sweep_model)
 
@@ -157,6 +171,7 @@ class MainWindow(QMainWindow):
         self.settings_menu.addAction(pre_fx_controller.show_qc_criteria_action)
 
         self.edit_menu.addAction(pre_fx_controller.run_feature_extraction_action)
+        self.edit_menu.addAction(pre_fx_controller.auto_refresh_features_action)
 
 
     def setup_status_bar(self, pre_fx_data: PreFxData, fx_data: FxData):
@@ -168,7 +183,16 @@ class MainWindow(QMainWindow):
         fx_status.setText("<font color='red'>cell features are outdated</font>")
         fx_status.hide()
 
+        self.task_progress_bar = QProgressBar(self)
+        self.task_progress_bar.setMaximumWidth(200)
+        self.task_progress_bar.hide()
+
+        self.cancel_task_button = QPushButton("cancel", self)
+        self.cancel_task_button.hide()
+
         status_bar = self.statusBar()
+        status_bar.addPermanentWidget(self.task_progress_bar)
+        status_bar.addPermanentWidget(self.cancel_task_button)
         status_bar.addPermanentWidget(fx_status)
 
         pre_fx_data.status_message.connect(status_bar.showMessage)
@@ -179,6 +203,41 @@ class MainWindow(QMainWindow):
         fx_data.state_outdated.connect(fx_status.show)
         fx_data.new_state_set.connect(fx_status.hide)
 
+        pre_fx_data.task_progress.connect(self.on_task_progress)
+        pre_fx_data.task_finished.connect(self.on_task_finished)
+        self.cancel_task_button.clicked.connect(pre_fx_data.cancel_task)
+
+        fx_data.task_started.connect(self.on_task_started)
+        fx_data.task_finished.connect(self.on_task_finished)
+        self.cancel_task_button.clicked.connect(fx_data.cancel_task)
+
+    def on_task_started(self):
+        """ Display an indeterminate progress bar for a background task, which
+        reports its own progress via status messages.
+        """
+
+        self.task_progress_bar.setMaximum(0)
+        self.task_progress_bar.show()
+        self.cancel_task_button.show()
+
+    def on_task_progress(self, message: str, completed: int, total: int):
+        """ Display the progress of a background task. If total is 0, progress 
+        is shown as indeterminate.
+        """
+
+        self.statusBar().showMessage(
+            f"{message} ({completed}/{total})" if total else message
+        )
+
+        self.task_progress_bar.setMaximum(total)
+        self.task_progress_bar.setValue(completed)
+        self.task_progress_bar.show()
+        self.cancel_task_button.show()
+
+    def on_task_finished(self):
+        self.task_progress_bar.hide()
+        self.cancel_task_button.hide()
+
 class Application(object):
 
     def __init__(
@@ -191,6 +250,18 @@ class Application(object):
         test_pulse_plot_end: float, 
         test_pulse_baseline_samples: int,
         thumbnail_step: int,
+        thumbnail_buckets: int,
+        thumbnail_format: str,
+        thumbnail_renderer: str,
+        thumbnail_workers: int,
+        thumbnail_cache_dir: str,
+        thumbnail_cache_mb: int,
+        keep_traces_in_memory: bool,
+        trace_store_dir: Optional[str],
+        feature_extraction_mode: str,
+        feature_extraction_workers: int,
+        auto_refresh_features: bool,
+        review_bundle_dir: Optional[str],
         initial_nwb_path: Optional[str],
         initial_stimulus_ontology_path: Optional[str],
         initial_qc_criteria_path: Optional[str]
@@ -204,15 +275,31 @@ class Application(object):
             backup_experiment_start_index,
             experiment_baseline_start_index, 
             experiment_baseline_end_index,
-            thumbnail_step
+            thumbnail_step,
+            thumbnail_workers,
+            thumbnail_format,
+            thumbnail_renderer,
+            thumbnail_buckets
         )
 
+        thumbnail_cache = None
+        if thumbnail_cache_mb > 0:
+            thumbnail_cache = ThumbnailCache(
+                thumbnail_cache_dir, thumbnail_cache_mb * 1024 ** 2
+            )
+
         # initialize components
         self.main_window = MainWindow()
         self.pre_fx_controller: PreFxController = PreFxController()
         self.pre_fx_data: PreFxData = PreFxData()
-        self.fx_data: FxData = FxData()
-        self.sweep_page = SweepPage(sweep_plot_config)
+        self.pre_fx_data.review_bundle_dir = review_bundle_dir
+        self.fx_data: FxData = FxData(
+            feature_extraction_mode, feature_extraction_workers
+        )
+        self.sweep_page = SweepPage(
+            sweep_plot_config, thumbnail_cache, 
+            not keep_traces_in_memory, trace_store_dir
+        )
         self.feature_page = CellFeaturePage()
         self.plot_page = PlotPage()
         self.status_bar = self.main_window.statusBar()
@@ -228,6 +315,8 @@ class Application(object):
         self.feature_page.connect(self.fx_data)
 
         self.main_window.setup_status_bar(self.pre_fx_data, self.fx_data)
+        self.app_cntxt.app.aboutToQuit.connect(self.sweep_page.sweep_model.shutdown)
+        self.pre_fx_controller.auto_refresh_features_action.setChecked(auto_refresh_features)
 
         # initialize default data
         self.pre_fx_data.set_default_stimulus_ontology()
@@ -248,32 +337,34 @@ class Application(object):
 
 
 if __name__ == '__main__':
+    # thumbnails are rendered in worker processes, which need this when frozen
+    multiprocessing.freeze_support()
+
     import logging; logging.getLogger().setLevel(logging.INFO)
 
     setConfigOption("background", "w")
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--output_dir", default=os.getcwd(), type=str, help="output path for manual states")
-    parser.add_argument("--backup_experiment_start_index", type=int, default=5000,
-        help="when plotting experiment pulses, where to set the start index if it is erroneously stored as <= 0"
-    )
-    parser.add_argument("--experiment_baseline_start_index", type=int, default=5000,
-        help="when plotting experiment pulses, where to start the baseline assessment epoch"
+    add_sweep_plot_arguments(parser)
+    add_thumbnail_cache_arguments(parser)
+    parser.add_argument("--keep_traces_in_memory", action="store_true",
+        help="hold the full-resolution traces behind sweep popup plots in memory, rather than in a temporary file. Faster to open popups, but memory use grows with the number of sweeps."
     )
-    parser.add_argument("--experiment_baseline_end_index", type=int, default=9000,
-        help="when plotting experiment pulses, where to end the baseline assessment epoch"
+    parser.add_argument("--trace_store_dir", type=str, default=None,
+        help="create the temporary file holding sweep popup traces here. Defaults to the system's temporary directory."
     )
-    parser.add_argument("--test_pulse_plot_start", type=float, default=0.04,
-        help="where in time (s) to start the test pulse plot"
+    parser.add_argument("--feature_extraction_mode", type=str, default="thread", choices=EXTRACTION_MODES,
+        help="where to extract cell features. thread reuses the nwb file opened for qc; process reopens it in a separate process, which does not compete with the gui for the GIL; parallel distributes sweeps over feature_extraction_workers processes."
     )
-    parser.add_argument("--test_pulse_plot_end", type=float, default=0.1,
-        help="in seconds, the end time of the test pulse plot's domain"
+    parser.add_argument("--feature_extraction_workers", type=int, default=os.cpu_count() or 1,
+        help="number of processes used to extract features in the parallel feature extraction mode"
     )
-    parser.add_argument("--test_pulse_baseline_samples", type=int, default=100,
-        help="when plotting test pulses, how many samples to use for baseline assessment"
+    parser.add_argument("--auto_refresh_features", action="store_true",
+        help="automatically extract cell features shortly after they become outdated (e.g. after manual qc edits), rather than waiting for Edit -> Run feature extraction. Can also be toggled from the Edit menu."
     )
-    parser.add_argument("--thumbnail_step", type=float, default=20, 
-        help="step size for generating decimated thumbnail images for individual sweeps."
+    parser.add_argument("--review_bundle_dir", type=str, default=None,
+        help="a batch output directory (see batch.py). When an nwb file is opened, its precomputed qc results and sweep plots are read from here, if they are up to date."
     )
     parser.add_argument("--initial_nwb_path", type=str, default=None, 
         help="upon start, immediately load an nwb file from here"
@@ -0,0 +1,251 @@
+""" Feature extraction distributed over a pool of processes. The work done is
+the same as ipfx.data_set_features.extract_data_set_features, and the results
+have the same form, but the cell-level analyses and sweep-level spike
+detection run concurrently.
+"""
+import math
+import time
+import multiprocessing as mp
+from multiprocessing.pool import AsyncResult
+from typing import Dict, List, Optional, Tuple, Any
+
+from ipfx.ephys_data_set import EphysDataSet
+from ipfx.stimulus import StimulusOntology
+from ipfx.dataset.create import create_ephys_data_set
+from ipfx.data_set_features import (
+    extract_cell_long_square_features, extract_cell_short_square_features,
+    extract_cell_ramp_features, extract_sweep_features,
+    detection_parameters_from_stimulus_name
+)
+import ipfx.feature_record as fr
+import ipfx.logging_utils as lu
+
+from workers import ProgressCallback, no_progress
+
+
+# (result, {"failed_fx": bool, "fail_fx_message": str or None}), as returned
+# by ipfx's extraction functions
+StatefulResult = Tuple[Any, Dict]
+
+CELL_FEATURE_EXTRACTORS = {
+    "long_squares": extract_cell_long_square_features,
+    "short_squares": extract_cell_short_square_features,
+    "ramps": extract_cell_ramp_features
+}
+
+# each worker is given about this many batches of sweeps, so that the load
+# stays balanced when some sweeps take longer than others
+BATCHES_PER_WORKER = 4
+
+# how often (s) to report progress (and so check for cancellation)
+POLL_INTERVAL = 0.25
+
+# opened once in each worker process. See _init_worker
+_worker_data_set: Optional[EphysDataSet] = None
+_worker_open_error: Optional[Exception] = None
+
+
+def plan_sweep_batches(data_set: EphysDataSet, num_batches: int) -> List[List[int]]:
+    """ Divide the current clamp sweeps of a data set into batches which can
+    be processed independently.
+
+    Parameters
+    ----------
+    data_set : contains the sweeps to be processed
+    num_batches : aim for about this many batches
+
+    Returns
+    -------
+    A list of batches of sweep numbers. Spike detection parameters are
+    estimated from whole stimulus groups if est_window is set, so such
+    groups are never split.
+
+    """
+
+    sweep_table = data_set.filtered_sweep_table(clamp_mode=data_set.CURRENT_CLAMP)
+    groups = sweep_table.groupby(data_set.STIMULUS_NAME)[data_set.SWEEP_NUMBER]
+
+    whole_groups: List[List[int]] = []
+    splittable: List[int] = []
+
+    for stimulus_name, sweep_numbers in groups:
+        sweep_numbers = sorted(sweep_numbers)
+        params = detection_parameters_from_stimulus_name(stimulus_name)
+        if params.get("est_window") is not None:
+            whole_groups.append(sweep_numbers)
+        else:
+            splittable.extend(sweep_numbers)
+
+    splittable.sort()
+    batch_size = max(math.ceil(len(splittable) / max(num_batches, 1)), 1)
+    split = [
+        splittable[start: start + batch_size]
+        for start in range(0, len(splittable), batch_size)
+    ]
+
+    return whole_groups + split
+
+
+def extract_features_parallel(
+    data_set: EphysDataSet,
+    nwb_path: str,
+    ontology: StimulusOntology,
+    sweep_info: List[Dict],
+    num_workers: int,
+    progress: ProgressCallback = no_progress
+) -> Tuple[Dict, Dict, Dict, List[Dict], Dict, Dict]:
+    """ Extract cell and sweep features using a pool of processes.
+
+    Parameters
+    ----------
+    data_set : the sweeps described by sweep_info. Used (in this process) to
+        plan the work and build feature records.
+    nwb_path : each worker opens the data set from here
+    ontology : used to categorize sweeps
+    sweep_info : restricts the extracted sweeps (e.g. to those which passed
+        qc)
+    num_workers : size of the process pool
+    progress : called with (message, completed, total) every POLL_INTERVAL
+        seconds while jobs are running
+
+    Returns
+    -------
+    As ipfx.data_set_features.extract_data_set_features: (cell_features,
+        sweep_features, cell_record, sweep_records, cell_state,
+        feature_states)
+
+    """
+
+    batches = plan_sweep_batches(data_set, num_workers * BATCHES_PER_WORKER)
+
+    pool = mp.get_context("spawn").Pool(
+        processes=num_workers,
+        initializer=_init_worker,
+        initargs=(nwb_path, ontology, sweep_info)
+    )
+    finished = False
+
+    try:
+        cell_jobs: Dict[str, AsyncResult] = {
+            name: pool.apply_async(_extract_cell_features, (name,))
+            for name in CELL_FEATURE_EXTRACTORS
+        }
+        sweep_jobs: List[AsyncResult] = [
+            pool.apply_async(_extract_sweep_features, (batch,)) 
+            for batch in batches
+        ]
+
+        pending = list(cell_jobs.values()) + sweep_jobs
+        num_jobs = len(pending)
+        while pending:
+            progress("Extracting features", num_jobs - len(pending), num_jobs)
+            time.sleep(POLL_INTERVAL)
+
+            for job in [job for job in pending if job.ready()]:
+                job.get()  # raise errors as soon as possible
+                pending.remove(job)
+
+        finished = True
+        return merge_feature_results(
+            data_set,
+            {name: job.get() for name, job in cell_jobs.items()},
+            [job.get() for job in sweep_jobs]
+        )
+
+    finally:
+        # on failure or cancellation (progress raising), running jobs are 
+        # killed along with their workers
+        if finished:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
+
+
+def merge_feature_results(
+    data_set: EphysDataSet,
+    cell_results: Dict[str, StatefulResult],
+    sweep_results: List[StatefulResult]
+) -> Tuple[Dict, Dict, Dict, List[Dict], Dict, Dict]:
+    """ Combine separately computed results into the output of
+    extract_data_set_features (whose final steps this mirrors).
+
+    Parameters
+    ----------
+    data_set : the sweeps from which features were extracted
+    cell_results : maps names in CELL_FEATURE_EXTRACTORS to their results
+    sweep_results : the results of extract_sweep_features on each batch of
+        sweeps
+
+    """
+
+    cell_state = {"failed_fx": False, "fail_fx_message": None}
+    feature_states = {}
+    cell_features = {}
+
+    for name in CELL_FEATURE_EXTRACTORS:
+        cell_features[name], feature_states[f"{name}_state"] = cell_results[name]
+
+    # as in extract_sweep_features, any failure discards all sweep features
+    sweep_features: Dict = {}
+    sweep_state = {"failed_fx": False, "fail_fx_message": None}
+    for features, state in sweep_results:
+        if state["failed_fx"]:
+            sweep_features, sweep_state = {}, state
+            break
+        sweep_features.update(features)
+    feature_states["sweep_features_state"] = sweep_state
+
+    # shuffle peak deflection for the subthreshold long squares
+    if not feature_states["long_squares_state"]["failed_fx"]:
+        for sweep in cell_features["long_squares"]["subthreshold_sweeps"]:
+            sweep_features[sweep["sweep_number"]]["peak_deflect"] = sweep["peak_deflect"]
+
+    # if all failed, set cell state to failed
+    if all(state["failed_fx"] for state in feature_states.values()):
+        cell_state["failed_fx"] = True
+        cell_state["fail_fx_message"] = "; ".join(
+            state["fail_fx_message"] for state in feature_states.values()
+        )
+
+    cell_record = fr.build_cell_feature_record(cell_features)
+    sweep_records = fr.build_sweep_feature_record(data_set.sweep_table, sweep_features)
+
+    return (cell_features, sweep_features, cell_record, sweep_records,
+            cell_state, feature_states)
+
+
+def _init_worker(nwb_path: str, ontology: StimulusOntology, sweep_info: List[Dict]):
+    """ Open the data set in a worker process, once for all of its jobs. 
+    Errors are raised by the jobs (see _get_worker_data_set), since a pool 
+    whose initializer raises restarts the failed worker indefinitely.
+    """
+
+    global _worker_data_set, _worker_open_error
+    try:
+        _worker_data_set = create_ephys_data_set(
+            sweep_info=sweep_info,
+            nwb_file=nwb_path,
+            ontology=ontology
+        )
+    except Exception as err:
+        _worker_open_error = err
+
+
+def _get_worker_data_set() -> EphysDataSet:
+    if _worker_open_error is not None:
+        raise _worker_open_error
+    return _worker_data_set
+
+
+def _extract_cell_features(name: str) -> StatefulResult:
+    data_set = _get_worker_data_set()
+    lu.log_pretty_header("Analyzing cell features:", level=2)
+    return CELL_FEATURE_EXTRACTORS[name](data_set)
+
+
+def _extract_sweep_features(sweep_numbers: List[int]) -> StatefulResult:
+    data_set = _get_worker_data_set()
+    sweep_table = data_set.filtered_sweep_table(clamp_mode=data_set.CURRENT_CLAMP)
+    sweep_table = sweep_table[sweep_table[data_set.SWEEP_NUMBER].isin(sweep_numbers)]
+    return extract_sweep_features(data_set, sweep_table)
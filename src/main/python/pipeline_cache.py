@@ -0,0 +1,123 @@
+""" In-memory memoization of the stages of the pre-fx pipeline, keyed by
+their inputs, so that unchanged stages need not be recomputed when a
+different input changes (or when the same file is reloaded).
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from ipfx.stimulus import StimulusOntology
+
+
+FileIdentity = Tuple[str, int, int]
+
+
+def file_identity(path: str) -> FileIdentity:
+    """ Identify a file by its absolute path, size and modification time.
+    If any of these change, the file is assumed to have changed.
+    """
+
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+def hash_json(data: Any) -> str:
+    """ Hash json-serializable data, independently of dictionary ordering.
+    """
+
+    serialized = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha1(serialized.encode()).hexdigest()
+
+
+def ontology_hash(ontology: StimulusOntology) -> str:
+    """ Hash the stimulus definitions making up an ontology.
+    """
+    return hash_json([stimulus.tag_sets for stimulus in ontology.stimuli])
+
+
+class StageCache:
+
+    def __init__(self, max_entries: Dict[str, int]):
+        """ Memoizes the results of named pipeline stages. Each stage keeps
+        its most recently used results, up to a stage-specific count.
+        Lookups may be made from any thread.
+
+        Parameters
+        ----------
+        max_entries : maps stage names to the number of results to keep for
+            that stage. Stages not listed here are never cached.
+
+        """
+
+        self.max_entries = max_entries
+
+        self.hits: Dict[str, int] = {stage: 0 for stage in max_entries}
+        self.misses: Dict[str, int] = {stage: 0 for stage in max_entries}
+
+        self._results: Dict[str, OrderedDict] = {
+            stage: OrderedDict() for stage in max_entries
+        }
+        self._lock = threading.Lock()
+
+    def get_or_compute(
+        self,
+        stage: str,
+        key: Hashable,
+        compute: Callable[[], Any]
+    ) -> Any:
+        """ Obtain the result of a stage for some inputs, computing (and
+        storing) it if necessary.
+
+        Parameters
+        ----------
+        stage : the name of the stage
+        key : identifies all inputs to the stage
+        compute : called with no arguments to produce the result on a miss
+
+        """
+
+        if stage not in self._results:
+            return compute()
+
+        with self._lock:
+            results = self._results[stage]
+            if key in results:
+                results.move_to_end(key)
+                self.hits[stage] += 1
+                logging.debug(f"pipeline stage {stage}: cache hit")
+                return results[key]
+
+            self.misses[stage] += 1
+
+        logging.debug(f"pipeline stage {stage}: cache miss")
+        result = compute()
+
+        with self._lock:
+            results[key] = result
+            results.move_to_end(key)
+            while len(results) > self.max_entries[stage]:
+                results.popitem(last=False)
+
+        return result
+
+    def clear(self):
+        """ Forget all stored results. Counters are kept.
+        """
+
+        with self._lock:
+            for results in self._results.values():
+                results.clear()
+
+    def stats(self) -> Dict[str, Tuple[int, int]]:
+        """ (hits, misses) for each stage
+        """
+
+        with self._lock:
+            return {
+                stage: (self.hits[stage], self.misses[stage])
+                for stage in self.max_entries
+            }
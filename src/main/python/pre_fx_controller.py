@@ -86,6 +86,9 @@ class PreFxController(QWidget):
 
         self.run_feature_extraction_action = QAction("Run feature extraction", self)
 
+        self.auto_refresh_features_action = QAction("Automatically refresh cell features", self)
+        self.auto_refresh_features_action.setCheckable(True)
+
         self.on_stimulus_ontology_unset()
         self.on_qc_criteria_unset()
         self.on_data_set_unset()
@@ -110,6 +113,7 @@ class PreFxController(QWidget):
         self.selected_manual_states_path.connect(pre_fx_data.save_manual_states_to_json)
 
         self.run_feature_extraction_action.triggered.connect(fx_data.run_feature_extraction)
+        self.auto_refresh_features_action.toggled.connect(fx_data.set_auto_refresh)
 
         # data -> controller
         pre_fx_data.stimulus_ontology_set.connect(self.on_stimulus_ontology_set)
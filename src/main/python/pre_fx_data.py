@@ -2,21 +2,73 @@ import json
 import logging
 import os
 import copy
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, NamedTuple, Hashable, Tuple
 import ipfx
 from PyQt5.QtCore import QObject, pyqtSignal
 
 from ipfx.ephys_data_set import EphysDataSet
-from ipfx.qc_feature_extractor import cell_qc_features, sweep_qc_features
+from ipfx.qc_feature_extractor import (
+    cell_qc_features, check_sweep_integrity, 
+    current_clamp_sweep_stim_features, current_clamp_sweep_qc_features
+)
 from ipfx.qc_feature_evaluator import qc_experiment, DEFAULT_QC_CRITERIA_FILE
 from ipfx.bin.run_qc import qc_summary
 from ipfx.stimulus import StimulusOntology, Stimulus
-from ipfx.dataset.create import create_ephys_data_set
+from ipfx.sweep import Sweep
 from ipfx.sweep_props import drop_tagged_sweeps
 import ipfx.sweep_props as sweep_props
 from error_handling import exception_message
 from marshmallow import ValidationError
 from schemas import PipelineParameters
+from workers import Task, ProgressCallback, no_progress
+from pipeline_cache import StageCache, file_identity, hash_json, ontology_hash
+from data_set_session import DataSetSession, read_sweeps
+from review_bundle import ReviewBundle, find_review_bundle
+
+
+DATA_SET_STAGE = "data_set"
+QC_FEATURES_STAGE = "qc_features"
+AUTO_QC_STAGE = "auto_qc"
+
+# how many results of each stage to keep. Data set sessions hold open files, 
+# so only the current one is kept.
+STAGE_CACHE_ENTRIES = {
+    DATA_SET_STAGE: 1,
+    QC_FEATURES_STAGE: 4,
+    AUTO_QC_STAGE: 16
+}
+
+# sweep qc feature extraction reads this many sweeps at a time
+SWEEP_READ_CHUNK_SIZE = 32
+
+AutoQcResults = Tuple[Dict, Dict, List[Dict], List[Dict]]
+
+
+class QcFeatures(NamedTuple):
+    """ The output of qc feature extraction. These depend on the data set and
+    stimulus ontology, but not on the qc criteria.
+    """
+    cell_features: Dict
+    cell_tags: List
+    sweep_features: List[Dict]
+
+
+class PreFxResults(NamedTuple):
+    """ Everything calculated by a single run of the pre-fx pipeline
+    """
+    nwb_path: str
+    stimulus_ontology: StimulusOntology
+    qc_criteria: Dict
+    data_set: EphysDataSet
+    session: DataSetSession
+    cell_features: Dict
+    cell_tags: List
+    cell_state: Dict
+    sweep_features: List[Dict]
+    sweep_states: List[Dict]
+    qc_features: QcFeatures
+    qc_features_key: Hashable
+    review_bundle: Optional[ReviewBundle] = None
 
 
 class PreFxData(QObject):
@@ -28,12 +80,17 @@ class PreFxData(QObject):
     qc_criteria_unset = pyqtSignal(name="qc_criteria_unset")
 
     begin_commit_calculated = pyqtSignal(name="begin_commit_calculated")
-    end_commit_calculated = pyqtSignal(list, list, dict, EphysDataSet, name="end_commit_calculated")
+    end_commit_calculated = pyqtSignal(list, list, dict, EphysDataSet, str, object, name="end_commit_calculated")
+    auto_qc_recalculated = pyqtSignal(list, list, name="auto_qc_recalculated")
+    sweep_state_updated = pyqtSignal(int, bool, name="sweep_state_updated")
 
-    data_changed = pyqtSignal(str, StimulusOntology, list, dict, name="data_changed")
+    data_changed = pyqtSignal(str, StimulusOntology, list, dict, object, name="data_changed")
 
     status_message = pyqtSignal(str, name="status_message")
 
+    task_progress = pyqtSignal(str, int, int, name="task_progress")
+    task_finished = pyqtSignal(name="task_finished")
+
     def __init__(self):
         """ Main data store for all data upstream of feature extraction. This
         includes:
@@ -48,8 +105,27 @@ class PreFxData(QObject):
         self._stimulus_ontology: Optional[StimulusOntology] = None
         self._qc_criteria: Optional[Dict] = None
         self.data_set: Optional[EphysDataSet] = None
+        self.session: Optional[DataSetSession] = None
         self.nwb_path: Optional[str] = None
         self.manual_qc_states: Dict[int, str] = {}
+        self.qc_features: Optional[QcFeatures] = None
+        self.qc_features_key: Optional[Hashable] = None
+        self.review_bundle: Optional[ReviewBundle] = None
+
+        # if set, precomputed review bundles are looked up here (see 
+        # review_bundle)
+        self.review_bundle_dir: Optional[str] = None
+
+        # for applying manual qc states one sweep at a time
+        self._auto_sweep_passed: Dict[int, bool] = {}
+        self._sweep_features_lookup: Dict[int, Dict] = {}
+
+        # pipeline stage results, keyed by their inputs. Exposes hit and miss
+        # counts for diagnostics.
+        self.stage_cache = StageCache(STAGE_CACHE_ENTRIES)
+
+        self._task: Optional[Task] = None
+        self._commit_task_results: bool = True
 
     def _notifying_setter(
         self, 
@@ -159,7 +235,9 @@ class PreFxData(QObject):
 
     def load_qc_criteria_from_json(self, path: str):
         """ Attempts to read qc criteria from a JSON. If successful (and other 
-        required data are already set), attempts to run the pre-fx pipeline
+        required data are already set), attempts to run the pre-fx pipeline. 
+        Only auto qc depends on the criteria, so if qc features have already 
+        been extracted, only that stage is rerun.
 
         Parameters
         ----------
@@ -172,7 +250,9 @@ class PreFxData(QObject):
             with open(path, "r") as criteria_file:
                 criteria = json.load(criteria_file)
             
-            if self.nwb_path is not None and self.stimulus_ontology is not None:
+            if self.qc_features is not None and self._task is None:
+                self.rerun_auto_qc(criteria)
+            elif self.nwb_path is not None and self.stimulus_ontology is not None:
                 self.run_extraction_and_auto_qc(
                     self.nwb_path, 
                     self.stimulus_ontology, 
@@ -206,9 +286,7 @@ class PreFxData(QObject):
             elif self.qc_criteria is None:
                 raise ValueError("must set qc criteria before loading a data set!")
 
-            self.status_message.emit("Running extraction and auto qc...")
             self.run_extraction_and_auto_qc(path, self.stimulus_ontology, self.qc_criteria, commit=True)
-            self.status_message.emit("Done running extraction and auto qc")
         except Exception as err:
             exception_message(
                 "Unable to load NWB",
@@ -259,54 +337,184 @@ class PreFxData(QObject):
 
 
     def run_extraction_and_auto_qc(self, nwb_path, stimulus_ontology, qc_criteria, commit=True):
+        """ Start running the pre-fx pipeline (data set creation, qc feature 
+        extraction and auto qc) on a worker thread. Any run already in 
+        progress is cancelled. Progress is reported via task_progress; results
+        are committed on this object's thread once available.
 
-        data_set = create_ephys_data_set(
-            sweep_info=None,
-            nwb_file=nwb_path,
-            ontology=stimulus_ontology
+        Parameters
+        ----------
+        nwb_path : 
+            load the data set from here
+        stimulus_ontology : 
+            used to categorize sweeps
+        qc_criteria : 
+            used to assign auto qc states
+        commit : 
+            if True, replace this object's data with the results
+
+        """
+
+        self.cancel_task()
+        self.status_message.emit("Running extraction and auto qc...")
+
+        task = Task(
+            run_pre_fx_pipeline, nwb_path, stimulus_ontology, qc_criteria, 
+            stage_cache=self.stage_cache,
+            review_bundle_dir=self.review_bundle_dir
         )
+        task.signals.progress.connect(self.task_progress)
+        task.signals.succeeded.connect(self.on_task_succeeded)
+        task.signals.failed.connect(self.on_task_failed)
+        task.signals.cancelled.connect(self.on_task_cancelled)
+        task.signals.finished.connect(self.on_task_finished)
+
+        self._task = task
+        self._commit_task_results = commit
+        task.start()
+
+    def cancel_task(self):
+        """ Request that the running pre-fx pipeline (if any) stop. Its 
+        results will be discarded.
+        """
 
-        cell_features, cell_tags, sweep_features = extract_qc_features(data_set)
+        if self._task is not None:
+            self._task.cancel()
 
-        sweep_props.drop_tagged_sweeps(sweep_features)
-        cell_state, cell_features, sweep_states, sweep_features = run_qc(
-            stimulus_ontology, cell_features, sweep_features, qc_criteria
+    def _is_current_task(self) -> bool:
+        """ Whether the sender of the signal currently being handled is the 
+        most recently started task.
+        """
+        return self._task is not None and self.sender() is self._task.signals
+
+    def on_task_succeeded(self, results: PreFxResults):
+        if not self._is_current_task():
+            return
+
+        if self._commit_task_results:
+            self.commit_results(results)
+        else:
+            self.data_changed.emit(self.nwb_path,
+                                   self.stimulus_ontology,
+                                   self.sweep_features,
+                                   self.cell_features,
+                                   self.session)
+
+        self.status_message.emit("Done running extraction and auto qc")
+
+    def on_task_failed(self, err: Exception):
+        if not self._is_current_task():
+            return
+
+        self.status_message.emit("Extraction and auto qc failed")
+        exception_message(
+            "Extraction and auto qc failed",
+            "failed to run extraction and auto qc",
+            err
         )
 
-        if commit:
-            self.begin_commit_calculated.emit()
+    def on_task_cancelled(self):
+        if self._is_current_task():
+            self.status_message.emit("Extraction and auto qc cancelled")
+
+    def on_task_finished(self):
+        if self._is_current_task():
+            self._task = None
+            self.task_finished.emit()
 
-            self.stimulus_ontology = stimulus_ontology
-            self.qc_criteria = qc_criteria
-            self.nwb_path = nwb_path
+    def commit_results(self, results: PreFxResults):
+        """ Replace this object's data with the results of a pre-fx pipeline 
+        run, notifying listeners.
+        """
 
-            self.data_set = data_set
-            self.cell_features = cell_features
-            self.cell_tags = cell_tags
-            self.cell_state = cell_state
+        self.begin_commit_calculated.emit()
 
-            self.sweep_features = sweep_features
-            self.sweep_states = sweep_states
-            self.manual_qc_states = {sweep["sweep_number"]: "default" for sweep in self.sweep_features}
+        self.stimulus_ontology = results.stimulus_ontology
+        self.qc_criteria = results.qc_criteria
+        self.nwb_path = results.nwb_path
 
-            self.end_commit_calculated.emit(
-                self.sweep_features, self.sweep_states, self.manual_qc_states, self.data_set
-            )
+        self.data_set = results.data_set
+        self.session = results.session
+        self.cell_features = results.cell_features
+        self.cell_tags = results.cell_tags
+        self.cell_state = results.cell_state
+
+        self.sweep_features = results.sweep_features
+        self.sweep_states = results.sweep_states
+        self.qc_features = results.qc_features
+        self.qc_features_key = results.qc_features_key
+        self.review_bundle = results.review_bundle
+        self.manual_qc_states = {sweep["sweep_number"]: "default" for sweep in self.sweep_features}
+        self.update_sweep_states()
+
+        self.end_commit_calculated.emit(
+            self.sweep_features, self.sweep_states, self.manual_qc_states, 
+            self.data_set, self.nwb_path, self.review_bundle
+        )
 
         self.data_changed.emit(self.nwb_path,
                                self.stimulus_ontology,
                                self.sweep_features,
-                               self.cell_features)
+                               self.cell_features,
+                               self.session)
 
+    def rerun_auto_qc(self, qc_criteria: Dict):
+        """ Assign new auto qc states using already extracted qc features. 
+        The data set and plots are left alone and manual qc states are kept.
 
+        Parameters
+        ----------
+        qc_criteria : 
+            used to assign auto qc states
+
+        """
+
+        self.status_message.emit("Running auto qc...")
+
+        cell_state, cell_features, sweep_states, sweep_features = run_auto_qc_stage(
+            self.stimulus_ontology, 
+            self.qc_features, 
+            self.qc_features_key,
+            qc_criteria,
+            self.stage_cache
+        )
+
+        self.qc_criteria = qc_criteria
+        self.cell_features = cell_features
+        self.cell_state = cell_state
+        self.sweep_features = sweep_features
+        self.sweep_states = sweep_states
+
+        self.auto_qc_recalculated.emit(self.sweep_features, self.sweep_states)
 
-    def on_manual_qc_state_updated(self, sweep_number: int, new_state: str):
-        self.manual_qc_states[sweep_number] = new_state
         self.update_sweep_states()
         self.data_changed.emit(self.nwb_path,
                                self.stimulus_ontology,
                                self.sweep_features,
-                               self.cell_features)
+                               self.cell_features,
+                               self.session)
+
+        self.status_message.emit("Done running auto qc")
+
+    def on_manual_qc_state_updated(self, sweep_number: int, new_state: str):
+        """ Record a user's manual qc state for one sweep. Only that sweep's 
+        effective state is updated, and listeners are notified of just that 
+        sweep.
+
+        Parameters
+        ----------
+        sweep_number : 
+            identifies the sweep
+        new_state : 
+            one of "default", "passed" or "failed"
+
+        """
+
+        self.manual_qc_states[sweep_number] = new_state
+
+        passed = self.update_sweep_state(sweep_number)
+        if passed is not None:
+            self.sweep_state_updated.emit(sweep_number, passed)
 
     def get_non_default_manual_sweep_states(self):
         manual_sweep_states = []
@@ -321,22 +529,319 @@ class PreFxData(QObject):
         return manual_sweep_states
 
     def update_sweep_states(self):
-        manual_sweep_states = self.get_non_default_manual_sweep_states()
-        sweep_states = copy.deepcopy(self.sweep_states)
-        sweep_props.override_auto_sweep_states(manual_sweep_states, sweep_states)
-        sweep_props.assign_sweep_states(sweep_states, self.sweep_features)
+        """ Assign every sweep's effective qc state (its manual state if 
+        one has been set, otherwise its auto qc state) to the "passed" field 
+        of its features. Call this after sweep_features or sweep_states have 
+        been replaced.
+        """
+
+        self._auto_sweep_passed = {
+            state["sweep_number"]: state["passed"] for state in self.sweep_states
+        }
+        self._sweep_features_lookup = {
+            sweep["sweep_number"]: sweep for sweep in self.sweep_features
+        }
+
+        for sweep_number in self._sweep_features_lookup:
+            self.update_sweep_state(sweep_number)
+
+    def update_sweep_state(self, sweep_number: int) -> Optional[bool]:
+        """ Assign a single sweep's effective qc state to the "passed" field 
+        of its features.
+
+        Parameters
+        ----------
+        sweep_number : 
+            identifies the sweep
 
+        Returns
+        -------
+        The sweep's effective state, or None if it has no auto qc state 
+        (in which case its features are left alone).
 
-def extract_qc_features(data_set):
+        """
+
+        if sweep_number not in self._auto_sweep_passed:
+            logging.warning("Could not find QC state for sweep number %d", sweep_number)
+            return None
+
+        passed = effective_qc_state(
+            self._auto_sweep_passed[sweep_number],
+            self.manual_qc_states.get(sweep_number, "default")
+        )
+
+        sweep = self._sweep_features_lookup.get(sweep_number)
+        if sweep is not None:
+            sweep["passed"] = passed
+
+        return passed
+
+
+def effective_qc_state(auto_passed: bool, manual_state: str) -> bool:
+    """ Whether a sweep passed qc: its manual state if one has been set 
+    (i.e. it is not "default"), otherwise its auto qc state.
+    """
+
+    if manual_state == "default":
+        return auto_passed
+    return manual_state == "passed"
+
+
+def fx_sweep_info(
+    sweep_features: List[Dict], 
+    sweep_states: List[Dict], 
+    manual_qc_states: Optional[Dict[int, str]] = None
+) -> List[Dict]:
+    """ The sweep info from which features are extracted, as PreFxData 
+    provides it (via data_changed) to the gui's feature extraction.
+
+    Parameters
+    ----------
+    sweep_features : qc features of each sweep
+    sweep_states : auto qc states of each sweep
+    manual_qc_states : if provided, overrides auto qc states (see 
+        effective_qc_state)
+
+    Returns
+    -------
+    Copies of sweep_features, with each sweep's effective qc state as its 
+    "passed" field. Sweeps without an auto qc state are copied unchanged.
+
+    """
+
+    manual_qc_states = manual_qc_states or {}
+    auto_passed = {state["sweep_number"]: state["passed"] for state in sweep_states}
+
+    sweep_info = []
+    for sweep in sweep_features:
+        sweep = dict(sweep)
+        if sweep["sweep_number"] in auto_passed:
+            sweep["passed"] = effective_qc_state(
+                auto_passed[sweep["sweep_number"]],
+                manual_qc_states.get(sweep["sweep_number"], "default")
+            )
+        sweep_info.append(sweep)
+
+    return sweep_info
+
+
+def run_pre_fx_pipeline(
+    nwb_path: str, 
+    stimulus_ontology: StimulusOntology, 
+    qc_criteria: Dict,
+    progress: ProgressCallback = no_progress,
+    stage_cache: Optional[StageCache] = None,
+    review_bundle_dir: Optional[str] = None
+) -> PreFxResults:
+    """ Create a data set, extract qc features and run auto qc. Does not 
+    touch any Qt objects, so it may be run off of the GUI thread. Each stage
+    is memoized on its inputs: the nwb file's identity (for all stages), the
+    stimulus ontology (for all stages) and the qc criteria (for auto qc only).
+    If a current review bundle is available, qc features (and, if the 
+    criteria match, auto qc results) are read from it, and the nwb file is 
+    only opened once it is read from.
+
+    Parameters
+    ----------
+    nwb_path : 
+        load the data set from here
+    stimulus_ontology : 
+        used to categorize sweeps
+    qc_criteria : 
+        used to assign auto qc states
+    progress : 
+        called with (message, completed, total) as each stage (and each sweep
+        within qc feature extraction) is processed
+    stage_cache : 
+        if provided, stage results are looked up in and stored here
+    review_bundle_dir : 
+        if provided, look for a review bundle for this nwb file here
+
+    """
+
+    stage_cache = stage_cache or StageCache({})
+    stage_key = (file_identity(nwb_path), ontology_hash(stimulus_ontology))
+
+    bundle = None
+    if review_bundle_dir is not None:
+        progress("Reading review bundle", 0, 0)
+        bundle = find_review_bundle(review_bundle_dir, nwb_path, stimulus_ontology)
+
+    def open_session():
+        progress("Loading data set", 0, 0)
+        return DataSetSession(
+            nwb_path, stimulus_ontology, deferred=bundle is not None
+        )
+
+    def extract():
+        if bundle is not None:
+            return QcFeatures(*bundle.qc_features)
+
+        cell_features, cell_tags, sweep_features = extract_qc_features(
+            data_set, progress
+        )
+        sweep_props.drop_tagged_sweeps(sweep_features)
+        return QcFeatures(cell_features, cell_tags, sweep_features)
+
+    session = stage_cache.get_or_compute(
+        DATA_SET_STAGE, stage_key, open_session
+    )
+    data_set = session.data_set
+    qc_features = stage_cache.get_or_compute(
+        QC_FEATURES_STAGE, stage_key, extract
+    )
+
+    progress("Running auto qc", 0, 0)
+    auto_qc = bundle.auto_qc(qc_criteria) if bundle is not None else None
+    if auto_qc is None:
+        auto_qc = run_auto_qc_stage(
+            stimulus_ontology, qc_features, stage_key, qc_criteria, stage_cache
+        )
+    cell_state, cell_features, sweep_states, sweep_features = auto_qc
+
+    return PreFxResults(
+        nwb_path=nwb_path,
+        stimulus_ontology=stimulus_ontology,
+        qc_criteria=qc_criteria,
+        data_set=data_set,
+        session=session,
+        cell_features=cell_features,
+        cell_tags=qc_features.cell_tags,
+        cell_state=cell_state,
+        sweep_features=sweep_features,
+        sweep_states=sweep_states,
+        qc_features=qc_features,
+        qc_features_key=stage_key,
+        review_bundle=bundle
+    )
+
+
+def run_auto_qc_stage(
+    stimulus_ontology: StimulusOntology,
+    qc_features: QcFeatures,
+    qc_features_key: Hashable,
+    qc_criteria: Dict,
+    stage_cache: StageCache
+) -> AutoQcResults:
+    """ Run auto qc, reusing a memoized result if these features have already
+    been evaluated against these criteria. 
+
+    Parameters
+    ----------
+    stimulus_ontology : 
+        used to categorize sweeps
+    qc_features : 
+        output of qc feature extraction
+    qc_features_key : 
+        identifies the inputs from which qc_features were extracted
+    qc_criteria : 
+        used to assign auto qc states
+    stage_cache : 
+        results are looked up in and stored here
+
+    Returns
+    -------
+    cell_state, cell_features, sweep_states, sweep_features : as run_qc. 
+        These are copies, which callers are free to modify.
+
+    """
+
+    results = stage_cache.get_or_compute(
+        AUTO_QC_STAGE, 
+        (qc_features_key, hash_json(qc_criteria)),
+        lambda: run_qc(
+            stimulus_ontology, 
+            qc_features.cell_features, 
+            qc_features.sweep_features, 
+            qc_criteria
+        )
+    )
+    return copy.deepcopy(results)
+
+
+def extract_qc_features(data_set, progress: ProgressCallback = no_progress):
+    progress("Extracting cell qc features", 0, 0)
     cell_features, cell_tags = cell_qc_features(
         data_set,
         # manual_values=cell_qc_manual_values
     )
-    sweep_features = sweep_qc_features(data_set)
+    sweep_features = sweep_qc_features(data_set, progress)
     drop_tagged_sweeps(sweep_features)
     return cell_features, cell_tags, sweep_features
 
 
+def sweep_qc_features(data_set, progress: ProgressCallback = no_progress):
+    """ Extract qc features from each current clamp sweep, as 
+    ipfx.qc_feature_extractor.sweep_qc_features does, but report progress 
+    after each sweep and read sweeps SWEEP_READ_CHUNK_SIZE at a time.
+    """
+
+    iclamp_sweeps = data_set.filtered_sweep_table(
+        clamp_mode=data_set.CURRENT_CLAMP,
+        stimuli_exclude=["Test", "Search"],
+    )
+    if len(iclamp_sweeps.index) == 0:
+        logging.warning("No current clamp sweeps available to compute QC features")
+
+    sweep_infos = iclamp_sweeps.to_dict(orient="records")
+    sweeps_features = []
+    for start in range(0, len(sweep_infos), SWEEP_READ_CHUNK_SIZE):
+        chunk = sweep_infos[start: start + SWEEP_READ_CHUNK_SIZE]
+        sweeps = read_sweeps(data_set, [info["sweep_number"] for info in chunk])
+
+        for index, (sweep_info, sweep) in enumerate(zip(chunk, sweeps)):
+            progress(
+                "Extracting sweep qc features", start + index, len(sweep_infos)
+            )
+            sweeps_features.append(
+                sweep_qc_record(sweep_info, sweep, data_set.ontology)
+            )
+
+    return sweeps_features
+
+
+def sweep_qc_record(
+    sweep_info: Dict, 
+    sweep: Sweep, 
+    ontology: StimulusOntology
+) -> Dict:
+    """ The qc features of a single current clamp sweep, calculated by ipfx's 
+    per-sweep helpers.
+
+    This mirrors the loop body of ipfx.qc_feature_extractor.sweep_qc_features 
+    as of ipfx 2.1.2 (which has no per-sweep entry point of its own). 
+    test_sweep_qc_features_matches_ipfx checks that the two agree.
+
+    Parameters
+    ----------
+    sweep_info : the sweep's row of the data set's sweep table
+    sweep : the sweep's data
+    ontology : used to identify ramps
+
+    Returns
+    -------
+    The sweep info, along with integrity tags, stimulus features and (for 
+    untagged sweeps) qc features
+
+    """
+
+    sweep_features = {}
+    sweep_features.update(sweep_info)
+
+    is_ramp = sweep_info["stimulus_name"] in ontology.ramp_names
+    tags = check_sweep_integrity(sweep, is_ramp)
+    sweep_features["tags"] = tags
+
+    sweep_features.update(current_clamp_sweep_stim_features(sweep))
+
+    if not tags:
+        sweep_features.update(current_clamp_sweep_qc_features(sweep, is_ramp))
+    else:
+        logging.warning("sweep {}: {}".format(sweep_info["sweep_number"], tags))
+
+    return sweep_features
+
+
 def run_qc(stimulus_ontology, cell_features, sweep_features, qc_criteria):
     """Adding qc status to sweep features
     Outputs qc summary on a screen
@@ -0,0 +1,327 @@
+""" Review bundles hold everything needed to review a cell in the gui,
+precomputed (see batch) and stored in a single npz file: qc features, auto qc
+results, and each sweep's thumbnails, popup traces and popup trace pyramids.
+Opening a cell with a current bundle skips NWB parsing, qc feature
+extraction and plot rendering. The NWB file is then only opened if it is
+actually read from (e.g. for feature extraction).
+"""
+import os
+import json
+import logging
+from typing import Optional, Dict, List, Tuple, Sequence, Any
+
+import numpy as np
+
+from ipfx.stimulus import StimulusOntology
+import ipfx.json_utilities as ju
+
+from pipeline_cache import file_identity, hash_json, ontology_hash
+from sweep_plotter import (
+    SweepPlotConfig, FixedPlots, PopupPlotter, PulsePopupPlotter,
+    ExperimentPopupPlotter
+)
+from thumbnail_cache import plots_to_arrays, plots_from_arrays, plot_config_fields
+from trace_pyramid import TracePyramid
+
+
+REVIEW_BUNDLE_FILE = "review_bundle.npz"
+
+# incremented whenever the contents of a bundle change incompatibly
+BUNDLE_FORMAT_VERSION = 2
+
+METADATA_KEY = "metadata"
+
+# (cell_features, cell_tags, sweep_features), as extract_qc_features
+QcFeatureTuple = Tuple[Dict, List, List[Dict]]
+
+# (cell_state, cell_features, sweep_states, sweep_features), as run_qc
+AutoQcTuple = Tuple[Dict, Dict, List[Dict], List[Dict]]
+
+SweepPlots = Tuple[FixedPlots, FixedPlots]
+
+
+def review_bundle_path(directory: str, nwb_path: str) -> str:
+    """ Where the bundle for an NWB file is stored within a directory of
+    batch results (see batch.cell_output_dir).
+    """
+
+    name = os.path.splitext(os.path.basename(nwb_path))[0]
+    return os.path.join(directory, name, REVIEW_BUNDLE_FILE)
+
+
+def nwb_identity(nwb_path: str) -> List:
+    """ Identify an NWB file by its name, size and modification time. Unlike
+    file_identity, this does not depend on the directory containing the file,
+    so bundles remain current when storage is mounted elsewhere.
+    """
+
+    path, size, modified = file_identity(nwb_path)
+    return [os.path.basename(path), size, modified]
+
+
+class ReviewBundle:
+
+    def __init__(self, path: str, metadata: Dict[str, Any]):
+        """ A review bundle read from disk. Only its metadata (qc results
+        and bookkeeping) are held in memory; plots are read on request.
+        Obtain instances via read_review_bundle or find_review_bundle.
+
+        Parameters
+        ----------
+        path : the bundle file
+        metadata : the bundle's (json) metadata
+
+        """
+
+        self.path = path
+        self.metadata = metadata
+
+    def is_current(self, nwb_path: str, ontology: StimulusOntology) -> bool:
+        """ Whether this bundle was built from this NWB file (as it is now),
+        using this stimulus ontology.
+        """
+
+        return (
+            self.metadata["format_version"] == BUNDLE_FORMAT_VERSION
+            and self.metadata["nwb_identity"] == nwb_identity(nwb_path)
+            and self.metadata["ontology_hash"] == ontology_hash(ontology)
+        )
+
+    @property
+    def qc_features(self) -> QcFeatureTuple:
+        qc_features = self.metadata["qc_features"]
+        return (
+            qc_features["cell_features"],
+            qc_features["cell_tags"],
+            qc_features["sweep_features"]
+        )
+
+    def auto_qc(self, qc_criteria: Dict) -> Optional[AutoQcTuple]:
+        """ The stored auto qc results, or None if they were computed using
+        different criteria.
+        """
+
+        if self.metadata["qc_criteria_hash"] != hash_json(qc_criteria):
+            return None
+
+        auto_qc = self.metadata["auto_qc"]
+        return (
+            auto_qc["cell_state"],
+            auto_qc["cell_features"],
+            auto_qc["sweep_states"],
+            auto_qc["sweep_features"]
+        )
+
+    def plots_match(
+        self,
+        config: SweepPlotConfig,
+        sweep_numbers: Sequence[int]
+    ) -> bool:
+        """ Whether the stored plots are those which would be generated for
+        these sweeps (in this order), using this configuration.
+        """
+
+        plot_config = self.metadata.get("plot_config")
+        return (
+            plot_config is not None
+            and plot_config == json.loads(ju.write_string(plot_config_fields(config)))
+            and self.metadata["sweep_numbers"] == list(sweep_numbers)
+        )
+
+    def load_plots(self, sweep_numbers: Sequence[int]) -> Dict[int, SweepPlots]:
+        """ Read some sweeps' (test pulse, experiment) plots, along with their
+        popup trace pyramids. Sweeps which were not plotted are omitted.
+        """
+
+        prefixes = {f"sweep_{sweep_number}_": sweep_number for sweep_number in sweep_numbers}
+        sweep_arrays: Dict[int, Dict[str, np.ndarray]] = {}
+
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                for name in data.files:
+                    prefix = name[: name.find("_", len("sweep_")) + 1]
+                    sweep_number = prefixes.get(prefix)
+                    if sweep_number is not None:
+                        sweep_arrays.setdefault(sweep_number, {})[name[len(prefix):]] = data[name]
+
+        except Exception as err:
+            logging.warning(f"unable to read plots from {self.path}: {err}")
+            return {}
+
+        plots = {}
+        for sweep_number, arrays in sweep_arrays.items():
+            test_pulse = plots_from_arrays(arrays, "test_pulse_", PulsePopupPlotter)
+            experiment = plots_from_arrays(arrays, "experiment_", ExperimentPopupPlotter)
+
+            for sweep_plots, name in [(test_pulse, "test_pulse_"), (experiment, "experiment_")]:
+                sweep_plots.full.set_pyramids(
+                    pyramids_from_arrays(sweep_plots.full, arrays, name + "pyramid_")
+                )
+
+            plots[sweep_number] = (test_pulse, experiment)
+
+        return plots
+
+
+def write_review_bundle(
+    path: str,
+    nwb_path: str,
+    ontology: StimulusOntology,
+    qc_criteria: Dict,
+    qc_features: QcFeatureTuple,
+    auto_qc: AutoQcTuple,
+    plot_config: Optional[SweepPlotConfig] = None,
+    sweep_numbers: Optional[Sequence[int]] = None,
+    plots: Optional[Dict[int, SweepPlots]] = None
+):
+    """ Write a review bundle.
+
+    Parameters
+    ----------
+    path : write the bundle here. Its directory is created if necessary.
+    nwb_path : the cell's data
+    ontology : used to categorize the cell's sweeps
+    qc_criteria : used to compute auto_qc
+    qc_features : as extract_qc_features
+    auto_qc : as run_qc
+    plot_config : used to generate plots
+    sweep_numbers : the plotted sweeps, in order
+    plots : maps sweep numbers to (test pulse, experiment) plots. Popup
+        trace pyramids are built if they have not been already.
+
+    """
+
+    cell_features, cell_tags, sweep_features = qc_features
+    cell_state, qc_cell_features, sweep_states, qc_sweep_features = auto_qc
+
+    metadata = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "nwb_identity": nwb_identity(nwb_path),
+        "ontology_hash": ontology_hash(ontology),
+        "qc_criteria_hash": hash_json(qc_criteria),
+        "qc_features": {
+            "cell_features": cell_features,
+            "cell_tags": cell_tags,
+            "sweep_features": sweep_features
+        },
+        "auto_qc": {
+            "cell_state": cell_state,
+            "cell_features": qc_cell_features,
+            "sweep_states": sweep_states,
+            "sweep_features": qc_sweep_features
+        },
+        "plot_config": None,
+        "sweep_numbers": None
+    }
+
+    arrays: Dict[str, np.ndarray] = {}
+    if plot_config is not None and plots:
+        metadata["plot_config"] = plot_config_fields(plot_config)
+        metadata["sweep_numbers"] = list(sweep_numbers)
+
+        for sweep_number, (test_pulse, experiment) in plots.items():
+            prefix = f"sweep_{sweep_number}_"
+            for sweep_plots, name in [(test_pulse, "test_pulse_"), (experiment, "experiment_")]:
+                arrays.update(plots_to_arrays(sweep_plots, prefix + name))
+                arrays.update(pyramids_to_arrays(
+                    sweep_plots.full.pyramids(), prefix + name + "pyramid_"
+                ))
+
+    arrays[METADATA_KEY] = np.frombuffer(
+        ju.write_string(metadata).encode(), dtype=np.uint8
+    )
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    # np.savez would append .npz to a temporary name
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as temp_file:
+        np.savez(temp_file, **arrays)
+    os.replace(temp_path, path)
+
+
+def read_review_bundle(path: str) -> ReviewBundle:
+    """ Read a review bundle's metadata. Plots are read on request (see
+    ReviewBundle.load_plots).
+    """
+
+    with np.load(path, allow_pickle=False) as data:
+        metadata = json.loads(data[METADATA_KEY].tobytes().decode())
+    return ReviewBundle(path, metadata)
+
+
+def find_review_bundle(
+    directory: str,
+    nwb_path: str,
+    ontology: StimulusOntology
+) -> Optional[ReviewBundle]:
+    """ Look up the bundle for an NWB file in a directory of batch results.
+    Returns None (so that the NWB file is processed as usual) if there is no
+    bundle, or it cannot be read, or it is out of date.
+    """
+
+    path = review_bundle_path(directory, nwb_path)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        bundle = read_review_bundle(path)
+        if bundle.is_current(nwb_path, ontology):
+            return bundle
+        logging.info(f"review bundle {path} is out of date")
+
+    except Exception as err:
+        logging.warning(f"unable to read review bundle {path}: {err}")
+
+    return None
+
+
+def pyramids_to_arrays(
+    pyramids: Dict[str, TracePyramid],
+    prefix: str
+) -> Dict[str, np.ndarray]:
+    """ Represent the levels of some trace pyramids as named arrays. The
+    traces themselves are stored with their plotters.
+    """
+
+    arrays = {}
+    for name, pyramid in pyramids.items():
+        arrays[f"{prefix}{name}_factor"] = np.array(pyramid.factor)
+        arrays[f"{prefix}{name}_levels"] = np.array(len(pyramid.levels))
+        for level, (mins, maxs) in enumerate(pyramid.levels):
+            arrays[f"{prefix}{name}_{level}_min"] = mins
+            arrays[f"{prefix}{name}_{level}_max"] = maxs
+    return arrays
+
+
+def pyramids_from_arrays(
+    plotter: PopupPlotter,
+    arrays: Dict[str, np.ndarray],
+    prefix: str
+) -> Optional[Dict[str, TracePyramid]]:
+    """ Inverse of pyramids_to_arrays, given the plotter whose traces the
+    pyramids summarize. Returns None if any are missing, in which case the
+    plotter will build its own.
+    """
+
+    pyramids = {}
+    for name in ("voltage", "previous", "initial"):
+        values = getattr(plotter, name, None)
+        if values is None:
+            continue
+
+        num_levels = arrays.get(f"{prefix}{name}_levels")
+        if num_levels is None:
+            return None
+
+        pyramids[name] = TracePyramid.from_levels(
+            plotter.time,
+            values,
+            int(arrays[f"{prefix}{name}_factor"]),
+            [
+                (arrays[f"{prefix}{name}_{level}_min"], arrays[f"{prefix}{name}_{level}_max"])
+                for level in range(int(num_levels))
+            ]
+        )
+
+    return pyramids
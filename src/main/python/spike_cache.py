@@ -0,0 +1,424 @@
+""" Memoized feature extraction. Features are extracted again whenever a 
+sweep's qc state changes, but the spikes detected in each of the other sweeps 
+are unchanged, as are the cell-level analyses of stimulus types whose sweeps 
+are unchanged.
+
+ipfx constructs its spike extractors internally, so the sweep-level loop and 
+cell-level analyses of extract_data_set_features are run here, with each 
+extractor wrapped in a caching one. ipfx itself is not modified.
+"""
+import copy
+import hashlib
+import logging
+from functools import partial
+from typing import Hashable, Iterable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ipfx.ephys_data_set import EphysDataSet
+from ipfx.feature_extractor import SpikeFeatureExtractor
+from ipfx.stimulus import StimulusType
+from ipfx.data_set_features import (
+    record_errors, fallback_on_error, extractors_for_sweeps, 
+    detection_parameters, detection_parameters_from_stimulus_name,
+    select_subthreshold_min_amplitude
+)
+import ipfx.stimulus_protocol_analysis as spa
+import ipfx.stim_features as stf
+import ipfx.error as er
+import ipfx.logging_utils as lu
+
+from pipeline_cache import StageCache
+from parallel_features import merge_feature_results
+from workers import ProgressCallback, no_progress
+
+
+SPIKE_STAGE = "spikes"
+CELL_STAGE = "cell_analyses"
+
+# each entry holds the spikes of one sweep, detected with one set of
+# parameters (a sweep is typically analyzed with 1 - 3 parameter sets)
+DEFAULT_MAX_ENTRIES = 1024
+
+# each entry holds the results of one cell-level analysis (long squares, 
+# short squares or ramps) of one set of sweeps
+DEFAULT_MAX_CELL_ENTRIES = 16
+
+# (s) after the start of a short square stimulus, within which spike 
+# detection parameters are estimated. As ipfx's SSQ_WINDOW
+SHORT_SQUARE_WINDOW = 0.001
+
+
+def trace_digest(t: np.ndarray, v: np.ndarray, i: np.ndarray) -> str:
+    """ Identify a sweep by the content of its traces. Sample times are
+    uniform, so are identified by their extent alone.
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    for array in (v, i):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    if len(t) > 0:
+        digest.update(repr((len(t), float(t[0]), float(t[-1]))).encode())
+    return digest.hexdigest()
+
+
+def new_spike_cache(max_entries: int = DEFAULT_MAX_ENTRIES) -> StageCache:
+    """ A cache suitable for use with CachingSpikeFeatureExtractor and 
+    extract_cached_features
+    """
+    return StageCache({SPIKE_STAGE: max_entries, CELL_STAGE: DEFAULT_MAX_CELL_ENTRIES})
+
+
+def cached_detection_key(extractor: SpikeFeatureExtractor, digest: str) -> Hashable:
+    """ Identifies the spikes an extractor would detect in a sweep: its 
+    detection parameters, along with the sweep's trace_digest.
+    """
+
+    parameters = tuple(sorted(
+        (name, value) for name, value in vars(extractor).items()
+        if name != "cache"
+    ))
+    return (parameters, digest)
+
+
+class CachingSpikeFeatureExtractor(SpikeFeatureExtractor):
+
+    def __init__(self, *args, cache: StageCache, **kwargs):
+        """ A spike feature extractor which reuses the spikes previously
+        detected in an identical sweep, using identical parameters.
+
+        Parameters
+        ----------
+        cache : holds detected spikes under SPIKE_STAGE
+        *args, **kwargs : as SpikeFeatureExtractor
+
+        """
+
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+
+    @classmethod
+    def of(
+        cls, 
+        extractor: SpikeFeatureExtractor, 
+        cache: StageCache
+    ) -> "CachingSpikeFeatureExtractor":
+        """ A caching extractor with the same parameters as another extractor
+        """
+
+        caching = cls.__new__(cls)
+        vars(caching).update(vars(extractor))
+        caching.cache = cache
+        return caching
+
+    def process(self, t, v, i) -> pd.DataFrame:
+        return self.process_digested(t, v, i, trace_digest(t, v, i))
+
+    def process_digested(self, t, v, i, digest: str) -> pd.DataFrame:
+        """ As process, for a sweep whose trace_digest is already known
+        """
+
+        key = cached_detection_key(self, digest)
+        spikes = self.cache.get_or_compute(
+            SPIKE_STAGE, key, lambda: SpikeFeatureExtractor.process(self, t, v, i)
+        )
+        # callers are free to modify the returned table
+        return spikes.copy()
+
+
+# The functions below mirror the corresponding functions of 
+# ipfx.data_set_features, as of ipfx 2.1.2. They differ only in that 
+# each spike extractor is wrapped in a CachingSpikeFeatureExtractor. 
+# test_spike_cache checks that their results equal ipfx's.
+
+
+@record_errors
+@fallback_on_error(fallback_value={})
+def extract_cached_sweep_features(
+    data_set: EphysDataSet, 
+    sweep_table: pd.DataFrame, 
+    cache: StageCache,
+    digests: Dict[int, str],
+    progress: ProgressCallback = no_progress
+) -> Dict:
+    """ As ipfx.data_set_features.extract_sweep_features, but spikes are 
+    detected through the cache and progress is reported after each sweep. 
+    The trace_digest of each sweep is recorded in digests.
+    """
+
+    sweep_groups = sweep_table.groupby(data_set.STIMULUS_NAME)[data_set.SWEEP_NUMBER]
+    lu.log_pretty_header("Analyzing sweep features:", level=2)
+    sweep_features = {}
+
+    for stimulus_name, sweep_numbers in sweep_groups:
+        sweep_numbers = sorted(sweep_numbers)
+
+        sweep_set = data_set.sweep_set(sweep_numbers)
+        sweep_set.align_to_start_of_epoch("experiment")
+
+        parameters = detection_parameters_from_stimulus_name(stimulus_name).copy()
+        parameters.pop("start", None)
+        parameters.pop("end", None)
+
+        extractor, _ = extractors_for_sweeps(sweep_set, **parameters)
+        extractor = CachingSpikeFeatureExtractor.of(extractor, cache)
+
+        for sweep_number, sweep in zip(sweep_numbers, sweep_set.sweeps):
+            digests[sweep_number] = trace_digest(sweep.t, sweep.v, sweep.i)
+            spikes = extractor.process_digested(
+                sweep.t, sweep.v, sweep.i, digests[sweep_number]
+            )
+            sweep_features[sweep_number] = {
+                "spikes": spikes.to_dict(orient="records"), 
+                "sweep_number": sweep_number
+            }
+            progress(
+                "Computing sweep features", len(sweep_features), len(sweep_table)
+            )
+
+    return sweep_features
+
+
+@record_errors
+@fallback_on_error()
+def extract_cached_long_square_features(
+    data_set: EphysDataSet, 
+    cache: StageCache
+) -> Dict:
+    """ As ipfx.data_set_features.extract_cell_long_square_features, but 
+    spikes are detected through the cache.
+    """
+
+    lu.log_pretty_header("Long Squares:", level=2)
+
+    long_square_sweep_numbers = data_set.get_sweep_numbers(
+        data_set.ontology.long_square_names,
+        clamp_mode=data_set.CURRENT_CLAMP
+    )
+    if len(long_square_sweep_numbers) == 0:
+        raise er.FeatureError("No long_square sweeps available for feature extraction")
+
+    coarse_sweeps = data_set.filtered_sweep_table(
+        clamp_mode=data_set.CURRENT_CLAMP,
+        stimuli=data_set.ontology.coarse_long_square_names
+    )
+    if len(coarse_sweeps) > 0:
+        subthresh_min_amp, amp_delta = select_subthreshold_min_amplitude(
+            coarse_sweeps["stimulus_amplitude"]
+        )
+        logging.info(
+            "Coarse long squares: %f pA step size.  Using subthreshold "
+            "minimum amplitude of %f.", amp_delta, subthresh_min_amp
+        )
+    else:
+        subthresh_min_amp = -100
+        logging.info(
+            "Assigned subthreshold minimum amplitude of %f.", subthresh_min_amp
+        )
+
+    sweep_set = data_set.sweep_set(long_square_sweep_numbers)
+    sweep_set.align_to_start_of_epoch("experiment")
+
+    start, duration, _, _, _ = stf.get_stim_characteristics(
+        sweep_set.sweeps[0].i, sweep_set.sweeps[0].t
+    )
+    extractor, train_extractor = extractors_for_sweeps(
+        sweep_set, start=start, end=start + duration,
+        **detection_parameters(StimulusType.LONG_SQUARE)
+    )
+
+    analysis = spa.LongSquareAnalysis(
+        CachingSpikeFeatureExtractor.of(extractor, cache), train_extractor,
+        subthresh_min_amp=subthresh_min_amp
+    )
+    features = analysis.as_dict(
+        analysis.analyze(sweep_set),
+        [dict(sweep_number=num) for num in long_square_sweep_numbers]
+    )
+
+    if features["hero_sweep"] is None:
+        raise er.FeatureError("Could not find hero sweep.")
+
+    return features
+
+
+@record_errors
+@fallback_on_error()
+def extract_cached_short_square_features(
+    data_set: EphysDataSet, 
+    cache: StageCache
+) -> Dict:
+    """ As ipfx.data_set_features.extract_cell_short_square_features, but 
+    spikes are detected through the cache.
+    """
+
+    lu.log_pretty_header("Short Squares:", level=2)
+
+    short_square_sweep_numbers = data_set.get_sweep_numbers(
+        data_set.ontology.short_square_names,
+        clamp_mode=data_set.CURRENT_CLAMP
+    )
+    if len(short_square_sweep_numbers) == 0:
+        raise er.FeatureError("No short square sweeps available for feature extraction")
+
+    sweep_set = data_set.sweep_set(short_square_sweep_numbers)
+    sweep_set.align_to_start_of_epoch("experiment")
+
+    start, _, _, _, _ = stf.get_stim_characteristics(
+        sweep_set.sweeps[0].i, sweep_set.sweeps[0].t
+    )
+    extractor, train_extractor = extractors_for_sweeps(
+        sweep_set, est_window=[start, start + SHORT_SQUARE_WINDOW],
+        **detection_parameters(StimulusType.SHORT_SQUARE)
+    )
+
+    analysis = spa.ShortSquareAnalysis(
+        CachingSpikeFeatureExtractor.of(extractor, cache), train_extractor
+    )
+    return analysis.as_dict(
+        analysis.analyze(sweep_set),
+        [dict(sweep_number=num) for num in short_square_sweep_numbers]
+    )
+
+
+@record_errors
+@fallback_on_error()
+def extract_cached_ramp_features(
+    data_set: EphysDataSet, 
+    cache: StageCache
+) -> Dict:
+    """ As ipfx.data_set_features.extract_cell_ramp_features, but spikes are 
+    detected through the cache.
+    """
+
+    lu.log_pretty_header("Ramps:", level=2)
+
+    ramp_sweep_numbers = data_set.get_sweep_numbers(
+        data_set.ontology.ramp_names,
+        clamp_mode=data_set.CURRENT_CLAMP
+    )
+    if len(ramp_sweep_numbers) == 0:
+        raise er.FeatureError("No ramp sweeps available for feature extraction")
+
+    sweep_set = data_set.sweep_set(ramp_sweep_numbers)
+    sweep_set.align_to_start_of_epoch("experiment")
+
+    start, _, _, _, _ = stf.get_stim_characteristics(
+        sweep_set.sweeps[0].i, sweep_set.sweeps[0].t
+    )
+    extractor, train_extractor = extractors_for_sweeps(
+        sweep_set, start=start, **detection_parameters(StimulusType.RAMP)
+    )
+
+    analysis = spa.RampAnalysis(
+        CachingSpikeFeatureExtractor.of(extractor, cache), train_extractor
+    )
+    return analysis.as_dict(
+        analysis.analyze(sweep_set),
+        [dict(sweep_number=num) for num in ramp_sweep_numbers]
+    )
+
+
+CACHED_CELL_FEATURE_EXTRACTORS = {
+    "long_squares": extract_cached_long_square_features,
+    "short_squares": extract_cached_short_square_features,
+    "ramps": extract_cached_ramp_features
+}
+
+
+def cell_analysis_key(
+    data_set: EphysDataSet, 
+    stimulus_names: Iterable[str],
+    digests: Dict[int, str]
+) -> Optional[Hashable]:
+    """ Identifies the inputs to a cell-level analysis: the description and 
+    trace_digest of each current clamp sweep with one of the given stimuli. 
+    None if any of these sweeps has no known digest.
+    """
+
+    sweep_table = data_set.filtered_sweep_table(
+        clamp_mode=data_set.CURRENT_CLAMP, stimuli=list(stimulus_names)
+    ).sort_values(data_set.SWEEP_NUMBER)
+
+    key = []
+    for record in sweep_table.to_dict(orient="records"):
+        digest = digests.get(record[data_set.SWEEP_NUMBER])
+        if digest is None:
+            return None
+        key.append((repr(sorted(record.items())), digest))
+    return tuple(key)
+
+
+def extract_cached_features(
+    data_set: EphysDataSet, 
+    cache: StageCache,
+    progress: ProgressCallback = no_progress
+) -> Tuple[Dict, Dict, Dict, List[Dict], Dict, Dict]:
+    """ As ipfx.data_set_features.extract_data_set_features, but memoized in 
+    the provided cache:
+        - spike detection is cached per sweep (and per set of detection 
+            parameters), both in the sweep-level loop and in the cell-level 
+            analyses
+        - each cell-level analysis is rerun only if the sweeps it analyzes 
+            (or their descriptions) have changed
+
+    Parameters
+    ----------
+    data_set : the sweeps from which features are extracted (typically only 
+        those which passed qc)
+    cache : as created by new_spike_cache
+    progress : called after each sweep's spikes are detected and before each 
+        cell-level analysis. An exception raised here (e.g. TaskCancelled) 
+        stops extraction, rather than being recorded as a failed analysis.
+
+    Returns
+    -------
+    As extract_data_set_features: (cell_features, sweep_features, 
+        cell_record, sweep_records, cell_state, feature_states)
+
+    """
+
+    # sweep features come first, so that the cell-level analyses can be 
+    # identified by the digests of the sweeps read here
+    digests: Dict[int, str] = {}
+    iclamp_sweeps = data_set.filtered_sweep_table(clamp_mode=data_set.CURRENT_CLAMP)
+    interruption: List[Exception] = []
+
+    def report(message: str, completed: int = 0, total: int = 0):
+        # ipfx's fallback_on_error would otherwise swallow this
+        try:
+            progress(message, completed, total)
+        except Exception as err:
+            interruption.append(err)
+            raise
+
+    sweep_results = extract_cached_sweep_features(
+        data_set, iclamp_sweeps, cache, digests, report
+    )
+    if interruption:
+        raise interruption[0]
+
+    ontology = data_set.ontology
+    analysis_stimuli = {
+        "long_squares": ontology.long_square_names | ontology.coarse_long_square_names,
+        "short_squares": ontology.short_square_names,
+        "ramps": ontology.ramp_names
+    }
+
+    lu.log_pretty_header("Analyzing cell features:", level=2)
+    cell_results = {}
+    for index, (name, extract) in enumerate(CACHED_CELL_FEATURE_EXTRACTORS.items()):
+        progress(
+            "Computing cell features", index, len(CACHED_CELL_FEATURE_EXTRACTORS)
+        )
+        analyze = partial(extract, data_set, cache)
+        key = cell_analysis_key(data_set, analysis_stimuli[name], digests)
+        if key is None:
+            cell_results[name] = analyze()
+        else:
+            cell_results[name] = copy.deepcopy(
+                cache.get_or_compute(CELL_STAGE, (name, key), analyze)
+            )
+
+    return merge_feature_results(data_set, cell_results, [sweep_results])
@@ -0,0 +1,228 @@
+""" Reads the data of many sweeps from an NWB file at once. Compared to reading
+sweeps one at a time through ipfx, this:
+    - finds every sweep's series in a single pass over the sweep table,
+        rather than one pass per sweep
+    - reads each series' whole dataset (so reads of chunked datasets are
+        chunk-aligned) directly into one shared buffer, in the order in which
+        the datasets are laid out in the file
+    - scales the data in place, rather than in a series of temporary copies
+Each sweep's stimulus and response are views into the shared buffer.
+"""
+import threading
+from typing import Optional, Sequence, Dict, List, Tuple, Type, Any
+
+import numpy as np
+
+from ipfx.dataset.ephys_nwb_data import EphysNWBData
+from ipfx.dataset.ephys_data_set import _nan_trailing_zeros
+
+from trace_store import ALIGNMENT
+
+
+# (stimulus, response) scale factors, by stimulus unit. These convert to mV
+# and pA, as ipfx does.
+UNIT_SCALES = {
+    "Volts": (1.0e3, 1.0e12),
+    "Amps": (1.0e12, 1.0e3)
+}
+
+
+def supports_bulk_reads(data: Any) -> bool:
+    """ Whether a data interface's sweeps can be read by a SweepLoader; that is,
+    whether it reads sweep data as ipfx's EphysNWBData does.
+    """
+    return isinstance(data, EphysNWBData) \
+        and type(data).get_sweep_data is EphysNWBData.get_sweep_data
+
+
+class SweepLoader:
+
+    def __init__(self, data: EphysNWBData):
+        """ Reads the data of many sweeps at once from an NWB file. May be
+        used from multiple threads.
+
+        Parameters
+        ----------
+        data : the opened file. Sweep data are read as by its get_sweep_data.
+
+        """
+
+        self.data = data
+        self._series: Optional[Dict[int, List[Any]]] = None
+        self._lock = threading.Lock()
+
+    def sweep_series(self) -> Dict[int, List[Any]]:
+        """ All of the series recorded in each sweep, found in a single pass
+        over the file's sweep table.
+        """
+
+        with self._lock:
+            if self._series is None:
+                sweep_table = self.data.nwb.sweep_table
+                table_numbers = np.asarray(sweep_table["sweep_number"].data[:])
+                series_column = sweep_table["series"]
+
+                series: Dict[int, List[Any]] = {}
+                for row, sweep_number in enumerate(table_numbers.tolist()):
+                    series.setdefault(sweep_number, []).extend(series_column[row])
+                self._series = series
+
+        return self._series
+
+    def series(
+        self,
+        sweep_number: int,
+        series_class: Tuple[Type, ...]
+    ) -> Any:
+        """ As EphysNWBData._get_series: the single series of a given class
+        (stimulus or response) recorded in a sweep.
+        """
+
+        series = self.sweep_series().get(int(sweep_number))
+        if not series:
+            raise ValueError(
+                f"No TimeSeries found for sweep number {sweep_number}."
+            )
+
+        matching = [item for item in series if isinstance(item, series_class)]
+        if len(matching) == 1:
+            return matching[0]
+
+        series_name = "stimulus" if series_class == self.data.STIMULUS \
+            else "response"
+        if matching:
+            raise ValueError(
+                f"Found {len(matching)} {series_name} PatchClampSeries "
+                f"{[item.name for item in matching]} "
+                f"for sweep number {sweep_number}."
+            )
+        raise ValueError(
+            f"Could not find any {series_name} PatchClampSeries "
+            f"for sweep number {sweep_number}."
+        )
+
+    def sweep_data(self, sweep_numbers: Sequence[int]) -> Dict[int, Dict]:
+        """ Read several sweeps' data.
+
+        Parameters
+        ----------
+        sweep_numbers : identifiers of the sweeps to read
+
+        Returns
+        -------
+        Maps sweep numbers to sweep data, as returned by
+        ipfx.dataset.ephys_data_set.EphysDataSet.get_sweep_data (so with
+        trailing zeros in the response replaced by NaN). Stimuli and responses
+        are views into a shared buffer.
+
+        """
+
+        sweep_numbers = list(dict.fromkeys(sweep_numbers))
+
+        units = {}
+        series = []
+        for sweep_number in sweep_numbers:
+            stimulus = self.series(sweep_number, self.data.STIMULUS)
+            response = self.series(sweep_number, self.data.RESPONSE)
+
+            stimulus_unit = self.data.get_long_unit_name(stimulus.unit)
+            self.data.validate_SI_unit(stimulus_unit)
+            self.data.validate_SI_unit(
+                self.data.get_long_unit_name(response.unit)
+            )
+
+            units[sweep_number] = stimulus_unit
+            series.extend([stimulus, response])
+
+        arrays = read_series(series)
+
+        results = {}
+        for index, sweep_number in enumerate(sweep_numbers):
+            stimulus, response = arrays[2 * index], arrays[2 * index + 1]
+            scales = UNIT_SCALES.get(units[sweep_number])
+            if scales is not None:
+                stimulus *= scales[0]
+                response *= scales[1]
+
+            results[sweep_number] = {
+                "stimulus": stimulus,
+                "response": _nan_trailing_zeros(response, inplace=True),
+                "stimulus_unit": units[sweep_number],
+                "sampling_rate": float(series[2 * index].rate)
+            }
+
+        return results
+
+
+def file_offset(dataset: Any) -> Optional[int]:
+    """ The position in its file of a contiguously stored HDF5 dataset, or
+    None for chunked (or in-memory) datasets.
+    """
+
+    try:
+        return dataset.id.get_offset()
+    except AttributeError:
+        return None
+
+
+def aligned_empty(size: int, dtype: np.dtype) -> np.ndarray:
+    """ As np.empty (for a 1D array), but the array starts at a multiple of 
+    ALIGNMENT bytes.
+    """
+
+    raw = np.empty(size * dtype.itemsize + ALIGNMENT, dtype=np.uint8)
+    start = -raw.ctypes.data % ALIGNMENT
+    return raw[start: start + size * dtype.itemsize].view(dtype)
+
+
+def read_series(series: Sequence[Any]) -> List[np.ndarray]:
+    """ Read the data of several series, multiplied by each series'
+    conversion factor. The data are read into one buffer per data type (in
+    file order) and the returned arrays are views into these.
+
+    Parameters
+    ----------
+    series : each has data (an HDF5 dataset or array) and a conversion factor
+
+    Returns
+    -------
+    The data of each series, in the order given. Each array has the data type
+    produced by multiplying its raw data by a float, and starts at an aligned
+    offset within its buffer.
+
+    """
+
+    datasets = [item.data for item in series]
+    dtypes = [np.result_type(dataset.dtype, 1.0) for dataset in datasets]
+
+    # lay out each data type's buffer
+    offsets = [0] * len(series)
+    sizes: Dict[np.dtype, int] = {}
+    for index, (dataset, dtype) in enumerate(zip(datasets, dtypes)):
+        step = max(ALIGNMENT // dtype.itemsize, 1)
+        offsets[index] = -(-sizes.get(dtype, 0) // step) * step
+        sizes[dtype] = offsets[index] + len(dataset)
+
+    buffers = {dtype: aligned_empty(size, dtype) for dtype, size in sizes.items()}
+    arrays = [
+        buffers[dtype][offset: offset + len(dataset)]
+        for dataset, dtype, offset in zip(datasets, dtypes, offsets)
+    ]
+
+    # chunked datasets, whose position is unknown, are read last
+    positions = [file_offset(dataset) for dataset in datasets]
+    order = sorted(
+        range(len(series)),
+        key=lambda index: (positions[index] is None, positions[index] or 0)
+    )
+    for index in order:
+        dataset, array = datasets[index], arrays[index]
+        if len(array) == 0:
+            continue
+        if hasattr(dataset, "read_direct"):
+            dataset.read_direct(array)
+        else:
+            array[:] = dataset[:]
+        array *= float(series[index].conversion)
+
+    return arrays
@@ -1,18 +1,38 @@
 import io
+from concurrent.futures import Executor
 
-from typing import NamedTuple, Tuple, Union, Optional
+from typing import (
+    NamedTuple, Tuple, Union, Optional, Sequence, List, Dict, TYPE_CHECKING
+)
 
 from PyQt5.QtCore import QByteArray
-
-from pyqtgraph import PlotWidget, mkPen
+from PyQt5.QtGui import QImage
 
 import numpy as np
-import matplotlib.pyplot as plt
 import matplotlib as mpl
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.ticker import NullLocator
 
 from ipfx.ephys_data_set import EphysDataSet
 from ipfx.sweep import Sweep
-from ipfx.epochs import get_experiment_epoch
+from ipfx.epochs import (
+    get_experiment_epoch, PRESTIM_STABILITY_EPOCH, POSTSTIM_STABILITY_EPOCH
+)
+
+from workers import ProgressCallback, no_progress, SpawnProcessPool
+from line_renderer import Line, Limits, render_lines_image, render_lines_svg
+from trace_pyramid import TracePyramid, plot_pyramid
+from trace_store import TraceStore
+from time_axis import TimeAxis, TimeLike, axes_searchsorted
+from data_set_session import read_sweeps
+
+# pyqtgraph imports Qt widgets, so is only imported once a popup is drawn. 
+# Plots can then be generated without a gui (see batch).
+if TYPE_CHECKING:
+    from pyqtgraph import PlotWidget
+    from thumbnail_cache import ThumbnailCache
+    from review_bundle import ReviewBundle
 
 
 PLOT_FONTSIZE = 24
@@ -25,6 +45,22 @@ TEST_PULSE_INIT_COLOR = "#ff0000"
 EXP_PULSE_CURRENT_COLOR = "#000000"
 EXP_PULSE_BASELINE_COLOR = "#0000ff"
 
+SVG_THUMBNAIL_FORMAT = "svg"
+PIXMAP_THUMBNAIL_FORMAT = "pixmap"
+THUMBNAIL_FORMATS = (SVG_THUMBNAIL_FORMAT, PIXMAP_THUMBNAIL_FORMAT)
+
+QPAINTER_THUMBNAIL_RENDERER = "qpainter"
+MATPLOTLIB_THUMBNAIL_RENDERER = "matplotlib"
+THUMBNAIL_RENDERERS = (QPAINTER_THUMBNAIL_RENDERER, MATPLOTLIB_THUMBNAIL_RENDERER)
+
+# size (px) of the viewbox of SVG thumbnails drawn with QPainter. Matches the 
+# size (pt) of matplotlib's SVG output at DEFAULT_FIGSIZE.
+SVG_THUMBNAIL_SIZE = (DEFAULT_FIGSIZE[0] * 72, DEFAULT_FIGSIZE[1] * 72)
+
+# plot data are extracted from this many sweeps at a time (see 
+# SweepPlotter.popup_plotters), bounding the number of raw sweeps in memory
+PLOT_DATA_CHUNK_SIZE = 32
+
 
 class SweepPlotConfig(NamedTuple):
     test_pulse_plot_start: float
@@ -34,45 +70,115 @@ class SweepPlotConfig(NamedTuple):
     experiment_baseline_start_index: int
     experiment_baseline_end_index: int
     thumbnail_step: int
+    thumbnail_workers: int = 1
+    thumbnail_format: str = SVG_THUMBNAIL_FORMAT
+    thumbnail_renderer: str = QPAINTER_THUMBNAIL_RENDERER
+    thumbnail_buckets: int = 500
 
 
 class ExperimentPopupPlotter:
 
-    __slots__ = ["time", "voltage", "baseline"]
+    __slots__ = [
+        "time", "voltage", "baseline", "sweep_number", "_pyramids", "_store"
+    ]
 
     def __init__(
         self, 
-        time: np.ndarray, 
+        time: TimeLike, 
         voltage: np.ndarray, 
-        baseline: np.ndarray
+        baseline: np.ndarray,
+        sweep_number: Optional[int] = None
     ):
         """ Displays an interactive plot of a sweep's experiment epoch, along
-        with a horizontal line at the baseline.
+        with a horizontal line at the baseline. A min/max pyramid of the trace
+        is built the first time the plot is displayed, so that only as much 
+        detail as is visible need be drawn.
 
         Parameters
         ----------
-        time : in seconds. Forms the domain of the plot
+        time : in seconds. Forms the domain of the plot. Usually a TimeAxis,
+            so that timestamps are only generated as they are drawn.
         voltage : in mV
         baseline: in mV
+        sweep_number : identifier for this sweep
 
         """
 
         self.time = time
         self.voltage = voltage
         self.baseline = baseline
+        self.sweep_number = sweep_number
+        self._pyramids: Optional[Dict[str, TracePyramid]] = None
+        self._store: Optional[TraceStore] = None
+
+    def pyramids(self) -> Dict[str, TracePyramid]:
+        """ Min/max pyramids of this plotter's trace (built on first use), by 
+        trace name.
+        """
+
+        if self._pyramids is None:
+            self._pyramids = {"voltage": TracePyramid(self.time, self.voltage)}
+            if self._store is not None:
+                self._pyramids = spill_pyramids(self, self._pyramids, self._store)
+        return self._pyramids
+
+    def set_pyramids(self, pyramids: Dict[str, TracePyramid]):
+        """ Supply previously built pyramids (see pyramids), so that they need 
+        not be rebuilt.
+        """
+        self._pyramids = pyramids
+
+    def spill(self, store: TraceStore):
+        """ Move this plotter's trace (and pyramids, including any built 
+        later) into a trace store, so that it is only held in memory while 
+        being drawn.
+        """
+
+        self.time = store.store(self.time)
+        self.voltage = store.store(self.voltage)
+        if self._pyramids is not None:
+            self._pyramids = spill_pyramids(self, self._pyramids, store)
+        self._store = store
 
-    def __call__(self) -> PlotWidget:
+    def decimated(self, step: int) -> "ExperimentPopupPlotter":
+        """ A copy of this plotter holding every step'th sample.
+        """
+
+        return ExperimentPopupPlotter(
+            time=self.time[::step],
+            voltage=self.voltage[::step],
+            baseline=self.baseline,
+            sweep_number=self.sweep_number
+        )
+
+    def envelope(self, num_buckets: int) -> "ExperimentPopupPlotter":
+        """ A copy of this plotter holding the min/max envelope of its trace. 
+        See min_max_envelope.
+        """
+
+        time, (voltage,) = min_max_envelope(self.time, [self.voltage], num_buckets)
+
+        return ExperimentPopupPlotter(
+            time=time,
+            voltage=voltage,
+            baseline=self.baseline,
+            sweep_number=self.sweep_number
+        )
+
+    def __call__(self) -> "PlotWidget":
         """ Generate an interactive pyqtgraph plot widget from this plotter's
         data
         """
 
+        from pyqtgraph import PlotWidget, mkPen
+
         graph = PlotWidget()
         plot = graph.getPlotItem()
 
         plot.setLabel("left", "membrane potential (mV)")
         plot.setLabel("bottom", "time (s)")
 
-        plot.plot(self.time, self.voltage, 
+        plot_pyramid(plot, self.pyramids()["voltage"], 
             pen=mkPen(color=EXP_PULSE_CURRENT_COLOR, width=2))
         plot.addLine(y=self.baseline, 
             pen=mkPen(color=EXP_PULSE_BASELINE_COLOR, width=2), 
@@ -83,22 +189,27 @@ class ExperimentPopupPlotter:
 
 class PulsePopupPlotter:
 
-    __slots__ = ["time", "voltage", "previous", "initial", "sweep_number"]
+    __slots__ = [
+        "time", "voltage", "previous", "initial", "sweep_number", "_pyramids",
+        "_store"
+    ]
 
     def __init__(
         self, 
-        time: np.ndarray, 
+        time: TimeLike, 
         voltage: np.ndarray, 
         previous: Optional[np.ndarray], 
         initial: Optional[np.ndarray],
         sweep_number: int
     ):
         """ Plots the test pulse reponse, along with responses to the previous
-        and first test pulse.
+        and first test pulse. As for ExperimentPopupPlotter, traces are drawn
+        from min/max pyramids.
 
         Parameters
         ----------
-        time : in seconds. Forms the domain of the plot
+        time : in seconds. Forms the domain of the plot. As for 
+            ExperimentPopupPlotter, usually a TimeAxis.
         voltage : in mV. Voltage trace from this sweep
         previous : in mV. Voltage trace from the prior sweep, or None if this is
             the first sweep.
@@ -113,12 +224,84 @@ class PulsePopupPlotter:
         self.previous = previous
         self.initial = initial
         self.sweep_number = sweep_number
+        self._pyramids: Optional[Dict[str, TracePyramid]] = None
+        self._store: Optional[TraceStore] = None
 
-    def __call__(self) -> PlotWidget:
+    def pyramids(self) -> Dict[str, TracePyramid]:
+        """ Min/max pyramids of each of this plotter's traces (built on first 
+        use), by trace name.
+        """
+
+        if self._pyramids is None:
+            self._pyramids = {
+                name: TracePyramid(self.time, trace)
+                for name, trace in [
+                    ("initial", self.initial), 
+                    ("previous", self.previous), 
+                    ("voltage", self.voltage)
+                ]
+                if trace is not None
+            }
+            if self._store is not None:
+                self._pyramids = spill_pyramids(self, self._pyramids, self._store)
+        return self._pyramids
+
+    def set_pyramids(self, pyramids: Dict[str, TracePyramid]):
+        """ Supply previously built pyramids (see pyramids), so that they need 
+        not be rebuilt.
+        """
+        self._pyramids = pyramids
+
+    def spill(self, store: TraceStore):
+        """ Move this plotter's traces (and pyramids, including any built 
+        later) into a trace store, so that they are only held in memory while 
+        being drawn.
+        """
+
+        self.time = store.store(self.time)
+        self.voltage = store.store(self.voltage)
+        self.previous = store.store(self.previous)
+        self.initial = store.store(self.initial)
+        if self._pyramids is not None:
+            self._pyramids = spill_pyramids(self, self._pyramids, store)
+        self._store = store
+
+    def decimated(self, step: int) -> "PulsePopupPlotter":
+        """ A copy of this plotter holding every step'th sample of each trace.
+        """
+
+        return PulsePopupPlotter(
+            time=self.time[::step],
+            voltage=self.voltage[::step],
+            previous=None if self.previous is None else self.previous[::step],
+            initial=None if self.initial is None else self.initial[::step],
+            sweep_number=self.sweep_number
+        )
+
+    def envelope(self, num_buckets: int) -> "PulsePopupPlotter":
+        """ A copy of this plotter holding the min/max envelope of each trace. 
+        See min_max_envelope.
+        """
+
+        time, (voltage, previous, initial) = min_max_envelope(
+            self.time, [self.voltage, self.previous, self.initial], num_buckets
+        )
+
+        return PulsePopupPlotter(
+            time=time,
+            voltage=voltage,
+            previous=previous,
+            initial=initial,
+            sweep_number=self.sweep_number
+        )
+
+    def __call__(self) -> "PlotWidget":
         """ Generate an interactive pyqtgraph plot widget from this plotter's
         data
         """
 
+        from pyqtgraph import PlotWidget, mkPen
+
         graph = PlotWidget()
         plot = graph.getPlotItem()
 
@@ -127,17 +310,19 @@ class PulsePopupPlotter:
 
         plot.addLegend()
 
+        pyramids = self.pyramids()
+
         if self.initial is not None:
-            plot.plot(self.time, self.initial,
+            plot_pyramid(plot, pyramids["initial"],
              pen=mkPen(color=TEST_PULSE_INIT_COLOR, width=2), 
                 name="initial")
 
         if self.previous is not None:
-            plot.plot(self.time, self.previous, 
+            plot_pyramid(plot, pyramids["previous"], 
             pen=mkPen(color=TEST_PULSE_PREV_COLOR, width=2), 
                 name="previous")
 
-        plot.plot(self.time, self.voltage, 
+        plot_pyramid(plot, pyramids["voltage"], 
             pen=mkPen(color=TEST_PULSE_CURRENT_COLOR, width=2), 
             name=f"sweep {self.sweep_number}")
 
@@ -147,39 +332,127 @@ class PulsePopupPlotter:
 PopupPlotter = Union[ExperimentPopupPlotter, PulsePopupPlotter]
 
 
+def spill_pyramids(
+    plotter: PopupPlotter,
+    pyramids: Dict[str, TracePyramid],
+    store: TraceStore
+) -> Dict[str, TracePyramid]:
+    """ Move the levels of a plotter's trace pyramids into a trace store. The 
+    returned pyramids summarize the plotter's (possibly already stored) 
+    traces, which are named as the pyramids are.
+    """
+
+    return {
+        name: TracePyramid.from_levels(
+            plotter.time,
+            getattr(plotter, name),
+            pyramid.factor,
+            [(store.store(mins), store.store(maxs)) for mins, maxs in pyramid.levels]
+        )
+        for name, pyramid in pyramids.items()
+    }
+
+
+class RasterThumbnail:
+
+    __slots__ = ["plotter", "renderer", "_image"]
+
+    def __init__(
+        self, 
+        plotter: PopupPlotter, 
+        renderer: str = QPAINTER_THUMBNAIL_RENDERER
+    ):
+        """ A thumbnail which is rasterized at the size at which it is 
+        displayed. The most recent raster is kept, so that repainting at an 
+        unchanged size does not require redrawing.
+
+        Parameters
+        ----------
+        plotter : holds the (decimated) data to be drawn
+        renderer : which of THUMBNAIL_RENDERERS to draw with
+
+        """
+
+        self.plotter = plotter
+        self.renderer = renderer
+        self._image: Optional[QImage] = None
+
+    def image(self, width: int, height: int) -> QImage:
+        """ Obtain this thumbnail rasterized at a particular size (px). 
+        """
+
+        if self._image is None \
+                or self._image.width() != width \
+                or self._image.height() != height:
+            self._image = thumbnail_image(
+                self.plotter, width, height, self.renderer
+            )
+
+        return self._image
+
+
+Thumbnail = Union[QByteArray, RasterThumbnail]
+
+
 class FixedPlots(NamedTuple):
     """ Each plot displayed in the sweep table comes in a thumbnail-full plot
     pair.
     """
-    thumbnail: QByteArray
+    thumbnail: Thumbnail
     full: Union[ExperimentPopupPlotter, PulsePopupPlotter]
 
 
 class SweepPlotter:
 
-    def __init__(self, data_set: EphysDataSet, config: SweepPlotConfig):
+    def __init__(
+        self, 
+        data_set: EphysDataSet, 
+        config: SweepPlotConfig,
+        cache: Optional["ThumbnailCache"] = None,
+        cache_key: Optional[str] = None,
+        review_bundle: Optional["ReviewBundle"] = None,
+        trace_store: Optional[TraceStore] = None
+    ):
         """ Generate plots for each sweep in an experiment
 
         Parameters
         ----------
         data_set : plots will be generated from these experimental data
         config : parameters tweaking the generated plots
+        cache : if provided (along with cache_key), plots are read from here 
+            when available and stored here when generated
+        cache_key : identifies this data set, config and sweep order in the 
+            cache. See ThumbnailCache.key
+        review_bundle : if provided, plots are read from here in preference 
+            to the cache. Its plots must match config and the sweep order 
+            (see ReviewBundle.plots_match).
+        trace_store : if provided, the full-resolution traces behind each 
+            popup plot are moved here once plotted, rather than being held in
+            memory
 
         """
 
         self.data_set = data_set
         self.config = config
+        self.cache = cache
+        self.cache_key = cache_key
+        self.review_bundle = review_bundle
+        self.trace_store = trace_store
         self.previous_test_voltage = None
         self.initial_test_voltage = None
 
+        self._test_pulse_data: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
 
-    def make_test_pulse_plots(
-        self, 
-        sweep_number: int, 
-        sweep_data: Sweep, 
+
+    def test_pulse_plotter(
+        self,
+        sweep_number: int,
+        sweep_data: Sweep,
         advance: bool = True
-    ) -> FixedPlots:
-        """ Generate test pulse response plots for a single sweep
+    ) -> PulsePopupPlotter:
+        """ Extract the data needed to plot a single sweep's test pulse 
+        response. Must be called in sweep order, since each plot compares 
+        against the previous and initial sweeps.
 
         Parameters
         ----------
@@ -187,7 +460,6 @@ class SweepPlotter:
         sweep_data : holds timestamps and voltage values for this sweep
         advance : if True, store this sweep's voltage for use in later plots
 
-
         """
 
         time, voltage = test_response_plot_data(
@@ -197,12 +469,6 @@ class SweepPlotter:
             self.config.test_pulse_baseline_samples
         )
 
-        thumbnail = make_test_pulse_plot(sweep_number, 
-            time, voltage, 
-            self.previous_test_voltage, self.initial_test_voltage, 
-            step=self.config.thumbnail_step, labels=False
-        )
-
         previous = self.previous_test_voltage
         initial = self.initial_test_voltage
 
@@ -212,24 +478,20 @@ class SweepPlotter:
                 
             self.previous_test_voltage = voltage
 
-        return FixedPlots(
-            thumbnail=svg_from_mpl_axes(thumbnail), 
-            full=PulsePopupPlotter(
-                time=time,
-                voltage=voltage,
-                previous=previous,
-                initial=initial,
-                sweep_number=sweep_number
-            )
+        return PulsePopupPlotter(
+            time=time,
+            voltage=voltage,
+            previous=previous,
+            initial=initial,
+            sweep_number=sweep_number
         )
 
-
-    def make_experiment_plots(
+    def experiment_plotter(
         self, 
         sweep_number: int, 
         sweep_data: Sweep
-    ) -> FixedPlots:
-        """ Generate experiment response plots for a single sweep
+    ) -> ExperimentPopupPlotter:
+        """ Extract the data needed to plot a single sweep's experiment epoch
 
         Parameters
         ----------
@@ -245,20 +507,71 @@ class SweepPlotter:
             self.config.experiment_baseline_end_index
         )
 
-        thumbnail = make_experiment_plot(
-            sweep_number, exp_time, exp_voltage, exp_baseline, 
-            step=self.config.thumbnail_step, labels=False
+        return ExperimentPopupPlotter(
+            time=exp_time, 
+            voltage=exp_voltage, 
+            baseline=exp_baseline,
+            sweep_number=sweep_number
         )
 
-        return FixedPlots(
-            thumbnail=svg_from_mpl_axes(thumbnail),
-            full=ExperimentPopupPlotter(
-                time=exp_time, 
-                voltage=exp_voltage, 
-                baseline=exp_baseline
-            )
-        )
+    def make_test_pulse_plots(
+        self, 
+        sweep_number: int, 
+        sweep_data: Sweep, 
+        advance: bool = True
+    ) -> FixedPlots:
+        """ Generate test pulse response plots for a single sweep
+
+        Parameters
+        ----------
+        sweep_number : used to generate meaningful labels
+        sweep_data : holds timestamps and voltage values for this sweep
+        advance : if True, store this sweep's voltage for use in later plots
+
+        """
+
+        full = self.test_pulse_plotter(sweep_number, sweep_data, advance)
+        return FixedPlots(thumbnail=self.make_thumbnail(full), full=full)
+
+    def make_experiment_plots(
+        self, 
+        sweep_number: int, 
+        sweep_data: Sweep
+    ) -> FixedPlots:
+        """ Generate experiment response plots for a single sweep
+
+        Parameters
+        ----------
+        sweep_number : used to generate meaningful labels
+        sweep_data : holds timestamps and voltage values for this sweep
+
+        """
+
+        full = self.experiment_plotter(sweep_number, sweep_data)
+        return FixedPlots(thumbnail=self.make_thumbnail(full), full=full)
 
+    def thumbnail_data(self, full: PopupPlotter) -> PopupPlotter:
+        """ Reduce a popup plotter's data to what is needed to draw its 
+        thumbnail: the min/max envelope over config.thumbnail_buckets 
+        buckets or (if that is 0) every config.thumbnail_step'th sample.
+        """
+
+        if self.config.thumbnail_buckets > 0:
+            return full.envelope(self.config.thumbnail_buckets)
+        return full.decimated(self.config.thumbnail_step)
+
+    def make_thumbnail(self, full: PopupPlotter) -> Thumbnail:
+        """ Generate a thumbnail, in the configured format, from a popup 
+        plotter's data.
+        """
+
+        decimated = self.thumbnail_data(full)
+
+        renderer = self.config.thumbnail_renderer
+
+        if self.config.thumbnail_format == PIXMAP_THUMBNAIL_FORMAT:
+            return RasterThumbnail(decimated, renderer)
+        return QByteArray(thumbnail_svg(decimated, renderer))
 
     def advance(self, sweep_number):
         sweep_data = self.data_set.sweep(sweep_number)
@@ -267,16 +580,538 @@ class SweepPlotter:
             self.make_experiment_plots(sweep_number, sweep_data)
         )
 
+    def test_pulse_data(
+        self, 
+        sweep_number: int, 
+        sweep_data: Optional[Sweep] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """ Time and voltage arrays for a sweep's test pulse response. These 
+        are cached, since each sweep's test pulse is also drawn on the plots 
+        of the following and (for the first sweep) all other sweeps.
+
+        Parameters
+        ----------
+        sweep_number : identifier for the sweep
+        sweep_data : holds timestamps and voltage values for this sweep. Will 
+            be loaded from the data set if needed and not provided.
+
+        """
+
+        cached = self._test_pulse_data.get(sweep_number)
+
+        if cached is None:
+            if sweep_data is None:
+                sweep_data = self.data_set.sweep(sweep_number)
+
+            cached = self.cache_test_pulse_data(
+                sweep_number,
+                test_response_plot_data(
+                    sweep_data, 
+                    self.config.test_pulse_plot_start,
+                    self.config.test_pulse_plot_end, 
+                    self.config.test_pulse_baseline_samples
+                )
+            )
+
+        return cached
+
+    def cache_test_pulse_data(
+        self, 
+        sweep_number: int, 
+        data: Tuple[TimeAxis, np.ndarray]
+    ) -> Tuple[TimeAxis, np.ndarray]:
+        """ Store a sweep's test pulse time and voltage (see test_pulse_data),
+        moving the voltage to the trace store if there is one.
+        """
+
+        if self.trace_store is not None:
+            data = tuple(map(self.trace_store.store, data))
+        self._test_pulse_data[sweep_number] = data
+        return data
+
+    def load_sweeps(self, sweep_numbers: Sequence[int]) -> List[Sweep]:
+        """ Read some sweeps' data from the data set (all at once, if it 
+        supports this)
+        """
+        return read_sweeps(self.data_set, sweep_numbers)
+
+    def popup_plotters(
+        self,
+        sweep_numbers: Sequence[int],
+        positions: Sequence[int],
+        progress: ProgressCallback = no_progress
+    ) -> List[Tuple[PulsePopupPlotter, ExperimentPopupPlotter]]:
+        """ Extract the data needed to plot the test pulse responses and 
+        experiment epochs of some of an ordered sequence of sweeps. Unlike 
+        test_pulse_plotter_at and experiment_plotter, sweeps are read and 
+        processed together (PLOT_DATA_CHUNK_SIZE at a time): windows, epochs
+        and baselines are computed for a whole chunk with vectorized numpy 
+        (see batch_test_response_plot_data and batch_experiment_plot_data).
+
+        Parameters
+        ----------
+        sweep_numbers : all sweeps, in order. The previous and initial test 
+            pulses are taken from this sequence.
+        positions : plot the sweeps at these positions in sweep_numbers
+        progress : called with (message, completed, total) after each chunk
+
+        Returns
+        -------
+        A (test pulse, experiment) plotter pair for each position, in sorted 
+        order
+
+        """
+
+        positions = sorted(positions)
+        plotters: List[Tuple[PulsePopupPlotter, ExperimentPopupPlotter]] = []
+
+        for chunk_start in range(0, len(positions), PLOT_DATA_CHUNK_SIZE):
+            progress("Extracting sweep plot data", chunk_start, len(positions))
+
+            chunk = positions[chunk_start: chunk_start + PLOT_DATA_CHUNK_SIZE]
+            chunk_numbers = [sweep_numbers[position] for position in chunk]
+
+            # the previous and initial test pulses are also needed
+            references = {
+                sweep_numbers[reference] 
+                for position in chunk if position > 0 
+                for reference in (0, position - 1)
+            }
+            references = sorted(
+                references - set(chunk_numbers) - set(self._test_pulse_data)
+            )
+
+            sweeps = self.load_sweeps(chunk_numbers + references)
+            uncached = [
+                (sweep_number, sweep) 
+                for sweep_number, sweep in zip(chunk_numbers + references, sweeps)
+                if sweep_number not in self._test_pulse_data
+            ]
+            test_pulses = batch_test_response_plot_data(
+                [sweep for _, sweep in uncached],
+                self.config.test_pulse_plot_start,
+                self.config.test_pulse_plot_end, 
+                self.config.test_pulse_baseline_samples
+            )
+            for (sweep_number, _), data in zip(uncached, test_pulses):
+                self.cache_test_pulse_data(sweep_number, data)
+
+            experiments = batch_experiment_plot_data(
+                sweeps[:len(chunk)],
+                self.config.backup_experiment_start_index, 
+                self.config.experiment_baseline_start_index, 
+                self.config.experiment_baseline_end_index
+            )
+
+            for position, sweep_number, (time, voltage, baseline) in zip(
+                chunk, chunk_numbers, experiments
+            ):
+                plotters.append((
+                    self.test_pulse_plotter_at(sweep_numbers, position),
+                    ExperimentPopupPlotter(
+                        time=time, 
+                        voltage=voltage, 
+                        baseline=baseline,
+                        sweep_number=sweep_number
+                    )
+                ))
+
+        return plotters
+
+    def test_pulse_plotter_at(
+        self,
+        sweep_numbers: Sequence[int],
+        position: int,
+        sweep_data: Optional[Sweep] = None
+    ) -> PulsePopupPlotter:
+        """ Extract the data needed to plot the test pulse response of one of 
+        an ordered sequence of sweeps. Unlike test_pulse_plotter, this may be 
+        called for sweeps in any order.
+
+        Parameters
+        ----------
+        sweep_numbers : all sweeps, in order. The previous and initial test 
+            pulses are taken from this sequence.
+        position : plot the sweep at this position in sweep_numbers
+        sweep_data : holds timestamps and voltage values for this sweep
+
+        """
+
+        sweep_number = sweep_numbers[position]
+        time, voltage = self.test_pulse_data(sweep_number, sweep_data)
+
+        previous = None
+        initial = None
+        if position > 0:
+            previous = self.test_pulse_data(sweep_numbers[position - 1])[1]
+            initial = self.test_pulse_data(sweep_numbers[0])[1]
+
+        return PulsePopupPlotter(
+            time=time,
+            voltage=voltage,
+            previous=previous,
+            initial=initial,
+            sweep_number=sweep_number
+        )
+
+    def plot_sweeps(
+        self,
+        sweep_numbers: Sequence[int],
+        positions: Optional[Sequence[int]] = None,
+        executor: Optional[Executor] = None,
+        progress: ProgressCallback = no_progress
+    ) -> Dict[int, Tuple[FixedPlots, FixedPlots]]:
+        """ Generate test pulse and experiment plots for some of an ordered 
+        sequence of sweeps. Plots are read from the review bundle or the 
+        cache where possible. The remainder are generated by render_sweeps 
+        and then cached. Popup traces are then moved to the trace store, if 
+        there is one.
+
+        Parameters
+        ----------
+        sweep_numbers : all sweeps, in order
+        positions : plot the sweeps at these positions in sweep_numbers. 
+            Defaults to all of them.
+        executor : renders thumbnails. If not provided, one will be created 
+            (and shut down) according to config.thumbnail_workers.
+        progress : called with (message, completed, total) after each sweep
+
+        Returns
+        -------
+        A (test pulse plots, experiment plots) pair for each position
+
+        """
+
+        if positions is None:
+            positions = range(len(sweep_numbers))
+        positions = sorted(positions)
+
+        plots: Dict[int, Tuple[FixedPlots, FixedPlots]] = {}
+
+        if self.review_bundle is not None:
+            progress("Reading precomputed sweep plots", 0, 0)
+            bundled = self.review_bundle.load_plots(
+                [sweep_numbers[position] for position in positions]
+            )
+            for position in positions:
+                if sweep_numbers[position] in bundled:
+                    plots[position] = bundled[sweep_numbers[position]]
+            positions = [position for position in positions if position not in plots]
+
+        if self.cache is not None and self.cache_key is not None:
+            for index, position in enumerate(positions):
+                progress("Reading cached sweep plots", index, len(positions))
+                cached = self.cache.load(self.cache_key, sweep_numbers[position])
+                if cached is not None:
+                    plots[position] = cached
+
+        misses = [position for position in positions if position not in plots]
+        if misses:
+            rendered = self.render_sweeps(sweep_numbers, misses, executor, progress)
+            if self.cache is not None and self.cache_key is not None:
+                for position, sweep_plots in rendered.items():
+                    self.cache.store(
+                        self.cache_key, sweep_numbers[position], sweep_plots
+                    )
+            plots.update(rendered)
+
+        if self.trace_store is not None:
+            progress("Storing sweep traces", 0, 0)
+            for sweep_plots in plots.values():
+                self.spill(*sweep_plots)
+
+        return plots
+
+    def spill(self, *plots: FixedPlots):
+        """ Move the traces held by some plots into the trace store.
+        """
+
+        for fixed_plots in plots:
+            fixed_plots.full.spill(self.trace_store)
+            if isinstance(fixed_plots.thumbnail, RasterThumbnail):
+                fixed_plots.thumbnail.plotter.spill(self.trace_store)
+
+    def render_sweeps(
+        self,
+        sweep_numbers: Sequence[int],
+        positions: Sequence[int],
+        executor: Optional[Executor] = None,
+        progress: ProgressCallback = no_progress
+    ) -> Dict[int, Tuple[FixedPlots, FixedPlots]]:
+        """ Generate test pulse and experiment plots for some of an ordered 
+        sequence of sweeps, without consulting the cache. Data are extracted 
+        (and decimated) in this process. Rendering SVG thumbnails is 
+        independent per sweep, so it is fanned out across worker processes if 
+        an executor is available. See plot_sweeps for parameters.
+        """
+
+        positions = sorted(positions)
+        num_sweeps = len(positions)
+
+        # raster thumbnails are drawn at display time, so there is nothing to 
+        # farm out
+        if self.config.thumbnail_format == PIXMAP_THUMBNAIL_FORMAT:
+            executor = None
+        elif executor is None:
+            executor = make_thumbnail_executor(self.config.thumbnail_workers)
+
+            if executor is not None:
+                with executor:
+                    return self.render_sweeps(
+                        sweep_numbers, positions, executor, progress
+                    )
+
+        popups: List[PopupPlotter] = []
+        for plotters in self.popup_plotters(sweep_numbers, positions, progress):
+            popups.extend(plotters)
+
+        if executor is None:
+            thumbnails = map(self.make_thumbnail, popups)
+        else:
+            renderer = self.config.thumbnail_renderer
+            futures = [
+                executor.submit(
+                    thumbnail_svg, self.thumbnail_data(popup), renderer
+                )
+                for popup in popups
+            ]
+            thumbnails = (QByteArray(future.result()) for future in futures)
+
+        plots: List[FixedPlots] = []
+        try:
+            for thumbnail, full in zip(thumbnails, popups):
+                progress("Plotting sweeps", len(plots) // 2, num_sweeps)
+                plots.append(FixedPlots(thumbnail=thumbnail, full=full))
+        finally:
+            if executor is not None:
+                for future in futures:
+                    future.cancel()
+
+        return dict(zip(positions, zip(plots[::2], plots[1::2])))
+
+    def advance_all(
+        self, 
+        sweep_numbers: Sequence[int], 
+        executor: Optional[Executor] = None,
+        progress: ProgressCallback = no_progress
+    ) -> List[Tuple[FixedPlots, FixedPlots]]:
+        """ Generate test pulse and experiment plots for each of an ordered 
+        sequence of sweeps. See plot_sweeps for parameters.
+
+        Returns
+        -------
+        A (test pulse plots, experiment plots) pair for each sweep
+
+        """
+
+        plots = self.plot_sweeps(
+            sweep_numbers, executor=executor, progress=progress
+        )
+        return [plots[position] for position in range(len(sweep_numbers))]
+
+
+def min_max_envelope(
+    time: TimeLike, 
+    traces: Sequence[Optional[np.ndarray]], 
+    num_buckets: int
+) -> Tuple[np.ndarray, List[Optional[np.ndarray]]]:
+    """ Reduce some traces sharing a time axis to their minimum and maximum 
+    over each of (at most) num_buckets contiguous buckets of samples. Unlike 
+    taking every nth sample, this preserves brief excursions (e.g. action 
+    potentials). If each bucket is drawn in about one pixel, the result looks
+    like the full trace.
+
+    Parameters
+    ----------
+    time : timestamps of samples. Only the timestamps of bucket boundaries 
+        are read.
+    traces : each has one value per timestamp. None values are passed through.
+    num_buckets : the output will have at most twice this many points
+
+    Returns
+    -------
+    time : for each bucket, the times of its first and last samples
+    traces : for each bucket, the minimum and maximum (ignoring NaNs) of 
+        each trace. Buckets containing only NaNs are NaN.
+
+    """
+
+    num_samples = len(time)
+    if num_buckets <= 0 or num_samples <= 2 * num_buckets:
+        return time, list(traces)
+
+    bucket_size = int(np.ceil(num_samples / num_buckets))
+    starts = np.arange(0, num_samples, bucket_size)
+    ends = np.append(starts[1:], num_samples) - 1
+
+    reduced_time = np.empty(2 * len(starts), dtype=time.dtype)
+    reduced_time[0::2] = time[starts]
+    reduced_time[1::2] = time[ends]
+
+    reduced_traces: List[Optional[np.ndarray]] = []
+    for trace in traces:
+        if trace is None:
+            reduced_traces.append(None)
+            continue
+
+        reduced = np.empty(2 * len(starts), dtype=trace.dtype)
+        reduced[0::2] = np.fmin.reduceat(trace, starts)
+        reduced[1::2] = np.fmax.reduceat(trace, starts)
+        reduced_traces.append(reduced)
+
+    return reduced_time, reduced_traces
+
+
+def make_thumbnail_executor(num_workers: int) -> Optional[Executor]:
+    """ Build a process pool for rendering thumbnails. Returns None if 
+    num_workers does not call for more than one process, in which case 
+    thumbnails ought to be rendered serially in this process. Workers are 
+    spawned (rather than forked) so that they do not inherit Qt state.
+    """
+
+    if num_workers is None or num_workers <= 1:
+        return None
+
+    return SpawnProcessPool(num_workers)
+
+
+def thumbnail_svg(
+    plotter: PopupPlotter, 
+    renderer: str = QPAINTER_THUMBNAIL_RENDERER
+) -> bytes:
+    """ Render a thumbnail of a popup plotter's data as SVG. This function is 
+    safe to run in a worker process: its arguments and result are picklable 
+    and it does not touch pyplot or Qt widgets.
+
+    Parameters
+    ----------
+    plotter : holds the (decimated) data to be drawn
+    renderer : which of THUMBNAIL_RENDERERS to draw with
+
+    """
+
+    if renderer == MATPLOTLIB_THUMBNAIL_RENDERER:
+        return svg_bytes_from_mpl_figure(thumbnail_figure(plotter))
+
+    lines, x_lim = thumbnail_lines(plotter)
+    return render_lines_svg(lines, *SVG_THUMBNAIL_SIZE, x_lim=x_lim)
+
+
+def thumbnail_image(
+    plotter: PopupPlotter, 
+    width: int, 
+    height: int, 
+    renderer: str = QPAINTER_THUMBNAIL_RENDERER
+) -> QImage:
+    """ Rasterize a thumbnail of a popup plotter's data. Safe to call off of 
+    the GUI thread.
+
+    Parameters
+    ----------
+    plotter : holds the (decimated) data to be drawn
+    width, height : size (px) of the output image
+    renderer : which of THUMBNAIL_RENDERERS to draw with
+
+    """
+
+    if renderer == MATPLOTLIB_THUMBNAIL_RENDERER:
+        return raster_from_mpl_figure(thumbnail_figure(plotter), width, height)
+
+    lines, x_lim = thumbnail_lines(plotter)
+    return render_lines_image(lines, width, height, x_lim=x_lim)
+
+
+def thumbnail_lines(
+    plotter: PopupPlotter
+) -> Tuple[List[Line], Optional[Limits]]:
+    """ Describe a popup plotter's data as the lines making up its thumbnail 
+    (in drawing order), along with the x limits of the plot (None if these 
+    ought to be autoscaled). Mirrors make_test_pulse_plot and 
+    make_experiment_plot.
+    """
+
+    time = np.asarray(plotter.time)
+
+    if isinstance(plotter, PulsePopupPlotter):
+        lines = []
+        if plotter.initial is not None:
+            lines.append(Line(time, plotter.initial, TEST_PULSE_INIT_COLOR))
+        if plotter.previous is not None:
+            lines.append(Line(time, plotter.previous, TEST_PULSE_PREV_COLOR))
+        lines.append(Line(time, plotter.voltage, TEST_PULSE_CURRENT_COLOR))
+        return lines, None
+
+    time_lim = (time[0], time[-1])
+    return [
+        Line(time, plotter.voltage, EXP_PULSE_CURRENT_COLOR),
+        Line(
+            np.array(time_lim), 
+            np.array([plotter.baseline, plotter.baseline]), 
+            EXP_PULSE_BASELINE_COLOR
+        )
+    ], time_lim
+
+
+def thumbnail_figure(plotter: PopupPlotter) -> mpl.figure.Figure:
+    """ Make an unlabeled (static) plot of a popup plotter's data.
+    """
+
+    if isinstance(plotter, PulsePopupPlotter):
+        return make_test_pulse_plot(
+            plotter.sweep_number, 
+            np.asarray(plotter.time), plotter.voltage, 
+            plotter.previous, plotter.initial, 
+            labels=False
+        )
+
+    return make_experiment_plot(
+        plotter.sweep_number, 
+        np.asarray(plotter.time), plotter.voltage, plotter.baseline, 
+        labels=False
+    )
+
 
 def svg_from_mpl_axes(fig: mpl.figure.Figure) -> QByteArray:
     """ Convert a matplotlib figure to SVG and store it in a Qt byte array.
     """
 
+    return QByteArray(svg_bytes_from_mpl_figure(fig))
+
+
+def raster_from_mpl_figure(
+    fig: mpl.figure.Figure, 
+    width: int, 
+    height: int
+) -> QImage:
+    """ Rasterize a matplotlib figure to an image of the requested size (px). 
+    The figure's width in inches is preserved, so that text and lines are 
+    scaled as they would be if the figure were drawn as SVG.
+    """
+
+    dpi = width / fig.get_figwidth()
+    fig.set_dpi(dpi)
+    fig.set_size_inches(width / dpi, height / dpi)
+
+    canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+
+    canvas_width, canvas_height = canvas.get_width_height()
+    return QImage(
+        bytes(canvas.buffer_rgba()), 
+        canvas_width, 
+        canvas_height, 
+        QImage.Format_RGBA8888
+    ).copy()
+
+
+def svg_bytes_from_mpl_figure(fig: mpl.figure.Figure) -> bytes:
+    """ Convert a matplotlib figure to SVG.
+    """
+
     data = io.BytesIO()
     fig.savefig(data, format="svg")
-    plt.close(fig)
 
-    return QByteArray(data.getvalue())
+    return data.getvalue()
 
 
 def test_response_plot_data(
@@ -284,7 +1119,7 @@ def test_response_plot_data(
     test_pulse_plot_start: float = 0.0,
     test_pulse_plot_end: float = 0.1, 
     num_baseline_samples: int = 100
-) -> Tuple[np.ndarray, np.ndarray]:
+) -> Tuple[TimeAxis, np.ndarray]:
     """ Generate time and voltage arrays for the test pulse plots.
 
     Parameters
@@ -307,17 +1142,53 @@ def test_response_plot_data(
         baseline-subtracted voltages (mV)
     """
 
-    start_index, end_index = (
-        np.searchsorted(sweep.t, [test_pulse_plot_start, test_pulse_plot_end])
-        .astype(int)
-    )
+    time = TimeAxis.of_sweep(sweep)
+    start_index = time.searchsorted(test_pulse_plot_start)
+    end_index = time.searchsorted(test_pulse_plot_end)
 
     return (
-        sweep.t[start_index: end_index], 
+        time[start_index: end_index], 
         sweep.v[start_index: end_index] - np.mean(sweep.v[0: num_baseline_samples])
     )
 
 
+def batch_test_response_plot_data(
+    sweeps: Sequence[Sweep], 
+    test_pulse_plot_start: float = 0.0,
+    test_pulse_plot_end: float = 0.1, 
+    num_baseline_samples: int = 100
+) -> List[Tuple[TimeAxis, np.ndarray]]:
+    """ As test_response_plot_data, for many sweeps at once. Windows and 
+    baselines are computed for all sweeps together, as are the 
+    baseline-subtracted voltages (which are views into a single array).
+    """
+
+    if not sweeps:
+        return []
+
+    axes = [TimeAxis.of_sweep(sweep) for sweep in sweeps]
+    voltages = [sweep.v for sweep in sweeps]
+
+    starts = axes_searchsorted(axes, test_pulse_plot_start)
+    ends = np.maximum(axes_searchsorted(axes, test_pulse_plot_end), starts)
+    lengths = ends - starts
+
+    baselines = segment_means(
+        [voltage[:num_baseline_samples] for voltage in voltages]
+    )
+
+    responses = np.concatenate([
+        voltage[start: end] for voltage, start, end in zip(voltages, starts, ends)
+    ]).astype(float, copy=False)
+    responses -= np.repeat(baselines, lengths)
+
+    return [
+        (axis[start: end], response) for axis, start, end, response in zip(
+            axes, starts, ends, np.split(responses, np.cumsum(lengths)[:-1])
+        )
+    ]
+
+
 def make_test_pulse_plot(
     sweep_number: int, 
     time: np.ndarray, 
@@ -347,7 +1218,8 @@ def make_test_pulse_plot(
 
     """
     
-    fig, ax = plt.subplots(figsize=DEFAULT_FIGSIZE)
+    fig = Figure(figsize=DEFAULT_FIGSIZE)
+    ax = fig.subplots()
 
     if initial is not None:
         ax.plot(time[::step], initial[::step], linewidth=1, label=f"initial", 
@@ -366,8 +1238,8 @@ def make_test_pulse_plot(
     if labels:
         ax.legend()
     else:
-        ax.xaxis.set_major_locator(plt.NullLocator())
-        ax.yaxis.set_major_locator(plt.NullLocator())
+        ax.xaxis.set_major_locator(NullLocator())
+        ax.yaxis.set_major_locator(NullLocator())
 
     return fig
 
@@ -377,7 +1249,7 @@ def experiment_plot_data(
     backup_start_index: int = 5000, 
     baseline_start_index: int = 5000, 
     baseline_end_index: int = 9000
-) -> Tuple[np.ndarray, np.ndarray, float]:
+) -> Tuple[TimeAxis, np.ndarray, float]:
     """ Extract the data required for plotting a single sweep's experiment 
     epoch.
 
@@ -392,9 +1264,11 @@ def experiment_plot_data(
     Returns
     -------
     time : timestamps (s) of voltage samples for this sweep
-    voltage : in (mV). The voltage trace for this sweep's experiment epoch.
+    voltage : in (mV). The voltage trace for this sweep's experiment epoch. 
+        This is a read-only view of the sweep's data (which are never 
+        modified), so may contain NaNs. These are left as gaps when drawn.
     baseline_mean : the average voltage (mV) during the baseline epoch for this 
-        sweep
+        sweep, ignoring NaNs
 
     """
 
@@ -405,15 +1279,127 @@ def experiment_plot_data(
     if experiment_start_index <= 0:
         experiment_start_index = backup_start_index
     
-    time = sweep.t[experiment_start_index:experiment_end_index]
-    voltage = sweep.v[experiment_start_index:experiment_end_index]
-
-    voltage[np.isnan(voltage)] = 0.0
+    time = TimeAxis.of_sweep(sweep)[experiment_start_index:experiment_end_index]
+    voltage = sweep.v[experiment_start_index:experiment_end_index].view()
+    voltage.flags.writeable = False
 
     baseline_mean = np.nanmean(voltage[baseline_start_index: baseline_end_index])
     return time, voltage, baseline_mean
 
 
+def experiment_epochs(
+    sweeps: Sequence[Sweep], 
+    backup_start_index: int = 5000
+) -> np.ndarray:
+    """ Find the experiment epochs of many sweeps at once, as 
+    experiment_plot_data (via ipfx's get_experiment_epoch) does for one. 
+    Each sweep's stimulus changes are located by comparing neighboring 
+    samples, which is much cheaper than taking (and scanning) np.diff. The 
+    changes are few, so epochs are then computed for all sweeps together.
+
+    Returns
+    -------
+    A (start index, end index) row for each sweep
+
+    """
+
+    rates = np.array([sweep.sampling_rate for sweep in sweeps], dtype=float)
+    lengths = np.empty(len(sweeps), dtype=int)
+    sweep_changes = []
+
+    for index, sweep in enumerate(sweeps):
+        current = np.asarray(sweep.i)
+        lengths[index] = len(current)
+        sweep_changes.append(np.flatnonzero(current[1:] != current[:-1]))
+
+    counts = np.array([len(changes) for changes in sweep_changes], dtype=int)
+    firsts = np.cumsum(counts) - counts
+    changes = np.concatenate(sweep_changes) if sweeps else np.empty(0, dtype=int)
+
+    # the first two changes are the test pulse. Two more bound the stimulus.
+    found = counts >= 4
+
+    epochs = np.empty((len(sweeps), 2), dtype=int)
+    epochs[:, 0] = backup_start_index
+    epochs[:, 1] = lengths
+
+    epochs[found, 0] = changes[firsts[found] + 2] + 1 \
+        - (PRESTIM_STABILITY_EPOCH * rates[found]).astype(int)
+    epochs[found, 1] = changes[firsts[found] + counts[found] - 1] \
+        + (POSTSTIM_STABILITY_EPOCH * rates[found]).astype(int)
+
+    epochs[epochs[:, 0] <= 0, 0] = backup_start_index
+    return epochs
+
+
+def batch_experiment_plot_data(
+    sweeps: Sequence[Sweep], 
+    backup_start_index: int = 5000, 
+    baseline_start_index: int = 5000, 
+    baseline_end_index: int = 9000
+) -> List[Tuple[TimeAxis, np.ndarray, float]]:
+    """ As experiment_plot_data, for many sweeps at once. Epochs (see 
+    experiment_epochs) and baselines are computed for all sweeps together.
+    """
+
+    if not sweeps:
+        return []
+
+    epochs = experiment_epochs(sweeps, backup_start_index)
+
+    voltages = []
+    for sweep, (start, end) in zip(sweeps, epochs):
+        voltage = sweep.v[start: end].view()
+        voltage.flags.writeable = False
+        voltages.append(voltage)
+
+    baselines = segment_means(
+        [voltage[baseline_start_index: baseline_end_index] for voltage in voltages],
+        skip_nan=True
+    )
+
+    return [
+        (TimeAxis.of_sweep(sweep)[start: end], voltage, baseline)
+        for sweep, (start, end), voltage, baseline 
+        in zip(sweeps, epochs, voltages, baselines)
+    ]
+
+
+def segment_means(
+    segments: Sequence[np.ndarray], 
+    skip_nan: bool = False
+) -> np.ndarray:
+    """ The mean of each of some (1D) arrays, computed in a single reduction 
+    over their concatenation. Empty segments (and, if skip_nan, segments 
+    which are all NaN) have NaN means.
+    """
+
+    lengths = np.array([len(segment) for segment in segments], dtype=int)
+    values = np.concatenate(segments) if len(segments) else np.empty(0)
+
+    counts = lengths
+    if skip_nan:
+        valid = ~np.isnan(values)
+        values = np.where(valid, values, 0.0)
+        counts = segment_sums(valid, lengths)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return segment_sums(values, lengths) / counts
+
+
+def segment_sums(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """ Sum each of a sequence of contiguous segments (of the given lengths) 
+    of an array.
+    """
+
+    sums = np.zeros(len(lengths))
+    nonempty = lengths > 0
+    if nonempty.any():
+        offsets = np.cumsum(lengths) - lengths
+        sums[nonempty] = np.add.reduceat(values, offsets[nonempty], dtype=float)
+    return sums
+
+
 def make_experiment_plot(
     sweep_number: int, 
     exp_time:  np.ndarray, 
@@ -443,7 +1429,8 @@ def make_experiment_plot(
 
     time_lim = [exp_time[0], exp_time[-1]]
 
-    fig, ax = plt.subplots(figsize=DEFAULT_FIGSIZE)
+    fig = Figure(figsize=DEFAULT_FIGSIZE)
+    ax = fig.subplots()
 
     ax.plot(exp_time[::step], exp_voltage[::step], linewidth=1, 
         color=EXP_PULSE_CURRENT_COLOR,
@@ -459,8 +1446,8 @@ def make_experiment_plot(
     if labels:
         ax.legend()
     else:
-        ax.xaxis.set_major_locator(plt.NullLocator())
-        ax.yaxis.set_major_locator(plt.NullLocator())
+        ax.xaxis.set_major_locator(NullLocator())
+        ax.yaxis.set_major_locator(NullLocator())
 
     return fig
 
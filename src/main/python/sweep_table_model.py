@@ -1,7 +1,8 @@
-from typing import Dict, List, Any, Sequence
+from typing import Dict, List, Any, Sequence, Optional, Tuple, Set, Iterable
+from concurrent.futures import Executor
 
 from PyQt5.QtCore import (
-    QAbstractTableModel, QModelIndex, pyqtSignal
+    QAbstractTableModel, QModelIndex, QTimer, pyqtSignal
 )
 from PyQt5.QtGui import QColor
 from PyQt5 import QtCore
@@ -9,7 +10,14 @@ from PyQt5 import QtCore
 from ipfx.ephys_data_set import EphysDataSet
 
 from pre_fx_data import PreFxData
-from sweep_plotter import SweepPlotter, SweepPlotConfig
+from sweep_plotter import (
+    SweepPlotter, SweepPlotConfig, FixedPlots, make_thumbnail_executor
+)
+from thumbnail_cache import ThumbnailCache
+from trace_store import TraceStore
+from review_bundle import ReviewBundle
+from workers import Task, TaskSignals, SpawnProcessPool
+from error_handling import exception_message
 
 
 class SweepTableModel(QAbstractTableModel):
@@ -21,7 +29,10 @@ class SweepTableModel(QAbstractTableModel):
     def __init__(
         self, 
         colnames: Sequence[str],
-        plot_config: SweepPlotConfig
+        plot_config: SweepPlotConfig,
+        thumbnail_cache: Optional[ThumbnailCache] = None,
+        spill_traces: bool = True,
+        trace_store_dir: Optional[str] = None
     ):
         super().__init__()
         self.colnames = colnames
@@ -29,6 +40,27 @@ class SweepTableModel(QAbstractTableModel):
         self._data: List[List[Any]] = []
 
         self.plot_config = plot_config
+        self.thumbnail_cache = thumbnail_cache
+
+        # if set, each data set's popup traces are moved to a trace store (a 
+        # temporary file in trace_store_dir) rather than held in memory
+        self.spill_traces = spill_traces
+        self.trace_store_dir = trace_store_dir
+        self._trace_store: Optional[TraceStore] = None
+
+        # stores replaced while a task might still write to them, each closed 
+        # once that task has finished
+        self._retired_stores: List[Tuple[TaskSignals, TraceStore]] = []
+
+        self._plotter: Optional[SweepPlotter] = None
+        self._sweep_numbers: List[int] = []
+        self._executor: Optional[Executor] = None
+
+        self._task: Optional[Task] = None
+        self._pending_rows: Set[int] = set()
+        self._in_flight_rows: Set[int] = set()
+        self._failed_rows: Set[int] = set()
+        self._batch_scheduled: bool = False
     
     def connect(self, data: PreFxData):
         """ Set up signals and slots for communication with the underlying data store.
@@ -43,6 +75,7 @@ class SweepTableModel(QAbstractTableModel):
         """
 
         data.end_commit_calculated.connect(self.on_new_data)
+        data.auto_qc_recalculated.connect(self.on_auto_qc_recalculated)
         self.qc_state_updated.connect(data.on_manual_qc_state_updated)
 
 
@@ -51,7 +84,9 @@ class SweepTableModel(QAbstractTableModel):
         sweep_features: List[Dict], 
         sweep_states: List, 
         manual_qc_states: Dict[int, str], 
-        dataset: EphysDataSet
+        dataset: EphysDataSet,
+        nwb_path: Optional[str] = None,
+        review_bundle: Optional[ReviewBundle] = None
     ):
         """ Called when the underlying data has been completely replaced
 
@@ -66,37 +101,257 @@ class SweepTableModel(QAbstractTableModel):
             For each sweep, whether the user has manually passed or failed it (or left it untouched).
         dataset : 
             The underlying data. Used to extract sweepwise voltage traces
+        nwb_path : 
+            The file from which dataset was loaded. Used to look up previously 
+            generated plots in the thumbnail cache (if there is one).
+        review_bundle :
+            If provided, and its plots were generated using this model's plot 
+            config, plots are read from here rather than rendered.
 
         """
 
+        previous_task = self._task
+        self.cancel_task()
+
         self.beginRemoveRows(QModelIndex(), 1, self.rowCount())
         self._data = []
         self.endRemoveRows()
 
         state_lookup = {state["sweep_number"]: state for state in sweep_states}
-        plotter = SweepPlotter(dataset, self.plot_config)
+        sweep_features = sorted(sweep_features, key=lambda swp: swp["sweep_number"])
 
         self.beginInsertRows(QModelIndex(), 1, len(sweep_features))
-        for sweep in sorted(sweep_features, key=lambda swp: swp["sweep_number"]):
+        for sweep in sweep_features:
 
             sweep_number = sweep["sweep_number"]
             state = state_lookup[sweep_number]
 
-            test_pulse_plots, experiment_plots = plotter.advance(sweep_number)
-
             self._data.append([
                 sweep_number,
                 sweep["stimulus_code"],
                 sweep["stimulus_name"],
-                "passed" if state["passed"] and sweep["passed"] else "failed", # auto qc
+                auto_qc_state(sweep, state),
                 manual_qc_states[sweep_number],
                 format_fail_tags(sweep["tags"] + state["reasons"]), # fail tags
-                test_pulse_plots,
-                experiment_plots
+                None, # test pulse plots, filled in once rendered
+                None # experiment plots
             ])
 
         self.endInsertRows()
 
+        self._sweep_numbers = [sweep["sweep_number"] for sweep in sweep_features]
+
+        cache_key = None
+        if self.thumbnail_cache is not None and nwb_path:
+            cache_key = self.thumbnail_cache.key(
+                nwb_path, self.plot_config, self._sweep_numbers
+            )
+
+        if review_bundle is not None \
+                and not review_bundle.plots_match(self.plot_config, self._sweep_numbers):
+            review_bundle = None
+
+        # traces from the previous data set remain readable (e.g. by open 
+        # popups) until they are released
+        self.retire_trace_store(previous_task)
+        if self.spill_traces:
+            self._trace_store = TraceStore(self.trace_store_dir)
+
+        self._plotter = SweepPlotter(
+            dataset, self.plot_config, self.thumbnail_cache, cache_key,
+            review_bundle, self._trace_store
+        )
+
+    def retire_trace_store(self, task: Optional[Task]):
+        """ Close the current trace store, once task (which may be writing to 
+        it) has finished.
+        """
+
+        if self._trace_store is None:
+            return
+
+        if task is None:
+            self._trace_store.close()
+        else:
+            self._retired_stores.append((task.signals, self._trace_store))
+        self._trace_store = None
+
+    def shutdown(self):
+        """ Stop plotting, and release the worker processes used to render 
+        thumbnails. Call this once the model is no longer needed (e.g. when 
+        the application quits).
+        """
+
+        task = self._task
+        self.cancel_task()
+        self.retire_trace_store(task)
+
+        if self._executor is not None:
+            if isinstance(self._executor, SpawnProcessPool):
+                self._executor.terminate()
+            else:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def on_auto_qc_recalculated(
+        self, 
+        sweep_features: List[Dict], 
+        sweep_states: List[Dict]
+    ):
+        """ Called when auto qc has been rerun (e.g. with new criteria) on 
+        the current data. Only the auto qc state and fail tags columns are 
+        updated; manual qc states and plots are kept.
+
+        Parameters
+        ----------
+        sweep_features : 
+            A list of dictionaries. Each element describes a sweep.
+        sweep_states : 
+            A list of dictionaries. Each element contains ancillary information about
+            automatic QC results for that sweep.
+
+        """
+
+        if not self._data:
+            return
+
+        state_lookup = {state["sweep_number"]: state for state in sweep_states}
+        feature_lookup = {sweep["sweep_number"]: sweep for sweep in sweep_features}
+
+        number_column = self.column_map["sweep number"]
+        auto_column = self.column_map["auto QC state"]
+        tags_column = self.column_map["fail tags"]
+
+        for row in self._data:
+            sweep = feature_lookup[row[number_column]]
+            state = state_lookup[row[number_column]]
+
+            row[auto_column] = auto_qc_state(sweep, state)
+            row[tags_column] = format_fail_tags(sweep["tags"] + state["reasons"])
+
+        self.dataChanged.emit(
+            self.index(0, min(auto_column, tags_column)),
+            self.index(self.rowCount() - 1, max(auto_column, tags_column))
+        )
+
+    def request_plots(self, rows: Iterable[int]):
+        """ Ask for the plots of some rows to be generated (on a worker 
+        thread) if they have not been already. Requests are coalesced, so 
+        this is cheap to call often (e.g. on every paint).
+
+        Parameters
+        ----------
+        rows : 
+            Generate plots for these rows
+
+        """
+
+        if self._plotter is None:
+            return
+
+        plot_column = self.column_map["test epoch"]
+        for row in rows:
+            if 0 <= row < self.rowCount() \
+                    and self._data[row][plot_column] is None \
+                    and row not in self._in_flight_rows \
+                    and row not in self._failed_rows:
+                self._pending_rows.add(row)
+
+        if self._pending_rows and self._task is None and not self._batch_scheduled:
+            self._batch_scheduled = True
+            QTimer.singleShot(0, self.start_plotting)
+
+    def start_plotting(self):
+        """ Generate plots for all requested rows on a worker thread. Rows are 
+        updated once the whole batch is available.
+        """
+
+        self._batch_scheduled = False
+        if self._task is not None or not self._pending_rows:
+            return
+
+        if self._executor is None:
+            self._executor = make_thumbnail_executor(
+                self.plot_config.thumbnail_workers
+            )
+
+        self._in_flight_rows = self._pending_rows
+        self._pending_rows = set()
+
+        task = Task(
+            self._plotter.plot_sweeps, 
+            self._sweep_numbers, 
+            sorted(self._in_flight_rows),
+            executor=self._executor
+        )
+        task.signals.succeeded.connect(self.on_plots_ready)
+        task.signals.failed.connect(self.on_plotting_failed)
+        task.signals.finished.connect(self.on_task_finished)
+
+        self._task = task
+        task.start()
+
+    def cancel_task(self):
+        """ Request that plotting (if in progress) stop, and forget any 
+        outstanding requests. Rows without plots will remain without them.
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        self._pending_rows = set()
+        self._in_flight_rows = set()
+        self._failed_rows = set()
+
+    def _is_current_task(self) -> bool:
+        """ Whether the sender of the signal currently being handled is the 
+        most recently started task.
+        """
+        return self._task is not None and self.sender() is self._task.signals
+
+    def on_plots_ready(self, plots: Dict[int, Tuple[FixedPlots, FixedPlots]]):
+        """ Store newly generated plots.
+
+        Parameters
+        ----------
+        plots : 
+            maps row indices to (test pulse, experiment) plots for that row
+
+        """
+
+        if not self._is_current_task():
+            return
+
+        test_column = self.column_map["test epoch"]
+        experiment_column = self.column_map["experiment epoch"]
+
+        for row, (test_pulse_plots, experiment_plots) in plots.items():
+            self._data[row][test_column] = test_pulse_plots
+            self._data[row][experiment_column] = experiment_plots
+
+            self.dataChanged.emit(
+                self.index(row, test_column), 
+                self.index(row, experiment_column)
+            )
+
+    def on_plotting_failed(self, err: Exception):
+        if self._is_current_task():
+            self._failed_rows |= self._in_flight_rows
+            exception_message("Plotting failed", "failed to plot sweeps", err)
+
+    def on_task_finished(self):
+        sender = self.sender()
+        for signals, store in list(self._retired_stores):
+            if signals is sender:
+                store.close()
+                self._retired_stores.remove((signals, store))
+
+        if self._is_current_task():
+            self._task = None
+            self._in_flight_rows = set()
+            self.request_plots(())
+
     def rowCount(self, *args, **kwargs):
         """ The number of sweeps
         """
@@ -192,6 +447,10 @@ class SweepTableModel(QAbstractTableModel):
 
         return False
 
+def auto_qc_state(sweep_features: Dict, sweep_state: Dict) -> str:
+    return "passed" if sweep_state["passed"] and sweep_features["passed"] else "failed"
+
+
 def format_fail_tags(tags: List[str]) -> str:
     return "\n\n".join(tags)
 
@@ -9,6 +9,10 @@ from sweep_table_model import SweepTableModel
 
 class SweepTableView(QTableView):
 
+    # how many rows beyond the viewport (in each direction) to generate plots 
+    # for ahead of time
+    PREFETCH_ROWS = 5
+
     @property
     def colnames(self):
         return self._colnames
@@ -28,6 +32,7 @@ class SweepTableView(QTableView):
         self.colnames = colnames
 
         self.svg_delegate = SvgDelegate()
+        self.svg_delegate.plots_requested.connect(self.on_plots_requested)
         manual_qc_choices = ["default", "failed", "passed"]
         self.cb_delegate = ComboBoxDelegate(self, manual_qc_choices)
 
@@ -52,9 +57,32 @@ class SweepTableView(QTableView):
         this view to display.
         """
         super(SweepTableView, self).setModel(model)
-        model.rowsInserted.connect(self.persist_qc_editor)
+        model.rowsRemoved.connect(self.svg_delegate.clear_cache)
         model.rowsInserted.connect(self.resize_to_content)
 
+    def on_plots_requested(self, row: int):
+        """ Called when a cell is painted whose plots have not been generated. 
+        Requests plots for that row as well as for the rows in (and just 
+        beyond) the viewport.
+
+        Parameters
+        ----------
+        row : 
+            the row whose plots were found to be missing
+
+        """
+
+        first = self.rowAt(0)
+        last = self.rowAt(self.viewport().height() - 1)
+
+        first = row if first < 0 else min(first, row)
+        last = self.model().rowCount() - 1 if last < 0 else max(last, row)
+
+        self.model().request_plots(range(
+            max(0, first - self.PREFETCH_ROWS), 
+            last + 1 + self.PREFETCH_ROWS
+        ))
+
     def resize_to_content(self, *args, **kwargs):
         """ This function just exists so that we can connect signals with 
         extraneous data to resizeRowsToContents
@@ -70,20 +98,6 @@ class SweepTableView(QTableView):
         super(SweepTableView, self).resizeEvent(*args, **kwargs)
         self.resize_to_content()
 
-    def persist_qc_editor(self, *args, **kwargs):
-        """ Ensure that the QC state editor can be opened with a single click.
-
-        Parameters
-        ----------
-        all are ignored. They are present because this method is triggered by a data-carrying signal.
-
-        """
-
-        column = self.colnames.index("manual QC state")
-
-        for row in range(self.model().rowCount()):
-            self.openPersistentEditor(self.model().index(row, column))
-
     def on_clicked(self, index: QModelIndex):
         """ When plot thumbnails are clicked, open a larger plot in a popup.
 
@@ -100,9 +114,13 @@ class SweepTableView(QTableView):
         if not index.column() in {test_column, exp_column}:
             return
 
+        plots = self.model().data(index)
+        if plots is None:  # not yet rendered
+            return
+
         index_rect = self.visualRect(index)
         self.popup_plot(
-            self.model().data(index).full(),
+            plots.full(),
             index_rect.left(),
             index_rect.top()
         )
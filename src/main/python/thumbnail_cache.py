@@ -0,0 +1,280 @@
+""" A persistent, size-bounded, on-disk cache of sweep plots, so that
+reopening a previously reviewed NWB file does not require regenerating them.
+"""
+import os
+import hashlib
+import logging
+from typing import Optional, Tuple, Dict, Sequence, Type
+
+import numpy as np
+
+from PyQt5.QtCore import QByteArray
+
+from pipeline_cache import file_identity
+from time_axis import TimeAxis
+from sweep_plotter import (
+    SweepPlotConfig, FixedPlots, RasterThumbnail, PopupPlotter,
+    PulsePopupPlotter, ExperimentPopupPlotter
+)
+
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".sweep_qc_tool", "thumbnail_cache"
+)
+DEFAULT_MAX_BYTES = 1024 ** 3
+
+# these do not affect the generated plots
+IGNORED_CONFIG_FIELDS = ("thumbnail_workers",)
+
+# names of the data held by each kind of popup plotter
+PLOTTER_FIELDS: Dict[Type, Tuple[str, ...]] = {
+    PulsePopupPlotter: ("time", "voltage", "previous", "initial", "sweep_number"),
+    ExperimentPopupPlotter: ("time", "voltage", "baseline", "sweep_number")
+}
+
+TIME_AXIS_SUFFIX = "_axis"
+
+# changes whenever the layout of stored entries does, so that older entries
+# are not read
+CACHE_FORMAT_VERSION = 2
+
+
+class ThumbnailCache:
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        """ Stores the thumbnails and popup plot data of individual sweeps as
+        npz files. When the total size of the cache exceeds max_bytes, the
+        least recently used entries are removed.
+
+        Parameters
+        ----------
+        directory : cache entries are stored under here
+        max_bytes : approximate limit on the size of the cache
+
+        """
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    def key(
+        self,
+        nwb_path: str,
+        config: SweepPlotConfig,
+        sweep_numbers: Sequence[int]
+    ) -> str:
+        """ Identify a set of plots. Plots with the same key are expected to
+        be identical.
+
+        Parameters
+        ----------
+        nwb_path : plots were generated from this file. Its path, size and
+            modification time are used to identify it.
+        config : plots were generated using these parameters
+        sweep_numbers : the ordered sequence of plotted sweeps. This
+            determines the previous and initial test pulses of each plot.
+
+        """
+
+        identity = repr((
+            CACHE_FORMAT_VERSION, file_identity(nwb_path), 
+            sorted(plot_config_fields(config).items()), list(sweep_numbers)
+        ))
+        return hashlib.sha1(identity.encode()).hexdigest()
+
+    def path(self, key: str, sweep_number: int) -> str:
+        return os.path.join(self.directory, key, f"{sweep_number}.npz")
+
+    def load(
+        self,
+        key: str,
+        sweep_number: int
+    ) -> Optional[Tuple[FixedPlots, FixedPlots]]:
+        """ Obtain a sweep's (test pulse, experiment) plots, or None if they
+        are not cached.
+        """
+
+        path = self.path(key, sweep_number)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = dict(data.items())
+            os.utime(path)  # mark as recently used
+
+        except Exception as err:
+            logging.warning(f"unable to read cached plots from {path}: {err}")
+            return None
+
+        return (
+            plots_from_arrays(arrays, "test_pulse_", PulsePopupPlotter),
+            plots_from_arrays(arrays, "experiment_", ExperimentPopupPlotter)
+        )
+
+    def store(
+        self,
+        key: str,
+        sweep_number: int,
+        plots: Tuple[FixedPlots, FixedPlots]
+    ):
+        """ Cache a sweep's (test pulse, experiment) plots, evicting old
+        entries if the cache is full.
+        """
+
+        path = self.path(key, sweep_number)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        arrays: Dict[str, np.ndarray] = {}
+        arrays.update(plots_to_arrays(plots[0], "test_pulse_"))
+        arrays.update(plots_to_arrays(plots[1], "experiment_"))
+
+        try:
+            # np.savez would append .npz to a temporary name
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as temp_file:
+                np.savez(temp_file, **arrays)
+            os.replace(temp_path, path)
+
+        except Exception as err:
+            logging.warning(f"unable to cache plots at {path}: {err}")
+            return
+
+        self._total_bytes += os.path.getsize(path)
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """ Remove least recently used entries until the cache is under 90% of
+        its maximum size.
+        """
+
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._total_bytes = sum(size for _, size, _ in entries)
+
+        for path, size, _ in entries:
+            if self._total_bytes <= 0.9 * self.max_bytes:
+                break
+
+            try:
+                os.remove(path)
+                self._total_bytes -= size
+            except OSError:
+                continue
+
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass  # directory still contains other entries
+
+    def _entries(self):
+        """ Yield (path, size, last use time) for each cache entry
+        """
+
+        for key_dir in os.scandir(self.directory):
+            if not key_dir.is_dir():
+                continue
+
+            for entry in os.scandir(key_dir.path):
+                if entry.name.endswith(".npz"):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+
+def plot_config_fields(config: SweepPlotConfig) -> Dict:
+    """ The fields of a plot configuration which affect the generated plots
+    """
+
+    return {
+        name: value for name, value in config._asdict().items()
+        if name not in IGNORED_CONFIG_FIELDS
+    }
+
+
+def plotter_to_arrays(plotter: PopupPlotter, prefix: str) -> Dict[str, np.ndarray]:
+    """ Represent a popup plotter's data as named arrays. Fields which are
+    None are omitted. Time axes are stored as (start, sampling rate, number of
+    samples, offset), under the field's name suffixed with TIME_AXIS_SUFFIX.
+    """
+
+    arrays = {}
+    for field in PLOTTER_FIELDS[type(plotter)]:
+        value = getattr(plotter, field)
+        if isinstance(value, TimeAxis):
+            arrays[prefix + field + TIME_AXIS_SUFFIX] = np.array(
+                [value.start, value.sampling_rate, value.num_samples, value.offset]
+            )
+        elif value is not None:
+            arrays[prefix + field] = np.asarray(value)
+    return arrays
+
+
+def plotter_from_arrays(
+    arrays: Dict[str, np.ndarray],
+    prefix: str,
+    cls: Type
+) -> PopupPlotter:
+    """ Inverse of plotter_to_arrays
+    """
+
+    values = {}
+    for field in PLOTTER_FIELDS[cls]:
+        value = arrays.get(prefix + field)
+        if value is not None and value.ndim == 0:
+            value = value.item()
+
+        time_axis = arrays.get(prefix + field + TIME_AXIS_SUFFIX)
+        if time_axis is not None:
+            start, sampling_rate, num_samples, offset = time_axis
+            value = TimeAxis(start, sampling_rate, num_samples, offset)
+
+        values[field] = value
+
+    return cls(**values)
+
+
+def plots_to_arrays(plots: FixedPlots, prefix: str) -> Dict[str, np.ndarray]:
+    """ Represent a thumbnail-full plot pair as named arrays.
+    """
+
+    arrays = plotter_to_arrays(plots.full, prefix + "full_")
+
+    if isinstance(plots.thumbnail, RasterThumbnail):
+        arrays.update(
+            plotter_to_arrays(plots.thumbnail.plotter, prefix + "raster_")
+        )
+        arrays[prefix + "renderer"] = np.array(plots.thumbnail.renderer)
+    else:
+        arrays[prefix + "svg"] = np.frombuffer(
+            bytes(plots.thumbnail), dtype=np.uint8
+        )
+
+    return arrays
+
+
+def plots_from_arrays(
+    arrays: Dict[str, np.ndarray],
+    prefix: str,
+    cls: Type
+) -> FixedPlots:
+    """ Inverse of plots_to_arrays
+    """
+
+    if prefix + "svg" in arrays:
+        thumbnail = QByteArray(arrays[prefix + "svg"].tobytes())
+    else:
+        thumbnail = RasterThumbnail(
+            plotter_from_arrays(arrays, prefix + "raster_", cls),
+            str(arrays[prefix + "renderer"])
+        )
+
+    return FixedPlots(
+        thumbnail=thumbnail,
+        full=plotter_from_arrays(arrays, prefix + "full_", cls)
+    )
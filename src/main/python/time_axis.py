@@ -0,0 +1,201 @@
+""" Lazily generated time axes for regularly sampled traces. Sample times are
+affine in sample index, so there is no need to hold them in memory alongside
+the samples themselves.
+"""
+from typing import Optional, Union, Sequence
+
+import numpy as np
+
+
+class TimeAxis:
+
+    __slots__ = ["start", "sampling_rate", "num_samples", "offset"]
+
+    def __init__(
+        self, 
+        start: float, 
+        sampling_rate: float, 
+        num_samples: int, 
+        offset: int = 0
+    ):
+        """ Describes the timestamps of a regularly sampled trace. Supports
+        enough of the array interface (len, indexing, slicing, conversion via
+        np.asarray) to stand in for a materialized time array. Slices are
+        themselves time axes; other indexing produces arrays.
+
+        Sample i is at start + (offset + i) / sampling_rate, which is how ipfx 
+        calculates (and slices) sweep times, so the two agree exactly.
+
+        Parameters
+        ----------
+        start : time (s) of the first sample, when offset is 0
+        sampling_rate : in Hz
+        num_samples : length of the trace
+        offset : number of sample intervals between start and the first 
+            sample
+
+        """
+
+        self.start = float(start)
+        self.sampling_rate = float(sampling_rate)
+        self.num_samples = int(num_samples)
+        self.offset = int(offset)
+
+    @classmethod
+    def of_sweep(cls, sweep) -> "TimeAxis":
+        """ The time axis of an ipfx sweep. Its timestamps are assumed to be 
+        those generated by ipfx from the sweep's sampling rate, so only the 
+        first is read (and the second, if the sampling rate is missing).
+        """
+
+        time = sweep.t
+        sampling_rate = sweep.sampling_rate
+        if len(time) == 0:
+            return cls(0.0, sampling_rate, 0)
+        if not sampling_rate > 0 and len(time) > 1:
+            # unknown, so estimated
+            sampling_rate = 1.0 / (time[1] - time[0])
+        if not sampling_rate > 0:
+            return cls(time[0], sampling_rate, len(time))
+
+        # ipfx's times are sample indices divided by the sampling rate, 
+        # unless the sweep has been realigned
+        offset = int(round(time[0] * sampling_rate))
+        if offset / sampling_rate == time[0]:
+            return cls(0.0, sampling_rate, len(time), offset)
+        return cls(time[0], sampling_rate, len(time))
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(float)
+
+    def __len__(self) -> int:
+        return self.num_samples
+
+    def __repr__(self) -> str:
+        return (
+            f"TimeAxis(start={self.start}, sampling_rate={self.sampling_rate}, "
+            f"num_samples={self.num_samples}, offset={self.offset})"
+        )
+
+    def times(self, first: int = 0, last: Optional[int] = None) -> np.ndarray:
+        """ Materialize the timestamps of samples first (inclusive) through
+        last (exclusive, defaulting to the end of the trace).
+        """
+
+        if last is None:
+            last = self.num_samples
+        return self.start + np.arange(
+            self.offset + first, self.offset + last
+        ) / self.sampling_rate
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        times = self.times()
+        return times if dtype is None else times.astype(dtype)
+
+    def __getitem__(self, key) -> Union[float, np.ndarray, "TimeAxis"]:
+
+        if isinstance(key, slice):
+            first, last, step = key.indices(self.num_samples)
+            if step < 0:
+                return self.times()[key]
+            if step == 1:
+                return TimeAxis(
+                    self.start, self.sampling_rate, 
+                    max(last - first, 0), self.offset + first
+                )
+
+            return TimeAxis(
+                self[first] if first < self.num_samples else self.start,
+                self.sampling_rate / step,
+                len(range(first, last, step))
+            )
+
+        if np.ndim(key) == 0:
+            index = int(key)
+            if index < 0:
+                index += self.num_samples
+            if not 0 <= index < self.num_samples:
+                raise IndexError(
+                    f"index {key} is out of bounds for a time axis of "
+                    f"{self.num_samples} samples"
+                )
+            return self.start + (self.offset + index) / self.sampling_rate
+
+        indices = np.asarray(key)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        indices = np.where(indices < 0, indices + self.num_samples, indices)
+        return self.start + (self.offset + indices) / self.sampling_rate
+
+    def searchsorted(self, value: float, side: str = "left") -> int:
+        """ As np.searchsorted over the materialized timestamps, but without
+        materializing them.
+        """
+
+        if self.num_samples == 0:
+            return 0
+
+        position = (value - self.start) * self.sampling_rate - self.offset
+        index = int(np.clip(np.ceil(position), 0, self.num_samples))
+
+        # correct for rounding in the estimate above
+        if side == "left":
+            while index > 0 and self[index - 1] >= value:
+                index -= 1
+            while index < self.num_samples and self[index] < value:
+                index += 1
+        else:
+            while index > 0 and self[index - 1] > value:
+                index -= 1
+            while index < self.num_samples and self[index] <= value:
+                index += 1
+
+        return index
+
+
+TimeLike = Union[np.ndarray, TimeAxis]
+
+
+def axes_searchsorted(
+    axes: Sequence[TimeAxis], 
+    value: float, 
+    side: str = "left"
+) -> np.ndarray:
+    """ TimeAxis.searchsorted, for one value over many time axes at once. 
+    Returns an integer array of indices, one per axis.
+    """
+
+    starts = np.array([axis.start for axis in axes], dtype=float)
+    rates = np.array([axis.sampling_rate for axis in axes], dtype=float)
+    lengths = np.array([axis.num_samples for axis in axes], dtype=int)
+    offsets = np.array([axis.offset for axis in axes], dtype=int)
+
+    index = np.clip(
+        np.ceil((value - starts) * rates - offsets), 0, lengths
+    ).astype(int)
+
+    # correct for rounding in the estimate above, which is off by at most one
+    before = starts + (offsets + index - 1) / rates
+    if side == "left":
+        index -= (index > 0) & (before >= value)
+    else:
+        index -= (index > 0) & (before > value)
+
+    at = starts + (offsets + index) / rates
+    if side == "left":
+        index += (index < lengths) & (at < value)
+    else:
+        index += (index < lengths) & (at <= value)
+
+    return index
+
+
+def searchsorted(time: TimeLike, value: float, side: str = "left") -> int:
+    """ np.searchsorted for a single value, which does not materialize time
+    axes.
+    """
+
+    if isinstance(time, TimeAxis):
+        return time.searchsorted(value, side)
+    return int(np.searchsorted(time, value, side=side))
@@ -0,0 +1,175 @@
+""" Multi-resolution (min/max) representations of long traces, used to keep
+interactive plots responsive regardless of how many samples they display.
+"""
+from typing import List, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from time_axis import TimeLike, searchsorted
+
+if TYPE_CHECKING:
+    from pyqtgraph import PlotItem, PlotDataItem
+
+
+# each level of a pyramid summarizes this many buckets of the level below
+PYRAMID_FACTOR = 4
+
+# always draw at least this many points, even if the plot is very narrow
+MIN_DRAWN_POINTS = 4000
+
+
+class TracePyramid:
+
+    __slots__ = ["time", "values", "factor", "levels"]
+
+    def __init__(
+        self,
+        time: TimeLike,
+        values: np.ndarray,
+        factor: int = PYRAMID_FACTOR,
+        min_buckets: int = MIN_DRAWN_POINTS // 2
+    ):
+        """ Precomputes min/max envelopes of a trace at successively coarser
+        resolutions, so that any time range can be drawn with a bounded
+        number of points without scanning the full trace.
+
+        Parameters
+        ----------
+        time : timestamps of samples. Must be sorted. May be a TimeAxis, in 
+            which case timestamps are only generated for queried ranges.
+        values : one per timestamp
+        factor : each level's buckets are this many times larger than the
+            last's
+        min_buckets : stop adding levels once one has fewer buckets than this
+
+        """
+
+        self.time = time
+        self.values = values
+        self.factor = factor
+
+        # the kth level (counting from 1) holds the (min, max) of each bucket
+        # of factor ** k samples
+        self.levels: List[Tuple[np.ndarray, np.ndarray]] = []
+
+        mins, maxs = values, values
+        while len(mins) > max(min_buckets, 1) * factor:
+            starts = np.arange(0, len(mins), factor)
+            mins = np.fmin.reduceat(mins, starts)
+            maxs = np.fmax.reduceat(maxs, starts)
+            self.levels.append((mins, maxs))
+
+    @classmethod
+    def from_levels(
+        cls,
+        time: TimeLike,
+        values: np.ndarray,
+        factor: int,
+        levels: List[Tuple[np.ndarray, np.ndarray]]
+    ) -> "TracePyramid":
+        """ Reassemble a pyramid from previously computed levels (e.g. ones 
+        which were saved to disk), without recomputing them.
+        """
+
+        pyramid = cls.__new__(cls)
+        pyramid.time = time
+        pyramid.values = values
+        pyramid.factor = factor
+        pyramid.levels = list(levels)
+        return pyramid
+
+    def bucket_size(self, level: int) -> int:
+        """ The number of samples summarized by each bucket at a level (level
+        0 being the raw trace).
+        """
+        return self.factor ** level
+
+    def query(
+        self,
+        start: float,
+        end: float,
+        max_points: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """ Get data for drawing the trace between two times.
+
+        Parameters
+        ----------
+        start, end : time range to be drawn. One sample (or bucket) beyond
+            each end is included, so that lines run to the edge of the plot.
+        max_points : return no more than (about) this many points
+
+        Returns
+        -------
+        time, values : the raw samples, if there are few enough in the range.
+            Otherwise, the min and max of each bucket (at the finest
+            sufficiently coarse level), interleaved, at the times of the
+            bucket's first and last samples.
+
+        """
+
+        num_samples = len(self.time)
+        first = max(searchsorted(self.time, start, side="left") - 1, 0)
+        last = min(searchsorted(self.time, end, side="right") + 1, num_samples)
+
+        if last - first <= max_points or not self.levels:
+            return np.asarray(self.time[first: last]), self.values[first: last]
+
+        level = 1
+        while level < len(self.levels) \
+                and 2 * (last - first) / self.bucket_size(level) > max_points:
+            level += 1
+
+        size = self.bucket_size(level)
+        mins, maxs = self.levels[level - 1]
+
+        first_bucket = first // size
+        last_bucket = min(-(-last // size), len(mins))
+
+        starts = np.arange(first_bucket, last_bucket) * size
+        ends = np.minimum(starts + size, num_samples) - 1
+
+        time = np.empty(2 * len(starts), dtype=self.time.dtype)
+        time[0::2] = self.time[starts]
+        time[1::2] = self.time[ends]
+
+        values = np.empty(2 * len(starts), dtype=mins.dtype)
+        values[0::2] = mins[first_bucket: last_bucket]
+        values[1::2] = maxs[first_bucket: last_bucket]
+
+        return time, values
+
+
+def plot_pyramid(
+    plot: "PlotItem",
+    pyramid: TracePyramid,
+    **kwargs
+) -> "PlotDataItem":
+    """ Add a trace to an interactive plot, drawing only as much detail as
+    the plot can show. The drawn data are requeried from the pyramid whenever
+    the plot's x range changes. Non-finite values (e.g. NaNs) are drawn as 
+    gaps.
+
+    Parameters
+    ----------
+    plot : the trace will be added to this plot
+    pyramid : holds the trace's data
+    **kwargs : passed to plot.plot (e.g. pen, name)
+
+    Returns
+    -------
+    the newly added data item
+
+    """
+
+    item = plot.plot(connect="finite", **kwargs)
+    view_box = plot.getViewBox()
+
+    def update(*args, **kwargs):
+        start, end = view_box.viewRange()[0]
+        max_points = max(MIN_DRAWN_POINTS, 2 * int(view_box.width()))
+        item.setData(*pyramid.query(start, end, max_points))
+
+    item.setData(*pyramid.query(-np.inf, np.inf, MIN_DRAWN_POINTS))
+    view_box.sigXRangeChanged.connect(update)
+
+    return item
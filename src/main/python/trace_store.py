@@ -0,0 +1,111 @@
+""" Disk-backed storage for the full-resolution traces behind popup plots, so
+that the memory held by the sweep table does not grow with the number of
+sweeps. Traces are written to an (unlinked) temporary file and read back
+through a memory map, whose pages the operating system can evict whenever
+they are not being drawn. The file is mapped once (and remapped as it grows, 
+geometrically), so that the number of open file descriptors does not grow 
+with the number of stored arrays.
+"""
+import mmap
+import tempfile
+import threading
+from typing import Optional
+
+import numpy as np
+
+
+# stored arrays start at multiples of this many bytes
+ALIGNMENT = 64
+
+# the smallest size (bytes) to which the backing file is grown
+MIN_CAPACITY = 1 << 20
+
+
+def is_mapped(array: np.ndarray) -> bool:
+    """ Whether an array (or the array it is a view of) is memory mapped.
+    """
+
+    base = array
+    while isinstance(base, np.ndarray):
+        base = base.base
+    return isinstance(base, mmap.mmap)
+
+
+class TraceStore:
+
+    def __init__(self, directory: Optional[str] = None):
+        """ Spills arrays to a temporary file, replacing them with read-only
+        memory mapped views. May be used from multiple threads.
+
+        Parameters
+        ----------
+        directory : the file is created here. Defaults to the system's
+            temporary directory.
+
+        """
+
+        self._file = tempfile.TemporaryFile(dir=directory, buffering=0)
+        self._size = 0
+        self._capacity = 0
+        self._map: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """ The number of bytes written so far
+        """
+        return self._size
+
+    def store(self, array: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """ Write an array to the store.
+
+        Parameters
+        ----------
+        array : to be stored. Arrays which are empty or already memory mapped
+            are returned as they are, as are values which are not arrays 
+            (e.g. None, or a TimeAxis).
+
+        Returns
+        -------
+        A read-only, memory mapped copy of the array
+
+        """
+
+        if not isinstance(array, np.ndarray) or array.size == 0 \
+                or is_mapped(array):
+            return array
+
+        array = np.ascontiguousarray(array)
+
+        with self._lock:
+            offset = -(-self._size // ALIGNMENT) * ALIGNMENT
+            end = offset + array.nbytes
+            if end > self._capacity:
+                self._grow(end)
+
+            stored = np.ndarray(
+                array.shape, dtype=array.dtype, buffer=self._map, offset=offset
+            )
+            stored[...] = array
+            self._size = end
+
+        stored = stored.view()
+        stored.flags.writeable = False
+        return stored
+
+    def _grow(self, required: int):
+        """ Extend the backing file to at least required bytes and map it 
+        again. Arrays stored earlier keep the previous map alive for as long 
+        as they are themselves alive.
+        """
+
+        self._capacity = max(required, 2 * self._capacity, MIN_CAPACITY)
+        self._file.truncate(self._capacity)
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+
+    def close(self):
+        """ Release the store's file. Arrays which have already been returned
+        remain readable; the file's space is reclaimed once they are gone.
+        """
+        self._map = None
+        self._file.close()
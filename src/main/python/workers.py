@@ -0,0 +1,249 @@
+""" Utilities for running long computations off of the GUI thread.
+"""
+import threading
+import multiprocessing as mp
+from concurrent.futures import Executor, Future
+from typing import Callable, Any, Tuple, Optional, Set
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+ProgressCallback = Callable[[str, int, int], None]
+
+
+class TaskCancelled(Exception):
+    """ Raised (from a progress callback) inside a task whose cancellation has
+    been requested.
+    """
+
+
+def no_progress(message: str, completed: int = 0, total: int = 0):
+    """ A progress callback which ignores its inputs. Use this when calling
+    task functions directly, rather than through a Task.
+    """
+
+
+class TaskSignals(QObject):
+
+    progress = pyqtSignal(str, int, int, name="progress")
+    succeeded = pyqtSignal(object, name="succeeded")
+    failed = pyqtSignal(object, name="failed")
+    cancelled = pyqtSignal(name="cancelled")
+    finished = pyqtSignal(name="finished")
+
+
+class Task(QRunnable):
+
+    def __init__(self, fn: Callable[..., Any], *args, **kwargs):
+        """ Runs a function on a worker thread. The function is called with an
+        additional keyword argument, progress, which it ought to call
+        periodically with a (message, completed, total) triple. If total is 0,
+        progress is indeterminate. Calls to progress raise TaskCancelled once
+        cancel has been called on this task.
+
+        Results are reported via this task's signals. Since these are owned by
+        an object created on the calling thread, slots on that thread's
+        QObjects will be run there.
+
+        Parameters
+        ----------
+        fn : the function to run
+        *args, **kwargs : passed to fn
+
+        """
+
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+        self.signals = TaskSignals()
+        self._cancel_requested = threading.Event()
+
+    def cancel(self):
+        """ Request that this task stop at its next progress report.
+        """
+        self._cancel_requested.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_requested.is_set()
+
+    def progress(self, message: str, completed: int = 0, total: int = 0):
+        if self.cancelled:
+            raise TaskCancelled(message)
+        self.signals.progress.emit(message, completed, total)
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, progress=self.progress, **self.kwargs)
+        except TaskCancelled:
+            self.signals.cancelled.emit()
+        except Exception as err:
+            self.signals.failed.emit(err)
+        else:
+            if self.cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.succeeded.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+    def start(self):
+        """ Queue this task on the global thread pool.
+        """
+        self.setAutoDelete(False)
+        QThreadPool.globalInstance().start(self)
+
+
+def run_in_process(
+    fn: Callable[..., Any],
+    *args,
+    message: str = "",
+    progress: ProgressCallback = no_progress,
+    poll_interval: float = 0.25
+) -> Any:
+    """ Run a function in a new (spawned) process and wait for its result. 
+    Use this from a task to run work which holds the GIL (or which cannot 
+    otherwise be interrupted). The process is terminated if progress raises 
+    (e.g. because the task was cancelled).
+
+    Parameters
+    ----------
+    fn : the function to run. Must be importable by the new process, as must 
+        its arguments and return value be picklable.
+    *args : passed to fn
+    message : reported via progress while waiting
+    progress : called with message every poll_interval seconds
+    poll_interval : how often (s) to check on the process
+
+    Returns
+    -------
+    the return value of fn. If fn raised, the exception is reraised here.
+
+    """
+
+    context = mp.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_run_and_send, args=(sender, fn, args), daemon=True
+    )
+    process.start()
+    sender.close()
+
+    try:
+        while not receiver.poll(poll_interval):
+            if not process.is_alive():
+                raise RuntimeError(
+                    f"worker process exited unexpectedly (code {process.exitcode})"
+                )
+            progress(message)
+
+        succeeded, value = receiver.recv()
+        process.join(poll_interval)
+
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        receiver.close()
+
+    if not succeeded:
+        raise value
+    return value
+
+
+def _run_and_send(sender, fn: Callable[..., Any], args: Tuple):
+    """ Entry point for processes started by run_in_process.
+    """
+
+    try:
+        result = (True, fn(*args))
+    except Exception as err:
+        result = (False, err)
+
+    try:
+        sender.send(result)
+    except Exception as err:  # e.g. the result or error could not be pickled
+        sender.send((False, RuntimeError(repr(err))))
+    finally:
+        sender.close()
+
+
+class SpawnProcessPool(Executor):
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """ A process pool executor whose workers are spawned (rather than 
+        forked), so that they do not inherit Qt state. Unlike 
+        ProcessPoolExecutor, this does not require Python 3.7. 
+
+        Cancelling a future which has already been sent to a worker does not 
+        stop its job, but its result is discarded. Use terminate to stop 
+        all jobs.
+
+        Parameters
+        ----------
+        max_workers : number of processes. Defaults to the number of CPUs.
+
+        """
+
+        self._pool = mp.get_context("spawn").Pool(processes=max_workers)
+        self._terminated = False
+
+        # futures whose jobs have not yet completed
+        self._pending: Set[Future] = set()
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        future: Future = Future()
+        with self._lock:
+            self._pending.add(future)
+
+        self._pool.apply_async(
+            fn, args, kwargs, 
+            callback=lambda value: self._resolve(future, future.set_result, value),
+            error_callback=lambda err: self._resolve(future, future.set_exception, err)
+        )
+        return future
+
+    def _resolve(self, future: Future, setter: Callable[[Any], None], value: Any):
+        """ Complete a future, unless it has been cancelled. This runs on the 
+        pool's result handling thread, so must not raise.
+        """
+
+        with self._lock:
+            self._pending.discard(future)
+
+        if future.cancelled():
+            return
+        try:
+            setter(value)
+        except Exception:  # cancelled concurrently
+            pass
+
+    def shutdown(self, wait: bool = True):
+        """ Stop accepting jobs. Workers exit once queued jobs are done.
+        """
+
+        if self._terminated:
+            return
+        self._pool.close()
+        if wait:
+            self._pool.join()
+
+    def terminate(self):
+        """ Stop all workers immediately, abandoning their jobs. Futures of 
+        abandoned jobs raise a RuntimeError, so that nothing waits on them 
+        indefinitely.
+        """
+
+        self._terminated = True
+        self._pool.terminate()
+        self._pool.join()
+
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        for future in pending:
+            self._resolve(
+                future, future.set_exception, RuntimeError("process pool terminated")
+            )
@@ -5,6 +5,7 @@
 import sys
 import os
 
+import pytest
 import pytest_check as check
 
 import numpy as np
@@ -17,6 +18,8 @@ sys.path.append(os.path.join(
     "python"
 ))
 
+from sweep_plotter import SweepPlotConfig
+
 
 @check.check_func
 def check_allclose(a, b, *args, **kwargs):
@@ -30,4 +33,44 @@ def check_mock_called_with(mc, *args, **kwargs):
 
 @check.check_func
 def check_mock_not_called(mc):
-    mc.assert_not_called()
\ No newline at end of file
+    mc.assert_not_called()
+
+
+class MockSweep:
+
+    @property
+    def t(self):
+        return np.arange(0, 10, 0.5)
+    
+    @property
+    def v(self):
+        return np.arange(0, 10, 0.5)
+
+    @property
+    def i(self):
+        current = np.zeros(10)
+        current[2:] += 1
+        current[3:] -= 1
+        current[6:] += 1
+        current[-1] = 0
+        return current
+
+    @property
+    def sampling_rate(self):
+        return 0.0
+
+
+class MockDataSet:
+
+    def __init__(self, num_sweeps):
+        self.num_sweeps = num_sweeps
+
+    def sweep(self, sweep_number):
+        sweep = MockSweep()
+        sweep.sweep_number = sweep_number
+        return sweep
+
+
+@pytest.fixture
+def plot_config():
+    return SweepPlotConfig(2.0, 5.0, 3, 1, 0, 2, 1)
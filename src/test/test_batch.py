@@ -0,0 +1,140 @@
+import os
+import sys
+import copy
+import json
+import subprocess
+
+import pytest
+import pytest_check as check
+
+from ipfx.stimulus import StimulusOntology
+from ipfx.ephys_data_set import EphysDataSet
+
+import batch
+from batch import (
+    find_nwb_files, cell_output_dir, run_batch, process_cell, BatchSettings
+)
+from pre_fx_data import PreFxData, PreFxResults
+
+
+@pytest.fixture
+def nwb_tree(tmp_path):
+    for name in ["b.nwb", "a.nwb", "sub/c.nwb", "notes.txt"]:
+        path = tmp_path / "data" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("")
+    return tmp_path
+
+
+def test_find_nwb_files_directory(nwb_tree):
+
+    found = find_nwb_files([str(nwb_tree / "data")])
+
+    check.equal(found, [
+        str(nwb_tree / "data" / name) for name in ["a.nwb", "b.nwb", "sub/c.nwb"]
+    ])
+
+
+def test_find_nwb_files_manifest(nwb_tree):
+
+    manifest = nwb_tree / "manifest.txt"
+    manifest.write_text("# cells to process\ndata/b.nwb\n\ndata/sub/c.nwb\n")
+
+    found = find_nwb_files([
+        str(manifest), str(nwb_tree / "data" / "b.nwb")
+    ])
+
+    check.equal(found, [
+        str(nwb_tree / "data" / "b.nwb"), str(nwb_tree / "data" / "sub" / "c.nwb")
+    ])
+
+
+def test_cell_output_dir():
+    check.equal(
+        cell_output_dir("out", os.path.join("data", "cell_1.nwb")),
+        os.path.join("out", "cell_1")
+    )
+
+
+def test_run_batch_isolates_failures(tmp_path, monkeypatch):
+
+    def process_cell(nwb_path, output_dir, settings):
+        if nwb_path == "bad.nwb":
+            raise ValueError("unreadable")
+        return {"input_nwb_file": nwb_path}
+
+    monkeypatch.setattr(batch, "process_cell", process_cell)
+
+    summaries = run_batch(
+        ["good.nwb", "bad.nwb"], str(tmp_path), BatchSettings([], {}), 1
+    )
+
+    check.equal(summaries[0], {"input_nwb_file": "good.nwb"})
+    check.is_true("unreadable" in summaries[1]["error"])
+
+    with open(tmp_path / batch.SUMMARY_FILE, "r") as summary_file:
+        check.equal(json.load(summary_file), summaries)
+
+
+def pre_fx_results():
+    return PreFxResults(
+        nwb_path="cell.nwb",
+        stimulus_ontology=StimulusOntology([]),
+        qc_criteria={},
+        data_set=EphysDataSet(data=None),
+        session=None,
+        cell_features={},
+        cell_tags=[],
+        cell_state={"failed_qc": False},
+        sweep_features=[
+            # features of sweep 2 passed checks which its auto qc state failed
+            {"sweep_number": 1, "passed": False, "stimulus_name": "a"},
+            {"sweep_number": 2, "passed": True, "stimulus_name": "b"},
+            {"sweep_number": 3, "passed": True, "stimulus_name": "c"}
+        ],
+        sweep_states=[
+            {"sweep_number": 1, "passed": True, "reasons": []},
+            {"sweep_number": 2, "passed": False, "reasons": ["bad"]},
+            {"sweep_number": 3, "passed": True, "reasons": []}
+        ],
+        qc_features=None,
+        qc_features_key=None
+    )
+
+
+def test_batch_extraction_inputs_match_gui(qtbot, tmp_path, monkeypatch):
+
+    data = PreFxData()
+    with qtbot.waitSignal(data.data_changed) as blocker:
+        data.commit_results(pre_fx_results())
+    gui_sweep_info = blocker.args[2]
+
+    extracted = []
+    monkeypatch.setattr(
+        batch, "run_pre_fx_pipeline", lambda *args, **kwargs: pre_fx_results()
+    )
+    monkeypatch.setattr(
+        batch, "extract_session_features", 
+        lambda session, sweep_info: extracted.append(copy.deepcopy(sweep_info)) 
+            or {"cell_state": {"failed_fx": False}}
+    )
+    monkeypatch.setattr(batch, "write_review_bundle", lambda *args: None)
+
+    process_cell("cell.nwb", str(tmp_path), BatchSettings([], {}))
+
+    check.equal(extracted, [gui_sweep_info])
+
+
+def test_no_widget_imports():
+
+    source_dir = os.path.dirname(batch.__file__)
+    result = subprocess.run(
+        [
+            sys.executable, "-c",
+            "import sys, batch; "
+            "print('PyQt5.QtWidgets' in sys.modules or 'pyqtgraph' in sys.modules)"
+        ],
+        cwd=source_dir, stdout=subprocess.PIPE, universal_newlines=True, check=True
+    )
+
+    check.equal(result.stdout.strip(), "False")
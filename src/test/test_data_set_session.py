@@ -0,0 +1,68 @@
+import pytest
+import pytest_check as check
+
+from ipfx.ephys_data_set import EphysDataSet
+
+from data_set_session import DataSetView, DeferredData
+
+
+class MockData:
+
+    sweep_numbers = [1, 2, 3]
+    ontology = None
+
+    def __init__(self):
+        self.metadata_reads = 0
+
+    def get_sweep_metadata(self, sweep_number):
+        self.metadata_reads += 1
+        return {
+            "sweep_number": sweep_number, 
+            "stimulus_code": f"code{sweep_number}",
+            "clamp_mode": "CurrentClamp"
+        }
+
+
+@pytest.fixture
+def base():
+    return EphysDataSet(data=MockData())
+
+
+def test_view_filters(base):
+
+    base.sweep_table
+    view = DataSetView(
+        base, [{"sweep_number": 1, "passed": True}, {"sweep_number": 3, "passed": True}]
+    )
+
+    check.equal(view.sweep_table["sweep_number"].tolist(), [1, 3])
+    check.equal(view.sweep_table["stimulus_code"].tolist(), ["code1", "code3"])
+    check.is_true(all(view.sweep_table["passed"]))
+
+    # metadata were read once, for the base data set
+    check.equal(base._data.metadata_reads, 3)
+    check.is_(view._data, base._data)
+
+
+def test_view_unfiltered(base):
+
+    view = DataSetView(base)
+    check.equal(view.sweep_table["sweep_number"].tolist(), [1, 2, 3])
+
+
+def test_deferred_data():
+
+    opened = []
+
+    def open_data():
+        opened.append(True)
+        return MockData()
+
+    data = DeferredData(open_data)
+    data_set = EphysDataSet(data=data)
+    check.is_false(data.opened)
+
+    check.equal(data_set.sweep_table["sweep_number"].tolist(), [1, 2, 3])
+    data_set.sweep_table
+    check.is_true(data.opened)
+    check.equal(len(opened), 1)
@@ -1,12 +1,14 @@
 import pytest
 import pytest_check as check
 
-from PyQt5.QtWidgets import QComboBox, QApplication, QMainWindow
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QComboBox, QApplication, QMainWindow, QTableView
+from PyQt5.QtGui import QStandardItemModel, QStandardItem
+from PyQt5.QtCore import Qt, QByteArray
 
 import numpy as np
 
-from delegates import ComboBoxDelegate
+from delegates import ComboBoxDelegate, SvgDelegate
+from sweep_plotter import FixedPlots
 
 from .conftest import check_allclose
 
@@ -31,4 +33,67 @@ def test_combobox_activated(qtbot):
     cb.activated.emit(12)
 
     check.is_none(app.focusWidget())
-    check_allclose(record, [12])
\ No newline at end of file
+    check_allclose(record, [12])
+
+@pytest.mark.parametrize("single_click", [True, False])
+def test_combobox_single_click(qtbot, single_click):
+
+    model = QStandardItemModel(50, 1)
+    for row in range(50):
+        model.setItem(row, 0, QStandardItem("b"))
+
+    view = QTableView()
+    view.setModel(model)
+    view.setItemDelegateForColumn(
+        0, ComboBoxDelegate(view, ["a", "b", "c"], single_click=single_click)
+    )
+    qtbot.addWidget(view)
+    view.show()
+
+    # no editors exist until a cell is interacted with
+    check.equal(len(view.findChildren(QComboBox)), 0)
+
+    index = model.index(1, 0)
+    qtbot.mouseClick(
+        view.viewport(), Qt.LeftButton, Qt.NoModifier, 
+        view.visualRect(index).center()
+    )
+
+    editor = view.indexWidget(index)
+    if single_click:
+        check.is_instance(editor, QComboBox)
+        check.equal(editor.currentText(), "b")
+        check.equal(len(view.findChildren(QComboBox)), 1)
+    else:
+        check.is_none(editor)
+
+
+@pytest.fixture
+def svg_plots():
+    svg = QByteArray(
+        b'<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10">'
+        b'<line x1="0" y1="0" x2="10" y2="10" stroke="black"/></svg>'
+    )
+    return [FixedPlots(thumbnail=svg, full=None) for _ in range(3)]
+
+
+def test_svg_renderer_cache(svg_plots):
+
+    delegate = SvgDelegate(cache_size=2)
+
+    first = delegate.get_renderer(svg_plots[0])
+    check.is_true(first.isValid())
+    check.is_(delegate.get_renderer(svg_plots[0]), first)
+
+    delegate.get_renderer(svg_plots[1])
+    delegate.get_renderer(svg_plots[0])  # now most recently used
+    delegate.get_renderer(svg_plots[2])  # evicts svg_plots[1]
+
+    check.equal(
+        [plots for plots, _ in delegate._renderers.values()], 
+        [svg_plots[0], svg_plots[2]]
+    )
+    check.is_(delegate.get_renderer(svg_plots[0]), first)
+
+    delegate.clear_cache()
+    check.is_not(delegate.get_renderer(svg_plots[0]), first)
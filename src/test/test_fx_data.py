@@ -0,0 +1,81 @@
+from unittest import mock
+
+import pytest
+import pytest_check as check
+
+from ipfx.stimulus import StimulusOntology
+
+from fx_data import FxData
+from pre_fx_data import PreFxData
+
+
+@pytest.fixture
+def fx_data():
+    fx_data = FxData(auto_refresh_delay=10)
+    fx_data.input_nwb_file = "cell.nwb"
+    fx_data.run_feature_extraction = mock.MagicMock()
+    return fx_data
+
+
+def test_auto_refresh_coalesces(qtbot, fx_data):
+
+    fx_data.set_auto_refresh(True)
+    for _ in range(5):
+        fx_data.on_sweep_state_updated(1, False)
+
+    qtbot.waitUntil(lambda: fx_data.run_feature_extraction.called)
+    qtbot.wait(50)
+    check.equal(fx_data.run_feature_extraction.call_count, 1)
+
+
+def test_auto_refresh_disabled(qtbot, fx_data):
+
+    fx_data.on_sweep_state_updated(1, False)
+    qtbot.wait(50)
+    check.is_false(fx_data.run_feature_extraction.called)
+
+
+def test_auto_refresh_enabled_while_outdated(qtbot, fx_data):
+
+    fx_data.on_sweep_state_updated(1, False)
+    fx_data.set_auto_refresh(True)
+    qtbot.waitUntil(lambda: fx_data.run_feature_extraction.called)
+
+
+def test_auto_refresh_cancels_running_task(fx_data):
+
+    task = mock.MagicMock()
+    fx_data._task = task
+    fx_data.auto_refresh = True
+
+    fx_data.on_refresh_timeout()
+
+    check.is_true(task.cancel.called)
+    check.is_false(fx_data.run_feature_extraction.called)
+    check.is_true(fx_data._refresh_pending)
+
+
+def test_sweep_state_updated_through_signals(qtbot, fx_data):
+
+    pre_fx_data = PreFxData()
+    pre_fx_data.sweep_features = [
+        {"sweep_number": 1, "passed": True},
+        {"sweep_number": 2, "passed": False}
+    ]
+    pre_fx_data.sweep_states = [
+        {"sweep_number": 1, "passed": True, "reasons": []},
+        {"sweep_number": 2, "passed": False, "reasons": ["bad"]}
+    ]
+    pre_fx_data.manual_qc_states = {1: "default", 2: "default"}
+    pre_fx_data.update_sweep_states()
+
+    fx_data.connect(pre_fx_data)
+    pre_fx_data.data_changed.emit(
+        "cell.nwb", StimulusOntology([]), pre_fx_data.sweep_features, {}, None
+    )
+
+    pre_fx_data.on_manual_qc_state_updated(1, "failed")
+    pre_fx_data.on_manual_qc_state_updated(2, "passed")
+
+    passed = {sweep["sweep_number"]: sweep["passed"] for sweep in fx_data.sweep_info}
+    check.equal(passed, {1: False, 2: True})
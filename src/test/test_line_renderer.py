@@ -0,0 +1,97 @@
+import pytest
+import pytest_check as check
+
+import numpy as np
+
+from line_renderer import (
+    Line, autoscale, render_lines_image, render_lines_svg, finite_polylines
+)
+from sweep_plotter import (
+    PulsePopupPlotter, ExperimentPopupPlotter, 
+    thumbnail_image, QPAINTER_THUMBNAIL_RENDERER, MATPLOTLIB_THUMBNAIL_RENDERER
+)
+
+from .conftest import check_allclose
+
+
+def image_array(image):
+    """ Grayscale values of a QImage, as a height x width array.
+    """
+    return np.array([
+        [image.pixelColor(xx, yy).value() for xx in range(image.width())]
+        for yy in range(image.height())
+    ])
+
+
+def frame_edges(image):
+    """ Locate the axes frame as the extreme rows and columns which are almost
+    entirely drawn on.
+    """
+    dark = image_array(image) < 250
+    rows = np.flatnonzero(dark.mean(axis=1) > 0.7)
+    cols = np.flatnonzero(dark.mean(axis=0) > 0.7)
+    return rows[0], rows[-1], cols[0], cols[-1]
+
+
+@pytest.mark.parametrize("arrays,expected", [
+    [[np.array([0.0, 10.0])], (-0.5, 10.5)],
+    [[np.array([0.0, np.nan]), np.array([-10.0])], (-10.5, 0.5)],
+    [[np.array([2.0])], (1.5, 2.5)],
+    [[np.array([])], (0.0, 1.0)]
+])
+def test_autoscale(arrays, expected):
+    check.equal(autoscale(arrays), expected)
+
+
+def test_render_lines_image_draws_lines():
+
+    image = render_lines_image(
+        [Line(np.array([0.0, 1.0]), np.array([0.5, 0.5]), "#ff0000")], 
+        100, 100, x_lim=(0, 1), y_lim=(0, 1)
+    )
+
+    color = image.pixelColor(50, int(100 - 0.11 * 100 - 0.5 * 0.77 * 100))
+    check.greater(color.red(), 200)
+    check.less(color.green(), 100)
+
+
+def test_render_lines_svg():
+    svg = render_lines_svg([Line(np.arange(3), np.arange(3), "#000000")], 50, 50)
+    check.is_true(svg.strip().endswith(b"</svg>"))
+
+
+@pytest.mark.parametrize("plotter", [
+    PulsePopupPlotter(
+        np.linspace(0, 1, 100), np.sin(np.linspace(0, 10, 100)), 
+        np.zeros(100), None, 1
+    ),
+    ExperimentPopupPlotter(
+        np.linspace(0, 1, 100), np.sin(np.linspace(0, 10, 100)), 0.5
+    )
+])
+@pytest.mark.parametrize("width,height", [[160, 120], [100, 100]])
+def test_matches_matplotlib_layout(plotter, width, height):
+
+    qpainter = thumbnail_image(plotter, width, height, QPAINTER_THUMBNAIL_RENDERER)
+    mpl = thumbnail_image(plotter, width, height, MATPLOTLIB_THUMBNAIL_RENDERER)
+
+    check.equal(
+        (qpainter.width(), qpainter.height()), (mpl.width(), mpl.height())
+    )
+    check_allclose(frame_edges(qpainter), frame_edges(mpl), atol=2)
+
+
+def test_finite_polylines():
+
+    x = np.arange(7, dtype=float)
+    y = np.array([0.0, 1.0, np.nan, 3.0, 4.0, 5.0, np.nan])
+
+    polylines = [
+        [(point.x(), point.y()) for point in polyline]
+        for polyline in finite_polylines(x, y)
+    ]
+
+    check.equal(polylines, [
+        [(0.0, 0.0), (1.0, 1.0)],
+        [(3.0, 3.0), (4.0, 4.0), (5.0, 5.0)]
+    ])
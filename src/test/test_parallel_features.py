@@ -0,0 +1,126 @@
+import multiprocessing as mp
+
+import pytest
+import pytest_check as check
+
+from ipfx.ephys_data_set import EphysDataSet
+
+from parallel_features import (
+    plan_sweep_batches, merge_feature_results, extract_features_parallel
+)
+
+
+class MockData:
+
+    ontology = None
+
+    def __init__(self, sweeps):
+        self.sweeps = sweeps
+
+    @property
+    def sweep_numbers(self):
+        return [sweep["sweep_number"] for sweep in self.sweeps]
+
+    def get_sweep_metadata(self, sweep_number):
+        return dict(self.sweeps[self.sweep_numbers.index(sweep_number)])
+
+
+@pytest.fixture
+def data_set():
+    return EphysDataSet(data=MockData([
+        {"sweep_number": num, "stimulus_name": name, "clamp_mode": mode}
+        for num, name, mode in [
+            (1, "Long Square", "CurrentClamp"),
+            (2, "Long Square", "CurrentClamp"),
+            (3, "Ramp", "CurrentClamp"),
+            (4, "Test", "VoltageClamp"),
+            (5, "Short Square", "CurrentClamp")
+        ]
+    ]))
+
+
+@pytest.mark.parametrize("num_batches", [1, 2, 10])
+def test_plan_sweep_batches(data_set, num_batches):
+
+    batches = plan_sweep_batches(data_set, num_batches)
+
+    check.less_equal(len(batches), max(num_batches, 1))
+    check.equal(sorted(num for batch in batches for num in batch), [1, 2, 3, 5])
+
+
+def failed(message):
+    return None, {"failed_fx": True, "fail_fx_message": message}
+
+
+def succeeded(value):
+    return value, {"failed_fx": False, "fail_fx_message": None}
+
+
+def test_merge_feature_results(data_set):
+
+    cell_features, sweep_features, _, sweep_records, cell_state, states = \
+        merge_feature_results(
+            data_set,
+            {
+                "long_squares": failed("a"), 
+                "short_squares": failed("b"), 
+                "ramps": failed("c")
+            },
+            [
+                succeeded({1: {"sweep_number": 1, "spikes": []}}),
+                succeeded({3: {"sweep_number": 3, "spikes": [{}]}})
+            ]
+        )
+
+    check.equal(sorted(sweep_features), [1, 3])
+    check.equal(
+        list(states), 
+        ["long_squares_state", "short_squares_state", "ramps_state", "sweep_features_state"]
+    )
+    check.is_false(cell_state["failed_fx"])
+    check.equal(
+        {record["sweep_number"]: record["num_spikes"] for record in sweep_records 
+            if record["sweep_number"] in sweep_features},
+        {1: 0, 3: 1}
+    )
+
+
+def test_merge_feature_results_sweeps_failed(data_set):
+
+    _, sweep_features, _, _, cell_state, states = merge_feature_results(
+        data_set,
+        {
+            "long_squares": failed("a"), 
+            "short_squares": failed("b"), 
+            "ramps": failed("c")
+        },
+        [succeeded({1: {"sweep_number": 1, "spikes": []}}), failed("d")]
+    )
+
+    check.equal(sweep_features, {})
+    check.is_true(states["sweep_features_state"]["failed_fx"])
+    check.is_true(cell_state["failed_fx"])
+    check.equal(cell_state["fail_fx_message"], "a; b; c; d")
+
+
+def test_extract_features_parallel_open_fails(data_set, tmp_path):
+
+    with pytest.raises(Exception):
+        extract_features_parallel(
+            data_set, str(tmp_path / "missing.nwb"), None, [], 1
+        )
+    check.equal(mp.active_children(), [])
+
+
+def test_extract_features_parallel_cancel(data_set, tmp_path):
+
+    def progress(*args):
+        raise RuntimeError("cancelled")
+
+    with pytest.raises(RuntimeError, match="cancelled"):
+        extract_features_parallel(
+            data_set, str(tmp_path / "missing.nwb"), None, [], 2, progress
+        )
+
+    # workers are stopped, rather than left to finish their jobs
+    check.equal(mp.active_children(), [])
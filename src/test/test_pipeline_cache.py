@@ -0,0 +1,50 @@
+import pytest_check as check
+
+from ipfx.stimulus import StimulusOntology
+
+from pipeline_cache import StageCache, hash_json, ontology_hash
+
+
+def test_stage_cache():
+
+    cache = StageCache({"a": 2})
+    calls = []
+
+    def compute(value):
+        def fn():
+            calls.append(value)
+            return value
+        return fn
+
+    check.equal(cache.get_or_compute("a", 1, compute("x")), "x")
+    check.equal(cache.get_or_compute("a", 1, compute("y")), "x")
+    check.equal(cache.get_or_compute("a", 2, compute("z")), "z")
+    check.equal(cache.get_or_compute("a", 3, compute("w")), "w")
+
+    # least recently used entry was evicted
+    check.equal(cache.get_or_compute("a", 1, compute("v")), "v")
+
+    check.equal(calls, ["x", "z", "w", "v"])
+    check.equal(cache.stats(), {"a": (1, 4)})
+
+
+def test_stage_cache_uncached_stage():
+
+    cache = StageCache({})
+    check.equal(cache.get_or_compute("b", 1, lambda: 1), 1)
+    check.equal(cache.get_or_compute("b", 1, lambda: 2), 2)
+    check.equal(cache.stats(), {})
+
+
+def test_hash_json():
+    check.equal(hash_json({"a": 1, "b": [2]}), hash_json({"b": [2], "a": 1}))
+    check.not_equal(hash_json({"a": 1}), hash_json({"a": 2}))
+
+
+def test_ontology_hash():
+    first = StimulusOntology([[["name", "a"], ["code", "A"]]])
+    same = StimulusOntology([[["name", "a"], ["code", "A"]]])
+    other = StimulusOntology([[["name", "b"], ["code", "B"]]])
+
+    check.equal(ontology_hash(first), ontology_hash(same))
+    check.not_equal(ontology_hash(first), ontology_hash(other))
@@ -0,0 +1,138 @@
+import pickle
+
+import numpy as np
+import pytest
+import pytest_check as check
+
+from ipfx.ephys_data_set import EphysDataSet
+from ipfx.qc_feature_extractor import sweep_qc_features as ipfx_sweep_qc_features
+from ipfx.stimulus import StimulusOntology
+
+import pre_fx_data
+from pre_fx_data import PreFxData, sweep_qc_features
+
+
+@pytest.fixture
+def data():
+    data = PreFxData()
+    data.sweep_features = [
+        {"sweep_number": 1, "passed": True},
+        {"sweep_number": 2, "passed": False}
+    ]
+    data.sweep_states = [
+        {"sweep_number": 1, "passed": True, "reasons": []},
+        {"sweep_number": 2, "passed": False, "reasons": ["bad"]}
+    ]
+    data.manual_qc_states = {1: "default", 2: "default"}
+    data.update_sweep_states()
+    return data
+
+
+def test_on_manual_qc_state_updated(qtbot, data):
+
+    with qtbot.waitSignal(data.sweep_state_updated) as blocker:
+        data.on_manual_qc_state_updated(2, "passed")
+
+    check.equal(blocker.args, [2, True])
+    check.is_true(data.sweep_features[1]["passed"])
+    check.is_true(data.sweep_features[0]["passed"])
+
+    # auto qc results are untouched
+    check.is_false(data.sweep_states[1]["passed"])
+    check.equal(data.sweep_states[1]["reasons"], ["bad"])
+
+    with qtbot.waitSignal(data.sweep_state_updated) as blocker:
+        data.on_manual_qc_state_updated(2, "default")
+
+    check.equal(blocker.args, [2, False])
+    check.is_false(data.sweep_features[1]["passed"])
+
+
+def test_update_sweep_states(data):
+
+    data.manual_qc_states[1] = "failed"
+    data.sweep_states = [
+        {"sweep_number": 1, "passed": True, "reasons": []},
+        {"sweep_number": 2, "passed": True, "reasons": []}
+    ]
+    data.update_sweep_states()
+
+    check.is_false(data.sweep_features[0]["passed"])
+    check.is_true(data.sweep_features[1]["passed"])
+
+
+class MockData:
+
+    ontology = StimulusOntology([
+        [["code", "LS"], ["name", "Long Square"]],
+        [["code", "RAMP"], ["name", "Ramp"]],
+        [["code", "TEST"], ["name", "Test"]]
+    ])
+
+    # (code, name, clamp mode, stimulus amplitude, recorded fraction)
+    sweeps = [
+        ("LS", "Long Square", "CurrentClamp", -50.0, 1.0),
+        ("LS", "Long Square", "CurrentClamp", 50.0, 1.0),
+        ("RAMP", "Ramp", "CurrentClamp", 100.0, 1.0),
+        ("LS", "Long Square", "CurrentClamp", 80.0, 0.6),
+        ("TEST", "Test", "CurrentClamp", 0.0, 1.0),
+        ("LS", "Long Square", "VoltageClamp", 10.0, 1.0),
+        ("LS", "Long Square", "CurrentClamp", -30.0, 1.0)
+    ]
+
+    @property
+    def sweep_numbers(self):
+        return list(range(len(self.sweeps)))
+
+    def get_sweep_metadata(self, sweep_number):
+        code, name, clamp_mode, _, _ = self.sweeps[sweep_number]
+        return {
+            "sweep_number": sweep_number,
+            "stimulus_code": code,
+            "stimulus_name": name,
+            "stimulus_units": "Amps",
+            "clamp_mode": clamp_mode
+        }
+
+    def get_sweep_data(self, sweep_number):
+        """ A sweep with a test pulse and a square (or ramp) stimulus, whose 
+        response has some noise and may end early.
+        """
+
+        _, name, _, amplitude, recorded = self.sweeps[sweep_number]
+        t = np.arange(0, 2.0, 2e-5)
+        i = np.zeros_like(t)
+        i[(t >= 0.01) & (t < 0.02)] = 10.0
+        on = (t >= 0.5) & (t < 1.5)
+        i[on] = amplitude * ((t[on] - 0.5) if name == "Ramp" else 1.0)
+
+        noise = np.random.default_rng(sweep_number).normal(scale=0.1, size=len(t))
+        v = -70.0 + 0.1 * i + noise
+        v[t >= 2.0 * recorded] = np.nan
+
+        return {
+            "stimulus": i,
+            "response": v,
+            "sampling_rate": 5e4,
+            "stimulus_unit": "Amps"
+        }
+
+
+def test_sweep_qc_features_matches_ipfx(monkeypatch):
+
+    monkeypatch.setattr(pre_fx_data, "SWEEP_READ_CHUNK_SIZE", 2)
+    data_set = EphysDataSet(data=MockData())
+    progress = []
+
+    expected = ipfx_sweep_qc_features(data_set)
+    actual = sweep_qc_features(
+        data_set, lambda *args: progress.append(args[1:])
+    )
+
+    check.equal(
+        [features["sweep_number"] for features in expected], [0, 1, 2, 3, 6]
+    )
+    check.is_true(expected[3]["tags"])
+    # features contain NaNs
+    check.equal(pickle.dumps(actual), pickle.dumps(expected))
+    check.equal(progress, [(index, 5) for index in range(5)])
@@ -0,0 +1,124 @@
+
+import pytest
+import pytest_check as check
+
+from ipfx.stimulus import StimulusOntology
+
+from sweep_plotter import SweepPlotter
+from review_bundle import (
+    write_review_bundle, read_review_bundle, find_review_bundle,
+    review_bundle_path
+)
+
+from .conftest import check_allclose, MockDataSet
+
+
+@pytest.fixture
+def nwb_path(tmp_path):
+    path = tmp_path / "data" / "cell.nwb"
+    path.parent.mkdir()
+    path.write_bytes(b"not really an nwb file")
+    return str(path)
+
+
+@pytest.fixture
+def ontology():
+    return StimulusOntology([[["name", "a"], ["code", "A"]]])
+
+
+@pytest.fixture
+def qc_features():
+    return (
+        {"blowout_mv": 1.0}, ["a tag"],
+        [{"sweep_number": 0, "tags": []}, {"sweep_number": 1, "tags": []}]
+    )
+
+
+@pytest.fixture
+def auto_qc():
+    return (
+        {"failed_qc": False}, {"blowout_mv": 1.0},
+        [{"sweep_number": 0, "passed": True}, {"sweep_number": 1, "passed": False}],
+        [{"sweep_number": 0, "passed": True}, {"sweep_number": 1, "passed": False}]
+    )
+
+
+@pytest.fixture
+def bundle_dir(tmp_path, nwb_path, ontology, qc_features, auto_qc, plot_config):
+
+    plots = SweepPlotter(MockDataSet(2), plot_config).plot_sweeps([0, 1])
+    directory = str(tmp_path / "batch")
+
+    write_review_bundle(
+        review_bundle_path(directory, nwb_path), nwb_path, ontology,
+        {"criterion": 1}, qc_features, auto_qc, plot_config, [0, 1],
+        {0: plots[0], 1: plots[1]}
+    )
+    return directory
+
+
+def test_round_trip(bundle_dir, nwb_path, qc_features, auto_qc, plot_config):
+
+    bundle = read_review_bundle(review_bundle_path(bundle_dir, nwb_path))
+
+    check.equal(bundle.qc_features, qc_features)
+    check.equal(bundle.auto_qc({"criterion": 1}), auto_qc)
+    check.is_none(bundle.auto_qc({"criterion": 2}))
+
+    check.is_true(bundle.plots_match(plot_config._replace(thumbnail_workers=4), [0, 1]))
+    check.is_false(bundle.plots_match(plot_config, [1, 0]))
+    check.is_false(bundle.plots_match(plot_config._replace(thumbnail_buckets=10), [0, 1]))
+
+
+def test_load_plots(bundle_dir, nwb_path, plot_config):
+
+    expected = SweepPlotter(MockDataSet(2), plot_config).plot_sweeps([0, 1])[1]
+    bundle = read_review_bundle(review_bundle_path(bundle_dir, nwb_path))
+
+    obtained = bundle.load_plots([1, 5])
+    check.equal(list(obtained), [1])
+
+    for exp, obt in zip(expected, obtained[1]):
+        check_allclose(exp.full.time, obt.full.time)
+        check_allclose(exp.full.voltage, obt.full.voltage)
+
+        exp_pyramids = exp.full.pyramids()
+        obt_pyramids = obt.full._pyramids
+        check.equal(set(exp_pyramids), set(obt_pyramids))
+
+        for name, pyramid in exp_pyramids.items():
+            check.equal(len(pyramid.levels), len(obt_pyramids[name].levels))
+            for (exp_min, exp_max), (obt_min, obt_max) in zip(
+                pyramid.levels, obt_pyramids[name].levels
+            ):
+                check_allclose(exp_min, obt_min)
+                check_allclose(exp_max, obt_max)
+
+
+def test_find_review_bundle(bundle_dir, nwb_path, ontology):
+
+    check.is_not_none(find_review_bundle(bundle_dir, nwb_path, ontology))
+
+    other = StimulusOntology([[["name", "b"], ["code", "B"]]])
+    check.is_none(find_review_bundle(bundle_dir, nwb_path, other))
+
+    with open(nwb_path, "ab") as nwb_file:
+        nwb_file.write(b"more")
+    check.is_none(find_review_bundle(bundle_dir, nwb_path, ontology))
+
+
+def test_find_review_bundle_missing(tmp_path, nwb_path, ontology):
+    check.is_none(find_review_bundle(str(tmp_path), nwb_path, ontology))
+
+
+def test_sweep_plotter_prefers_bundle(bundle_dir, nwb_path, plot_config):
+
+    class FailingDataSet:
+        def sweep(self, sweep_number):
+            raise AssertionError("sweep should have been read from the bundle")
+
+    bundle = read_review_bundle(review_bundle_path(bundle_dir, nwb_path))
+    plotter = SweepPlotter(FailingDataSet(), plot_config, review_bundle=bundle)
+
+    plots = plotter.plot_sweeps([0, 1])
+    check.equal(sorted(plots), [0, 1])
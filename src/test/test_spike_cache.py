@@ -0,0 +1,220 @@
+import pickle
+from unittest import mock
+
+import numpy as np
+import pytest
+import pytest_check as check
+
+import ipfx.data_set_features as data_set_features
+from ipfx.data_set_features import extract_data_set_features
+from ipfx.ephys_data_set import EphysDataSet
+from ipfx.feature_extractor import SpikeFeatureExtractor
+from ipfx.stimulus import StimulusOntology
+
+from workers import TaskCancelled
+from spike_cache import (
+    CachingSpikeFeatureExtractor, extract_cached_features, new_spike_cache,
+    trace_digest, SPIKE_STAGE, CELL_STAGE
+)
+
+
+def spiking_trace(spike_times, duration=1.0):
+    t = np.arange(0, duration, 2e-5)
+    v = np.full_like(t, -70.0)
+    for spike_time in spike_times:
+        v += 100 * np.exp(-((t - spike_time) / 0.0005) ** 2)
+    return t, v, np.zeros_like(t)
+
+
+def test_trace_digest():
+
+    t, v, i = spiking_trace([0.2])
+    _, other_v, _ = spiking_trace([0.3])
+
+    check.equal(trace_digest(t, v, i), trace_digest(t.copy(), v.copy(), i.copy()))
+    check.not_equal(trace_digest(t, v, i), trace_digest(t, other_v, i))
+    check.not_equal(trace_digest(t, v, i), trace_digest(t + 1.0, v, i))
+
+
+def test_caching_extractor():
+
+    cache = new_spike_cache()
+    t, v, i = spiking_trace([0.2, 0.4, 0.6])
+
+    expected = SpikeFeatureExtractor().process(t, v, i)
+    first = CachingSpikeFeatureExtractor(cache=cache).process(t, v, i)
+    second = CachingSpikeFeatureExtractor(cache=cache).process(t, v, i)
+
+    check.equal(len(expected), 3)
+    check.is_true(first.equals(expected))
+    check.is_true(second.equals(expected))
+    check.equal(cache.stats()[SPIKE_STAGE], (1, 1))
+
+    # modifying a result does not affect the cache
+    second["peak_v"] = 0.0
+    third = CachingSpikeFeatureExtractor(cache=cache).process(t, v, i)
+    check.is_true(third.equals(expected))
+
+
+def test_caching_extractor_parameters():
+
+    cache = new_spike_cache()
+    t, v, i = spiking_trace([0.2, 0.4, 0.6])
+
+    whole = CachingSpikeFeatureExtractor(cache=cache).process(t, v, i)
+    part = CachingSpikeFeatureExtractor(cache=cache, start=0.3, end=0.7)\
+        .process(t, v, i)
+
+    check.equal(len(whole), 3)
+    check.equal(len(part), 2)
+    check.equal(cache.stats()[SPIKE_STAGE], (0, 2))
+
+
+class MockData:
+
+    ontology = StimulusOntology([[["code", "LS"], ["name", "Long Square"]]])
+
+    def __init__(self, amplitudes):
+        self.amplitudes = amplitudes
+
+    @property
+    def sweep_numbers(self):
+        return list(range(len(self.amplitudes)))
+
+    def get_sweep_metadata(self, sweep_number):
+        return {
+            "sweep_number": sweep_number, 
+            "stimulus_code": "LS", 
+            "stimulus_name": "Long Square",
+            "stimulus_units": "Amps",
+            "clamp_mode": "CurrentClamp"
+        }
+
+    def get_sweep_data(self, sweep_number):
+        """ A long square sweep (preceded by a test pulse), whose response 
+        charges exponentially and, for large stimuli, spikes.
+        """
+
+        amplitude = self.amplitudes[sweep_number]
+        t = np.arange(0, 2.0, 2e-5)
+        i = np.zeros_like(t)
+        i[(t >= 0.01) & (t < 0.02)] = 10.0
+        on = (t >= 0.5) & (t < 1.5)
+        off = t >= 1.5
+        i[on] = amplitude
+
+        v = np.full_like(t, -70.0)
+        v[on] += amplitude * 0.1 * (1 - np.exp(-(t[on] - 0.5) / 0.02))
+        v[off] += amplitude * 0.1 * np.exp(-(t[off] - 1.5) / 0.02)
+        if amplitude > 100:
+            _, spikes, _ = spiking_trace(
+                np.arange(0.6, 1.4, 200.0 / amplitude), duration=2.0
+            )
+            v += spikes + 70.0
+
+        return {
+            "stimulus": i, 
+            "response": v, 
+            "sampling_rate": 5e4, 
+            "stimulus_unit": "Amps"
+        }
+
+
+@pytest.fixture
+def data_set():
+    return EphysDataSet(data=MockData([-110, -90, -70, -50, -30, 50, 150, 250]))
+
+
+def check_same_features(actual, expected):
+    # features contain nested dicts, lists and NaNs
+    check.equal(pickle.dumps(actual), pickle.dumps(expected))
+
+
+@pytest.fixture
+def detections():
+    """ Counts spike detections, whether or not they are made through a cache
+    """
+
+    with mock.patch.object(
+        SpikeFeatureExtractor, "process", 
+        autospec=True, side_effect=SpikeFeatureExtractor.process
+    ) as process:
+        yield process
+
+
+def test_extract_cached_features(data_set):
+
+    expected = extract_data_set_features(data_set)
+    check.is_false(expected[4]["failed_fx"])
+    check.is_false(expected[5]["long_squares_state"]["failed_fx"])
+
+    cache = new_spike_cache()
+    check_same_features(extract_cached_features(data_set, cache), expected)
+    check_same_features(extract_cached_features(data_set, cache), expected)
+
+    check.equal(cache.stats()[CELL_STAGE], (3, 3))
+    check.is_true(data_set_features.SpikeFeatureExtractor is SpikeFeatureExtractor)
+
+
+def test_extract_cached_features_detections(data_set, detections):
+
+    cache = new_spike_cache()
+    extract_cached_features(data_set, cache)
+
+    # the long square analysis detects spikes within the stimulus, the 
+    # sweep-level loop throughout the sweep
+    check.equal(detections.call_count, 16)
+
+    extract_cached_features(data_set, cache)
+    check.equal(detections.call_count, 16)
+
+
+def test_extract_cached_features_sweeps_changed(data_set, detections):
+
+    cache = new_spike_cache()
+    extract_cached_features(data_set, cache)
+    detections.reset_mock()
+
+    sweep_info = [
+        {"sweep_number": num, "passed": True} for num in data_set.sweep_table[
+            data_set.SWEEP_NUMBER
+        ] if num != 2
+    ]
+    reduced = EphysDataSet(data=data_set._data, sweep_info=sweep_info)
+    actual = extract_cached_features(reduced, cache)
+
+    # the long square analysis (whose sweeps changed) is redone, but no 
+    # spikes are detected again
+    check.equal(detections.call_count, 0)
+    check.equal(cache.stats()[CELL_STAGE], (2, 4))
+    check_same_features(actual, extract_data_set_features(reduced))
+
+
+def test_extract_cached_features_progress(data_set):
+
+    reports = []
+    extract_cached_features(
+        data_set, new_spike_cache(), lambda *args: reports.append(args)
+    )
+
+    check.equal(reports, [
+        ("Computing sweep features", index, 8) for index in range(1, 9)
+    ] + [
+        ("Computing cell features", index, 3) for index in range(3)
+    ])
+
+
+@pytest.mark.parametrize("cancel_at", [3, 9])
+def test_extract_cached_features_cancelled(data_set, cancel_at):
+
+    reports = []
+
+    def progress(*args):
+        reports.append(args)
+        if len(reports) == cancel_at:
+            raise TaskCancelled()
+
+    # not recorded as a failed analysis
+    with pytest.raises(TaskCancelled):
+        extract_cached_features(data_set, new_spike_cache(), progress)
+    check.equal(len(reports), cancel_at)
@@ -0,0 +1,195 @@
+from types import SimpleNamespace
+
+import pytest
+import pytest_check as check
+import numpy as np
+import h5py
+
+from pynwb.device import Device
+from pynwb.icephys import (
+    IntracellularElectrode, CurrentClampSeries, CurrentClampStimulusSeries
+)
+from ipfx.ephys_data_set import EphysDataSet
+from ipfx.dataset.ephys_nwb_data import EphysNWBData
+
+from data_set_session import BulkEphysDataSet, DataSetView, read_sweeps
+from sweep_loader import SweepLoader, supports_bulk_reads, read_series
+from .conftest import check_allclose
+
+
+class MockNWBData(EphysNWBData):
+
+    def __init__(self, nwb):
+        super().__init__(nwb_file=nwb, ontology=None, validate_stim=False)
+
+    def load_nwb(self, nwb_file, load_into_memory):
+        self.nwb = nwb_file
+
+    @property
+    def sweep_numbers(self):
+        return sorted(set(self.nwb.sweep_table["sweep_number"].data))
+
+    def get_sweep_metadata(self, sweep_number):
+        return {
+            "sweep_number": sweep_number,
+            "stimulus_code": "code",
+            "clamp_mode": "CurrentClamp"
+        }
+
+    def get_sweep_attrs(self, sweep_number):
+        return {}
+
+    def get_stimulus_code(self, sweep_number):
+        return "code"
+
+    def get_full_recording_date(self):
+        return None
+
+    def get_recording_date(self):
+        return None
+
+    def get_stimulus_unit(self, sweep_number):
+        return "Amps"
+
+    def get_clamp_mode(self, sweep_number):
+        return "CurrentClamp"
+
+
+class MockSweepTable:
+
+    def __init__(self, rows):
+        self.columns = {
+            "sweep_number": SimpleNamespace(data=np.array([row[0] for row in rows])),
+            "series": [[row[1]] for row in rows]
+        }
+
+    def __getitem__(self, key):
+        return self.columns[key]
+
+    def get_series(self, sweep_number):
+        return [
+            series[0] for number, series 
+            in zip(self.columns["sweep_number"].data, self.columns["series"])
+            if number == sweep_number
+        ]
+
+
+@pytest.fixture
+def nwb_data(tmp_path):
+    """ Three sweeps, stored in the ways NWB files store them: contiguous
+    float32, chunked float32 and int16 with a conversion factor. One
+    response ends with zeros.
+    """
+
+    hdf5 = h5py.File(tmp_path / "sweeps.h5", "w")
+    electrode = IntracellularElectrode(
+        name="electrode", description="", device=Device(name="amplifier")
+    )
+    rng = np.random.default_rng(7)
+
+    rows = []
+    for sweep_number, (dtype, chunks, conversion) in enumerate([
+        (np.float32, None, 1.0),
+        (np.float32, (16,), 1.0),
+        (np.int16, None, 1.0e-3)
+    ]):
+        num_samples = 100 + 10 * sweep_number
+        stimulus = (rng.normal(size=num_samples) * 100).astype(dtype)
+        response = (rng.normal(size=num_samples) * 100).astype(dtype)
+        if sweep_number == 1:
+            response[-7:] = 0
+
+        rows.append((sweep_number, CurrentClampStimulusSeries(
+            name=f"stimulus_{sweep_number}",
+            data=hdf5.create_dataset(
+                f"stimulus_{sweep_number}", data=stimulus, chunks=chunks
+            ),
+            electrode=electrode, gain=1.0, rate=1000.0 * (sweep_number + 1),
+            conversion=conversion * 1.0e-12, unit="amperes"
+        )))
+        rows.append((sweep_number, CurrentClampSeries(
+            name=f"response_{sweep_number}",
+            data=hdf5.create_dataset(
+                f"response_{sweep_number}", data=response, chunks=chunks
+            ),
+            electrode=electrode, gain=1.0, rate=1000.0 * (sweep_number + 1),
+            conversion=conversion * 1.0e-3, unit="volts"
+        )))
+
+    yield MockNWBData(SimpleNamespace(sweep_table=MockSweepTable(rows)))
+    hdf5.close()
+
+
+def test_supports_bulk_reads(nwb_data):
+    check.is_true(supports_bulk_reads(nwb_data))
+    check.is_false(supports_bulk_reads(SimpleNamespace()))
+
+
+def test_sweep_data_matches_ipfx(nwb_data):
+
+    expected = EphysDataSet(data=nwb_data)
+    loaded = SweepLoader(nwb_data).sweep_data([2, 0, 1])
+
+    check.equal(list(loaded), [2, 0, 1])
+    for sweep_number, sweep_data in loaded.items():
+        reference = expected.get_sweep_data(sweep_number)
+        for key in ["stimulus", "response"]:
+            check.equal(sweep_data[key].dtype, reference[key].dtype)
+            check_allclose(sweep_data[key], reference[key], equal_nan=True)
+        check.equal(sweep_data["stimulus_unit"], reference["stimulus_unit"])
+        check.equal(sweep_data["sampling_rate"], reference["sampling_rate"])
+
+    check.is_true(np.isnan(loaded[1]["response"][-7:]).all())
+
+
+def test_sweep_data_shares_buffer(nwb_data):
+
+    loaded = SweepLoader(nwb_data).sweep_data([0, 1])
+
+    check.is_true(np.shares_memory(
+        loaded[0]["stimulus"].base, loaded[1]["response"].base
+    ))
+    for sweep_data in loaded.values():
+        for key in ["stimulus", "response"]:
+            check.equal(sweep_data[key].ctypes.data % 64, 0)
+
+
+def test_missing_sweep(nwb_data):
+    with pytest.raises(ValueError):
+        SweepLoader(nwb_data).sweep_data([5])
+
+
+def test_read_series_arrays():
+
+    series = [
+        SimpleNamespace(data=np.arange(5, dtype=np.int16), conversion=0.5),
+        SimpleNamespace(data=np.arange(3, dtype=np.float32), conversion=2.0),
+        SimpleNamespace(data=np.zeros(0, dtype=np.float32), conversion=2.0)
+    ]
+    arrays = read_series(series)
+
+    check_allclose(arrays[0], np.arange(5) * 0.5)
+    check.equal(arrays[0].dtype, np.float64)
+    check_allclose(arrays[1], np.arange(3) * 2.0)
+    check.equal(arrays[1].dtype, np.float32)
+    check.equal(len(arrays[2]), 0)
+
+
+def test_bulk_data_set_sweeps(nwb_data):
+
+    expected = EphysDataSet(data=nwb_data)
+    data_set = BulkEphysDataSet(data=nwb_data)
+
+    sweeps = data_set.sweep_set([0, 1, 2]).sweeps
+    for sweep_number, sweep in zip([0, 1, 2], sweeps):
+        reference = expected.sweep(sweep_number)
+        check.equal(sweep.sweep_number, sweep_number)
+        check_allclose(sweep.t, reference.t)
+        check_allclose(sweep.v, reference.v, equal_nan=True)
+        check_allclose(sweep.i, reference.i)
+
+    check_allclose(data_set.sweep(1).v, expected.sweep(1).v, equal_nan=True)
+
+    view = DataSetView(data_set)
+    check.is_(view.loader(), data_set.loader())
+    check_allclose(read_sweeps(view, [2])[0].i, expected.sweep(2).i)
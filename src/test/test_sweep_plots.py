@@ -4,36 +4,17 @@ import pytest_check as check
 import numpy as np
 from pyqtgraph import InfiniteLine
 
+from ipfx.sweep import Sweep
+
 from sweep_plotter import (
     test_response_plot_data, experiment_plot_data,
-    PulsePopupPlotter, ExperimentPopupPlotter
+    PulsePopupPlotter, ExperimentPopupPlotter,
+    SweepPlotter, RasterThumbnail, PIXMAP_THUMBNAIL_FORMAT,
+    min_max_envelope, batch_test_response_plot_data, batch_experiment_plot_data,
+    segment_means
 )
 
-from .conftest import check_allclose
-
-
-class MockSweep:
-
-    @property
-    def t(self):
-        return np.arange(0, 10, 0.5)
-    
-    @property
-    def v(self):
-        return np.arange(0, 10, 0.5)
-
-    @property
-    def i(self):
-        current = np.zeros(10)
-        current[2:] += 1
-        current[3:] -= 1
-        current[6:] += 1
-        current[-1] = 0
-        return current
-
-    @property
-    def sampling_rate(self):
-        return 0.0
+from .conftest import check_allclose, MockSweep, MockDataSet
 
 
 @pytest.fixture
@@ -61,6 +42,28 @@ def test_experiment_plot_data(sweep):
     check.equal(obt_base, 3.25)
 
 
+def test_experiment_plot_data_nans():
+
+    class NanSweep(MockSweep):
+        def __init__(self):
+            self._v = np.arange(0, 10, 0.5)
+            self._v[[6, 8]] = np.nan
+
+        @property
+        def v(self):
+            return self._v
+
+    sweep = NanSweep()
+    obt_t, obt_v, obt_base = experiment_plot_data(
+        sweep, baseline_start_index=0, baseline_end_index=3
+    )
+
+    # the sweep's data are left alone, and nans are skipped in the baseline
+    check.equal(int(np.isnan(sweep.v).sum()), 2)
+    check.is_false(obt_v.flags.writeable)
+    check.equal(obt_base, 3.5)
+
+
 @pytest.mark.parametrize("time,voltage,previous,initial,sweep_number", [
     [np.arange(20), np.arange(20), None, None, 40],
     [np.arange(20), np.arange(20), np.arange(20) * 2, np.arange(20) * 3, 40]
@@ -106,3 +109,158 @@ def test_experiment_popup_plotter_graph(time, voltage, baseline):
 
     check.is_not_none(line)
     check.equal(line.y(), baseline)
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_advance_all(plot_config, num_workers):
+
+    sweep_numbers = [4, 5, 6]
+    plotter = SweepPlotter(
+        MockDataSet(len(sweep_numbers)), 
+        plot_config._replace(thumbnail_workers=num_workers)
+    )
+    obtained = plotter.advance_all(sweep_numbers)
+
+    check.equal(len(obtained), len(sweep_numbers))
+    for ii, (test_pulse, experiment) in enumerate(obtained):
+        check.is_true(bytes(test_pulse.thumbnail).strip().endswith(b"</svg>"))
+        check.is_true(bytes(experiment.thumbnail).strip().endswith(b"</svg>"))
+
+        check.equal(test_pulse.full.sweep_number, sweep_numbers[ii])
+        check.equal(experiment.full.sweep_number, sweep_numbers[ii])
+        check_allclose(experiment.full.voltage, [3, 3.5])
+
+        if ii == 0:
+            check.is_none(test_pulse.full.previous)
+            check.is_none(test_pulse.full.initial)
+        else:
+            check_allclose(test_pulse.full.previous, test_pulse.full.voltage)
+            check_allclose(test_pulse.full.initial, test_pulse.full.voltage)
+
+
+def test_advance_all_pixmap(plot_config):
+
+    plotter = SweepPlotter(
+        MockDataSet(2), 
+        plot_config._replace(thumbnail_format=PIXMAP_THUMBNAIL_FORMAT)
+    )
+    obtained = plotter.advance_all([1, 2])
+
+    for test_pulse, experiment in obtained:
+        check.is_instance(test_pulse.thumbnail, RasterThumbnail)
+        check.is_instance(experiment.thumbnail, RasterThumbnail)
+
+
+def test_raster_thumbnail():
+
+    thumbnail = RasterThumbnail(
+        ExperimentPopupPlotter(np.arange(20), np.arange(20), 1.0)
+    )
+
+    image = thumbnail.image(120, 80)
+    check.equal((image.width(), image.height()), (120, 80))
+    check.is_(thumbnail.image(120, 80), image)
+
+    resized = thumbnail.image(60, 40)
+    check.equal((resized.width(), resized.height()), (60, 40))
+
+
+def test_min_max_envelope():
+
+    time = np.arange(10000) / 1000.0
+    voltage = np.zeros(10000)
+    voltage[1234] = 50.0
+    voltage[5001] = -50.0
+    voltage[9990:] = np.nan
+
+    obt_time, (obt_voltage, obt_none) = min_max_envelope(time, [voltage, None], 100)
+
+    check.equal(len(obt_time), 200)
+    check.equal(len(obt_voltage), 200)
+    check.is_none(obt_none)
+
+    check.equal(obt_time[0], time[0])
+    check.equal(obt_time[-1], time[-1])
+    check.equal(np.nanmax(obt_voltage), 50.0)
+    check.equal(np.nanmin(obt_voltage), -50.0)
+    check.is_false(np.isnan(obt_voltage[-1]))  # partially nan bucket
+
+    check.equal(voltage[1234], 50.0)  # inputs are untouched
+
+
+def test_min_max_envelope_short():
+
+    time = np.arange(10)
+    obt_time, (obt_voltage,) = min_max_envelope(time, [time * 2], 5)
+    check_allclose(obt_time, time)
+    check_allclose(obt_voltage, time * 2)
+
+
+def synthetic_sweep(num_samples, sampling_rate, stimulus=True, nan_at=None):
+    t = np.arange(num_samples) / sampling_rate
+    i = np.zeros(num_samples)
+    i[num_samples // 20: num_samples // 10] = 1.0
+    if stimulus:
+        i[num_samples // 3: 2 * num_samples // 3] = -2.0
+    v = np.sin(t * 7.0) - 70.0
+    if nan_at is not None:
+        v[nan_at] = np.nan
+    return Sweep(t, v, i, "CurrentClamp", sampling_rate)
+
+
+@pytest.fixture
+def synthetic_sweeps():
+    return [
+        synthetic_sweep(20000, 10000.0),
+        synthetic_sweep(30000, 20000.0, nan_at=slice(11000, 11020)),
+        synthetic_sweep(20000, 10000.0, stimulus=False),
+        synthetic_sweep(5000, 1000.0),
+    ]
+
+
+def test_batch_test_response_plot_data(synthetic_sweeps):
+
+    obtained = batch_test_response_plot_data(synthetic_sweeps, 0.01, 0.3, 50)
+
+    for sweep, (obt_t, obt_v) in zip(synthetic_sweeps, obtained):
+        exp_t, exp_v = test_response_plot_data(sweep, 0.01, 0.3, 50)
+        check_allclose(np.asarray(exp_t), np.asarray(obt_t))
+        check_allclose(exp_v, obt_v)
+
+
+def test_batch_experiment_plot_data(synthetic_sweeps):
+
+    obtained = batch_experiment_plot_data(synthetic_sweeps, 100, 0, 1000)
+
+    for sweep, (obt_t, obt_v, obt_base) in zip(synthetic_sweeps, obtained):
+        exp_t, exp_v, exp_base = experiment_plot_data(sweep, 100, 0, 1000)
+        check_allclose(np.asarray(exp_t), np.asarray(obt_t))
+        check_allclose(exp_v, obt_v, equal_nan=True)
+        check.almost_equal(exp_base, obt_base)
+
+
+def test_segment_means():
+    obtained = segment_means(
+        [np.array([1.0, 2.0]), np.array([]), np.array([np.nan, 4.0])], 
+        skip_nan=True
+    )
+    check_allclose(obtained, [1.5, np.nan, 4.0], equal_nan=True)
+
+
+def test_popup_plotters(plot_config):
+
+    plotter = SweepPlotter(MockDataSet(4), plot_config)
+    obtained = plotter.popup_plotters([0, 1, 2, 3], [3, 1])
+
+    reference = SweepPlotter(MockDataSet(4), plot_config)
+    for position, (test_pulse, experiment) in zip([1, 3], obtained):
+        sweep = reference.data_set.sweep(position)
+        exp_pulse = reference.test_pulse_plotter_at([0, 1, 2, 3], position, sweep)
+        exp_experiment = reference.experiment_plotter(position, sweep)
+
+        check_allclose(test_pulse.voltage, exp_pulse.voltage)
+        check_allclose(test_pulse.previous, exp_pulse.previous)
+        check_allclose(test_pulse.initial, exp_pulse.initial)
+        check_allclose(experiment.voltage, exp_experiment.voltage)
+        check.equal(experiment.baseline, exp_experiment.baseline)
+        check.equal(experiment.sweep_number, position)
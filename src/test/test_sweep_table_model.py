@@ -1,9 +1,16 @@
+import multiprocessing as mp
+
 import pytest
+import pytest_check as check
 
 from PyQt5.QtCore import QModelIndex, Qt
 from PyQt5.QtGui import QColor
 
 from sweep_table_model import SweepTableModel, SweepPlotConfig
+from workers import Task, SpawnProcessPool
+
+from .conftest import MockDataSet
+
 
 @pytest.fixture
 def model():
@@ -45,4 +52,132 @@ def test_data(index, role, expected, model):
     if obtained is None:
         assert expected is None
     else:
-        assert obtained == expected
\ No newline at end of file
+        assert obtained == expected
+
+def test_request_plots(qtbot):
+
+    colnames = [
+        "sweep number", "stimulus code", "stimulus type", "auto QC state", 
+        "manual QC state", "fail tags", "test epoch", "experiment epoch"
+    ]
+    model = SweepTableModel(colnames, SweepPlotConfig(2.0, 5.0, 3, 1, 0, 2, 1))
+
+    sweep_numbers = [3, 1, 2]
+    model.on_new_data(
+        [
+            {
+                "sweep_number": num, "stimulus_code": "a", "stimulus_name": "b",
+                "passed": True, "tags": []
+            } 
+            for num in sweep_numbers
+        ],
+        [{"sweep_number": num, "passed": True, "reasons": []} for num in sweep_numbers],
+        {num: "default" for num in sweep_numbers},
+        MockDataSet(len(sweep_numbers))
+    )
+
+    check.equal(model.rowCount(), 3)
+    check.is_none(model.data(model.index(1, 6)))
+
+    model.request_plots([1, 7])
+    qtbot.waitUntil(lambda: model.data(model.index(1, 7)) is not None)
+
+    test_pulse = model.data(model.index(1, 6))
+    check.equal(test_pulse.full.sweep_number, 2)
+    check.is_not_none(test_pulse.full.previous)
+    check.is_none(model.data(model.index(0, 6)))
+    check.is_none(model.data(model.index(2, 6)))
+
+
+def test_on_auto_qc_recalculated(qtbot):
+
+    colnames = [
+        "sweep number", "stimulus code", "stimulus type", "auto QC state", 
+        "manual QC state", "fail tags", "test epoch", "experiment epoch"
+    ]
+    model = SweepTableModel(colnames, SweepPlotConfig(2.0, 5.0, 3, 1, 0, 2, 1))
+
+    sweep_numbers = [1, 2]
+    sweep_features = [
+        {
+            "sweep_number": num, "stimulus_code": "a", "stimulus_name": "b",
+            "passed": True, "tags": []
+        } 
+        for num in sweep_numbers
+    ]
+    model.on_new_data(
+        sweep_features,
+        [{"sweep_number": num, "passed": True, "reasons": []} for num in sweep_numbers],
+        {1: "failed", 2: "default"},
+        MockDataSet(len(sweep_numbers))
+    )
+
+    with qtbot.waitSignal(model.dataChanged):
+        model.on_auto_qc_recalculated(
+            sweep_features,
+            [
+                {"sweep_number": 1, "passed": True, "reasons": []},
+                {"sweep_number": 2, "passed": False, "reasons": ["too noisy"]}
+            ]
+        )
+
+    check.equal(model.rowCount(), 2)
+    check.equal(model.data(model.index(0, 3)), "passed")
+    check.equal(model.data(model.index(1, 3)), "failed")
+    check.equal(model.data(model.index(1, 5)), "too noisy")
+    check.equal(model.data(model.index(0, 4)), "failed")
+
+
+def new_data(model, sweep_numbers):
+    model.on_new_data(
+        [
+            {
+                "sweep_number": num, "stimulus_code": "a", "stimulus_name": "b",
+                "passed": True, "tags": []
+            } 
+            for num in sweep_numbers
+        ],
+        [{"sweep_number": num, "passed": True, "reasons": []} for num in sweep_numbers],
+        {num: "default" for num in sweep_numbers},
+        MockDataSet(len(sweep_numbers))
+    )
+
+
+def test_trace_store_closed_after_task(qtbot):
+
+    colnames = [
+        "sweep number", "stimulus code", "stimulus type", "auto QC state", 
+        "manual QC state", "fail tags", "test epoch", "experiment epoch"
+    ]
+    model = SweepTableModel(colnames, SweepPlotConfig(2.0, 5.0, 3, 1, 0, 2, 1))
+
+    new_data(model, [1, 2])
+    store = model._trace_store
+
+    # a (cancelled) task may still be writing to the store
+    task = Task(lambda progress: None)
+    task.signals.finished.connect(model.on_task_finished)
+    model._task = task
+
+    new_data(model, [1, 2, 3])
+    check.is_not(model._trace_store, store)
+    check.is_false(store._file.closed)
+
+    task.signals.finished.emit()
+    check.is_true(store._file.closed)
+
+    # without a task in flight, the store is closed immediately
+    store = model._trace_store
+    new_data(model, [1])
+    check.is_true(store._file.closed)
+
+
+def test_shutdown(model):
+
+    model._executor = SpawnProcessPool(2)
+    model._executor.submit(sum, [1, 2])
+
+    model.shutdown()
+
+    check.is_none(model._executor)
+    check.equal(mp.active_children(), [])
@@ -0,0 +1,130 @@
+import os
+
+import pytest
+import pytest_check as check
+
+import numpy as np
+
+from PyQt5.QtCore import QByteArray
+
+from sweep_plotter import (
+    SweepPlotter, PIXMAP_THUMBNAIL_FORMAT
+)
+from thumbnail_cache import ThumbnailCache
+from time_axis import TimeAxis
+
+from .conftest import check_allclose, MockDataSet
+
+
+class CountingDataSet(MockDataSet):
+
+    def __init__(self, num_sweeps):
+        super().__init__(num_sweeps)
+        self.loaded = []
+
+    def sweep(self, sweep_number):
+        self.loaded.append(sweep_number)
+        return super().sweep(sweep_number)
+
+
+@pytest.fixture
+def nwb_path(tmp_path):
+    path = tmp_path / "data.nwb"
+    path.write_bytes(b"not really an nwb file")
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ThumbnailCache(str(tmp_path / "cache"))
+
+
+def test_key(cache, nwb_path, plot_config):
+
+    key = cache.key(nwb_path, plot_config, [1, 2, 3])
+
+    check.equal(key, cache.key(nwb_path, plot_config, [1, 2, 3]))
+    check.equal(
+        key,
+        cache.key(nwb_path, plot_config._replace(thumbnail_workers=4), [1, 2, 3])
+    )
+    check.not_equal(key, cache.key(nwb_path, plot_config, [2, 1, 3]))
+    check.not_equal(
+        key,
+        cache.key(nwb_path, plot_config._replace(thumbnail_buckets=10), [1, 2, 3])
+    )
+
+    with open(nwb_path, "ab") as nwb_file:
+        nwb_file.write(b"more")
+    check.not_equal(key, cache.key(nwb_path, plot_config, [1, 2, 3]))
+
+
+@pytest.mark.parametrize("thumbnail_format", ["svg", PIXMAP_THUMBNAIL_FORMAT])
+def test_round_trip(cache, nwb_path, plot_config, thumbnail_format):
+
+    config = plot_config._replace(thumbnail_format=thumbnail_format)
+    plotter = SweepPlotter(MockDataSet(2), config)
+    expected = plotter.plot_sweeps([0, 1])[1]
+
+    key = cache.key(nwb_path, config, [0, 1])
+    check.is_none(cache.load(key, 1))
+
+    cache.store(key, 1, expected)
+    obtained = cache.load(key, 1)
+
+    for exp, obt in zip(expected, obtained):
+        check.equal(type(exp.thumbnail), type(obt.thumbnail))
+        if isinstance(exp.thumbnail, QByteArray):
+            check.equal(bytes(exp.thumbnail), bytes(obt.thumbnail))
+        else:
+            check.equal(exp.thumbnail.renderer, obt.thumbnail.renderer)
+            check_allclose(exp.thumbnail.plotter.voltage, obt.thumbnail.plotter.voltage)
+
+        check.equal(type(exp.full), type(obt.full))
+        check.equal(exp.full.sweep_number, obt.full.sweep_number)
+        check.is_true(isinstance(obt.full.time, TimeAxis))
+        check.is_true(np.array_equal(np.asarray(exp.full.time), np.asarray(obt.full.time)))
+        check_allclose(exp.full.voltage, obt.full.voltage)
+
+    check_allclose(expected[0].full.previous, obtained[0].full.previous)
+    check.equal(expected[1].full.baseline, obtained[1].full.baseline)
+
+
+def test_plot_sweeps_cached(cache, nwb_path, plot_config):
+
+    sweep_numbers = [0, 1, 2]
+    key = cache.key(nwb_path, plot_config, sweep_numbers)
+
+    data_set = CountingDataSet(3)
+    first = SweepPlotter(data_set, plot_config, cache, key)
+    first.plot_sweeps(sweep_numbers, [1, 2])
+    check.is_not_none(cache.load(key, 2))
+
+    data_set = CountingDataSet(3)
+    second = SweepPlotter(data_set, plot_config, cache, key)
+    plots = second.plot_sweeps(sweep_numbers, [1, 2])
+
+    check.equal(sorted(plots), [1, 2])
+    check.equal(data_set.loaded, [])
+    check.equal(plots[1][0].full.sweep_number, 1)
+    check.is_not_none(plots[2][0].full.previous)
+
+
+def test_evict(tmp_path, nwb_path, plot_config):
+
+    plotter = SweepPlotter(MockDataSet(3), plot_config)
+    plots = plotter.plot_sweeps([0, 1, 2])
+
+    cache = ThumbnailCache(str(tmp_path / "cache"))
+    key = cache.key(nwb_path, plot_config, [0, 1, 2])
+    cache.store(key, 1, plots[1])
+    cache.store(key, 0, plots[0])
+    os.utime(cache.path(key, 0), (0, 0))
+
+    # room for about two entries
+    cache.max_bytes = int(os.path.getsize(cache.path(key, 1)) * 2.5)
+    cache.store(key, 2, plots[2])
+
+    check.is_none(cache.load(key, 0))
+    check.is_not_none(cache.load(key, 1))
+    check.is_not_none(cache.load(key, 2))
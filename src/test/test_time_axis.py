@@ -0,0 +1,100 @@
+import pytest
+import pytest_check as check
+
+import numpy as np
+
+from ipfx.sweep import Sweep
+
+from time_axis import TimeAxis, searchsorted, axes_searchsorted
+
+from .conftest import check_allclose
+
+
+@pytest.fixture
+def axis():
+    return TimeAxis(0.5, 200.0, 1001)
+
+
+@pytest.fixture
+def times(axis):
+    return 0.5 + np.arange(1001) / 200.0
+
+
+def test_array(axis, times):
+    check.equal(len(axis), len(times))
+    check_allclose(np.asarray(axis), times)
+    check.equal(np.asarray(axis, dtype=np.float32).dtype, np.float32)
+
+
+@pytest.mark.parametrize("key", [
+    slice(None), slice(10, 500), slice(None, None, 7), slice(-20, None, 3), 
+    slice(5, 2), slice(None, None, -4)
+])
+def test_slice(axis, times, key):
+    check_allclose(np.asarray(axis[key]), times[key])
+
+
+def test_index(axis, times):
+
+    check.almost_equal(axis[0], times[0])
+    check.almost_equal(axis[-1], times[-1])
+    check_allclose(axis[np.array([0, 3, -1])], times[[0, 3, -1]])
+
+    with pytest.raises(IndexError):
+        axis[1001]
+
+
+@pytest.mark.parametrize("value", [-np.inf, 0.0, 0.5, 0.5025, 1.0, 1.00001, 3.0, 10.0, np.inf])
+@pytest.mark.parametrize("side", ["left", "right"])
+def test_searchsorted(axis, times, value, side):
+    check.equal(
+        searchsorted(axis, value, side), 
+        int(np.searchsorted(times, value, side=side))
+    )
+
+
+def test_of_sweep():
+
+    class Sweep:
+        t = np.arange(0, 10, 0.5)
+        sampling_rate = 0.0
+
+    check_allclose(np.asarray(TimeAxis.of_sweep(Sweep())), Sweep.t)
+
+
+def test_of_realigned_sweep():
+
+    class Sweep:
+        t = np.arange(20) / 3.0 - 1.1
+        sampling_rate = 3.0
+
+    check.is_true(np.array_equal(np.asarray(TimeAxis.of_sweep(Sweep())), Sweep.t))
+
+
+@pytest.mark.parametrize("sampling_rate", [10e3, 20e3, 25e3, 50e3, 100e3, 200e3])
+@pytest.mark.parametrize("key", [slice(None), slice(1234, 45678)])
+def test_of_sweep_matches_ipfx(sampling_rate, key):
+
+    num_samples = 50000
+    sweep = Sweep(
+        np.arange(num_samples) / sampling_rate, 
+        np.zeros(num_samples), np.zeros(num_samples), 
+        "CurrentClamp", sampling_rate
+    )
+    axis = TimeAxis.of_sweep(sweep)[key]
+    times = sweep.t[key]
+
+    check.is_true(np.array_equal(np.asarray(axis), times))
+
+    # every sample time, and a point between each pair of samples
+    values = np.sort(np.concatenate([times[::37], times[::37] + 0.5 / sampling_rate]))
+    for side in ["left", "right"]:
+        expected = np.searchsorted(times, values, side=side)
+        check.equal(
+            [axis.searchsorted(value, side) for value in values], 
+            expected.tolist()
+        )
+        check.equal(
+            [axes_searchsorted([axis], value, side)[0] for value in values], 
+            expected.tolist()
+        )
@@ -0,0 +1,58 @@
+import pytest
+import pytest_check as check
+
+import numpy as np
+from pyqtgraph import PlotWidget
+
+from trace_pyramid import TracePyramid, plot_pyramid
+
+from .conftest import check_allclose
+
+
+@pytest.fixture
+def trace():
+    time = np.arange(100000) / 10000.0
+    values = np.zeros(100000)
+    values[12345] = 10.0
+    values[67891] = -10.0
+    return time, values
+
+
+def test_query_raw(trace):
+    pyramid = TracePyramid(*trace, min_buckets=10)
+    time, values = pyramid.query(1.0, 1.01, 1000)
+
+    check_allclose(time, trace[0][9999:10102])
+    check_allclose(values, trace[1][9999:10102])
+
+
+@pytest.mark.parametrize("start,end", [[-np.inf, np.inf], [1.0, 8.0], [1.2, 1.3]])
+@pytest.mark.parametrize("max_points", [200, 1000])
+def test_query_levels(trace, start, end, max_points):
+
+    pyramid = TracePyramid(*trace, min_buckets=10)
+    time, values = pyramid.query(start, end, max_points)
+
+    check.less_equal(len(time), max_points)
+    check.equal(len(time), len(values))
+
+    # peaks are preserved
+    visible = (trace[0] >= start) & (trace[0] <= end)
+    check.equal(values.max(), trace[1][visible].max())
+    check.equal(values.min(), trace[1][visible].min())
+
+    # the whole range is covered
+    check.less_equal(time[0], max(start, trace[0][0]))
+    check.greater_equal(time[-1], min(end, trace[0][-1]))
+
+
+def test_plot_pyramid(qtbot, trace):
+    graph = PlotWidget()
+    qtbot.addWidget(graph)
+    plot = graph.getPlotItem()
+
+    item = plot_pyramid(plot, TracePyramid(*trace))
+    check.less(len(item.xData), len(trace[0]))
+
+    plot.getViewBox().setXRange(1.0, 1.01, padding=0)
+    check_allclose(item.xData, trace[0][9999:10102])
@@ -0,0 +1,105 @@
+import sys
+
+import pytest
+import pytest_check as check
+
+import numpy as np
+
+from sweep_plotter import SweepPlotter, RasterThumbnail, PIXMAP_THUMBNAIL_FORMAT
+from trace_store import TraceStore, is_mapped
+from time_axis import TimeAxis
+
+from .conftest import check_allclose, MockDataSet
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TraceStore(str(tmp_path))
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize("array", [
+    np.arange(10, dtype=float),
+    np.arange(12, dtype=np.int16).reshape(3, 4),
+    np.arange(20, dtype=np.float32)[::3]
+])
+def test_store(store, array):
+
+    stored = store.store(array)
+
+    check.is_true(is_mapped(stored))
+    check.is_false(stored.flags.writeable)
+    check.equal(stored.dtype, array.dtype)
+    check_allclose(stored, array)
+
+
+def test_store_passthrough(store):
+
+    check.is_none(store.store(None))
+
+    empty = np.array([])
+    check.is_(store.store(empty), empty)
+
+    stored = store.store(np.arange(5.0))
+    check.is_(store.store(stored), stored)
+    check.equal(store.size, 5 * 8)
+
+
+def test_close_keeps_arrays(store):
+
+    stored = store.store(np.arange(5.0))
+    store.close()
+    check_allclose(stored, np.arange(5.0))
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses resource limits")
+def test_store_many(store):
+
+    import resource
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    limit = min(256, soft)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+
+    try:
+        stored = [
+            store.store(np.full(1000, index, dtype=float)) 
+            for index in range(limit + 1000)
+        ]
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+    for index, array in enumerate(stored):
+        check.is_true(is_mapped(array))
+        check.equal(array[0], index)
+        check.equal(array[-1], index)
+
+
+def test_sweep_plotter_spills(store, plot_config):
+
+    config = plot_config._replace(thumbnail_format=PIXMAP_THUMBNAIL_FORMAT)
+    expected = SweepPlotter(MockDataSet(3), config).plot_sweeps([0, 1, 2])
+    obtained = SweepPlotter(
+        MockDataSet(3), config, trace_store=store
+    ).plot_sweeps([0, 1, 2])
+
+    for position in range(3):
+        for exp, obt in zip(expected[position], obtained[position]):
+            check.is_true(isinstance(obt.full.time, TimeAxis))
+            check.is_true(is_mapped(obt.full.voltage))
+            check_allclose(exp.full.voltage, obt.full.voltage)
+
+            check.is_true(isinstance(obt.thumbnail, RasterThumbnail))
+            check.is_true(is_mapped(obt.thumbnail.plotter.voltage))
+
+            # pyramids built after spilling are stored too
+            for pyramid in obt.full.pyramids().values():
+                for mins, maxs in pyramid.levels:
+                    check.is_true(is_mapped(mins) and is_mapped(maxs))
+
+    # the previous and initial test pulses are stored once, with the sweep's 
+    # own test pulse
+    test_pulses = [obtained[position][0].full for position in range(3)]
+    check.is_(test_pulses[2].previous, test_pulses[1].voltage)
+    check.is_(test_pulses[2].initial, test_pulses[0].voltage)
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+import pytest_check as check
+
+from workers import Task, TaskCancelled, run_in_process, SpawnProcessPool
+
+
+def count_to(num, progress):
+    for ii in range(num):
+        progress("counting", ii, num)
+    return num
+
+
+def fail(progress):
+    raise ValueError("oops")
+
+
+def test_task_succeeded(qtbot):
+
+    task = Task(count_to, 3)
+    progress = []
+    task.signals.progress.connect(
+        lambda message, completed, total: progress.append((completed, total))
+    )
+
+    with qtbot.waitSignal(task.signals.succeeded) as blocker:
+        task.start()
+
+    check.equal(blocker.args, [3])
+    qtbot.waitUntil(lambda: len(progress) == 3)
+    check.equal(progress, [(0, 3), (1, 3), (2, 3)])
+
+
+def test_task_failed(qtbot):
+
+    task = Task(fail)
+
+    with qtbot.waitSignal(task.signals.failed) as blocker:
+        task.start()
+
+    check.is_instance(blocker.args[0], ValueError)
+
+
+def test_task_cancelled(qtbot):
+
+    task = Task(count_to, 3)
+    task.cancel()
+
+    with qtbot.waitSignal(task.signals.cancelled):
+        task.start()
+
+
+def test_progress_raises_when_cancelled():
+
+    task = Task(count_to, 3)
+    task.progress("fine")
+
+    task.cancel()
+    with pytest.raises(TaskCancelled):
+        task.progress("not fine")
+
+
+def test_run_in_process():
+    check.equal(run_in_process(sum, [1, 2, 3]), 6)
+
+
+def test_run_in_process_failed():
+    with pytest.raises(ValueError):
+        run_in_process(int, "not a number")
+
+
+def test_run_in_process_cancelled():
+
+    def cancel(message, completed=0, total=0):
+        raise TaskCancelled(message)
+
+    start = time.monotonic()
+    with pytest.raises(TaskCancelled):
+        run_in_process(time.sleep, 30, progress=cancel, poll_interval=0.05)
+    check.less(time.monotonic() - start, 10)
+
+
+def test_spawn_process_pool():
+
+    with SpawnProcessPool(2) as pool:
+        succeeded = pool.submit(sum, [1, 2, 3])
+        failed = pool.submit(int, "not a number")
+
+        check.equal(succeeded.result(timeout=30), 6)
+        with pytest.raises(ValueError):
+            failed.result(timeout=30)
+
+
+def test_spawn_process_pool_terminate():
+
+    pool = SpawnProcessPool(1)
+    future = pool.submit(time.sleep, 30)
+
+    start = time.monotonic()
+    future.cancel()
+    pool.terminate()
+    check.less(time.monotonic() - start, 10)
+    check.is_true(future.cancelled())
+
+
+def test_spawn_process_pool_terminate_fails_futures():
+
+    pool = SpawnProcessPool(1)
+    future = pool.submit(time.sleep, 30)
+    pool.terminate()
+
+    with pytest.raises(RuntimeError):
+        future.result(timeout=10)